@@ -6,11 +6,11 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('templates', 'templates'), ('static', 'static')],
-    hiddenimports=['webview', 'pandas', 'openpyxl', 'numpy'],
+    hiddenimports=['webview', 'pandas', 'openpyxl', 'xlsxwriter', 'numpy'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=['matplotlib', 'scipy', 'IPython', 'pytest'],
     noarchive=False,
     optimize=0,
 )
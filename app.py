@@ -1,14 +1,32 @@
+import time
+# 启动计时的起点，尽量早于其他导入
+STARTUP_STARTED = time.perf_counter()
+
 import os
 import sys
-from flask import Flask, render_template, request, send_file, jsonify
-import webview
+from flask import Flask, Response, render_template, request, send_file, jsonify, stream_with_context
 import threading
+import multiprocessing
 import tempfile
-from main import process_excel
-from compare_excel import compare_excel_files
-import pandas as pd
+from jobs import JobManager
+from workspace import WorkspaceManager, WorkspaceQuotaExceeded
+from uploads import UploadManager, UploadError, UploadOffsetMismatch, UPLOAD_CHUNK_BYTES, UPLOAD_IDLE_TIMEOUT
+from writers import check_format, output_path_for, write_output, mimetype_for, iter_csv_bytes
 from datetime import datetime
 
+# pandas、openpyxl、numpy 以及依赖它们的 main、compare_excel、cache 导入较慢，
+# 不在启动时导入：窗口和首页先显示，首页加载后由后台线程预先导入（见 prewarm），
+# 在预热完成前提交的任务会在第一次使用时导入
+
+# 启动各阶段距进程启动的耗时（秒），可通过 /startup 查看，便于发现启动变慢
+startup_timings = {}
+_prewarm_started = threading.Event()
+
+def mark_startup(stage):
+    elapsed = time.perf_counter() - STARTUP_STARTED
+    startup_timings[stage] = round(elapsed, 3)
+    print(f"[启动] {stage}: {elapsed:.2f}s")
+
 def get_resource_path(relative_path):
     try:
         # PyInstaller创建临时文件夹，将路径存储在_MEIPASS中
@@ -24,18 +42,133 @@ app = Flask(__name__,
 )
 
 # 使用系统临时目录
-UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), 'excel_processor_uploads')
-PROCESSED_FOLDER = os.path.join(tempfile.gettempdir(), 'excel_processor_processed')
-COMPARE_FOLDER = os.path.join(tempfile.gettempdir(), 'excel_processor_compare')
+WORKSPACE_FOLDER = os.path.join(tempfile.gettempdir(), 'excel_processor_jobs')
+CACHE_FOLDER = os.path.join(tempfile.gettempdir(), 'excel_processor_cache')
+
+# 已处理文件的缓存，重复上传相同内容的文件时不再重新解析；第一次使用时创建
+_processed_cache = None
+_processed_cache_lock = threading.Lock()
+
+def get_processed_cache():
+    global _processed_cache
+    with _processed_cache_lock:
+        if _processed_cache is None:
+            from cache import ProcessedFileCache
+            _processed_cache = ProcessedFileCache(CACHE_FOLDER)
+        return _processed_cache
+
+# 上传任务的处理结果，供 /preview 分页查询；第一次使用时创建
+_result_store = None
+
+def get_result_store():
+    global _result_store
+    with _processed_cache_lock:
+        if _result_store is None:
+            from preview import ResultStore
+            _result_store = ResultStore()
+        return _result_store
+
+# 进程池使用 spawn 启动方式，工作进程会重新导入本模块（打包后的程序同样如此），
+# 因此模块级别只创建对象，不启动线程：任务线程在第一次提交任务时才创建，清理线程和预热只在服务进程中启动（见 start_server、index）
+
+# 后台任务队列：上传和比较请求立即返回任务 ID，前端轮询 /jobs/<job_id> 获取进度
+job_manager = JobManager()
+
+# 每个请求使用独立的工作目录（目录名即任务 ID，也是下载结果时使用的 ID），过期后在后台清理
+workspaces = WorkspaceManager(WORKSPACE_FOLDER)
+
+# 进行中的分块上传（ID 与任务 ID 相同），任务结束后删除
+upload_sessions = UploadManager()
+
+# 分块上传任务等待新文件接收完成时，检查取消和超时的间隔（秒）
+UPLOAD_POLL_SECONDS = 0.5
+
+def prewarm():
+    """在后台导入处理数据用到的模块并编译游戏标签规则，使第一次上传不用等待导入"""
+    try:
+        import numpy, pandas, openpyxl, xlsxwriter  # noqa: F401
+        try:
+            # 只有读取旧版 .xls 文件时需要，未安装时跳过
+            import xlrd  # noqa: F401
+        except ImportError:
+            pass
+        import main, compare_excel, store, preview  # noqa: F401
+        get_processed_cache()
+        main.get_game_matcher()
+        mark_startup('预热完成')
+    except Exception as e:
+        print(f"预热失败，将在第一次使用时导入: {str(e)}")
+
+def start_prewarm():
+    """只启动一次预热线程"""
+    if not _prewarm_started.is_set():
+        _prewarm_started.set()
+        threading.Thread(target=prewarm, name='prewarm', daemon=True).start()
+
+def submit_job(kind, workspace, func, files):
+    """以工作目录 ID 作为任务 ID 提交任务，任务结束后释放工作目录"""
+    return job_manager.submit(
+        kind,
+        func,
+        files=files,
+        job_id=workspace.id,
+        on_finish=lambda job: workspaces.release(workspace.id)
+    )
+
+def send_result(result_id, missing_message):
+    """下载任务工作目录中的结果文件"""
+    workspace = workspaces.get(result_id)
+    outputs = workspace.outputs() if workspace is not None else []
+    if outputs and not workspaces.in_use(result_id):
+        output_path = workspace.output_path(outputs[0])
+        workspace.touch()
+        try:
+            return send_file(
+                output_path,
+                as_attachment=True,
+                download_name=outputs[0],
+                mimetype=mimetype_for(output_path)
+            )
+        except Exception as e:
+            return jsonify({'error': f'下载文件时出错: {str(e)}'}), 500
+    return jsonify({'error': missing_message}), 404
+
+def get_result(workspace, filename):
+    """读取任务保存的处理结果（preview.PreviewResult），不存在时返回 None"""
+    if workspace is None:
+        return None
+    return get_result_store().get((workspace.id, filename), workspace.data_path(filename))
 
-# 确保目录存在
-for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER, COMPARE_FOLDER]:
-    os.makedirs(folder, exist_ok=True)
+def stream_result(result_id, filename, suffix, missing_message):
+    """从内存中的处理结果边转换边下载 CSV，不需要先写出完整的结果文件；gzip=1 时 gzip 压缩"""
+    workspace = workspaces.get(result_id)
+    result = get_result(workspace, filename)
+    if result is None:
+        return jsonify({'error': missing_message}), 404
+    workspace.touch()
+    compress = request.args.get('gzip') in ('1', 'true')
+    # 文件名与已生成的结果文件一致，结果文件还没有写完时使用默认名称
+    outputs = workspace.outputs()
+    stem = os.path.splitext(outputs[0])[0] if outputs else 'result'
+    download_name = f"{stem}{suffix}.csv" + ('.gz' if compress else '')
+    return Response(
+        stream_with_context(iter_csv_bytes(result.iter_frames(), compress)),
+        mimetype='application/gzip' if compress else 'text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{download_name}"'}
+    )
 
 @app.route('/')
 def index():
+    # 首页返回后再开始预热，避免后台导入与窗口首次渲染争抢 CPU
+    if 'index' not in startup_timings:
+        mark_startup('index')
+    start_prewarm()
     return render_template('index.html')
 
+@app.route('/startup')
+def startup_report():
+    return jsonify({'timings': startup_timings, 'prewarmed': '预热完成' in startup_timings})
+
 @app.route('/upload', methods=['POST'])
 def upload_file():
     if 'files[]' not in request.files:
@@ -44,103 +177,233 @@ def upload_file():
     files = request.files.getlist('files[]')
     if not files:
         return jsonify({'error': '没有选择文件'}), 400
+    
+    try:
+        output_format = check_format(request.form.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     try:
-        # 清理临时文件夹
-        for folder in [UPLOAD_FOLDER, PROCESSED_FOLDER]:
-            for filename in os.listdir(folder):
-                file_path = os.path.join(folder, filename)
-                try:
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                except Exception as e:
-                    print(f"Error removing file {file_path}: {e}")
+        workspace = workspaces.create(request.content_length or 0)
+    except WorkspaceQuotaExceeded as e:
+        return jsonify({'error': str(e)}), 507
 
+    try:
         # 保存上传的文件
         saved_files = []
         for file in files:
             if file.filename:
                 # 使用安全的文件名
-                safe_filename = os.path.basename(file.filename)
-                filepath = os.path.join(UPLOAD_FOLDER, safe_filename)
+                filepath = workspace.input_path(file.filename)
                 file.save(filepath)
                 saved_files.append(filepath)
 
-        # 处理文件
-        all_data = []
-        for file_path in saved_files:
-            processed_df = process_excel(file_path)
-            if processed_df is not None:
-                all_data.append(processed_df)
-
-        if all_data:
-            # 合并所有数据
-            final_df = pd.concat(all_data, ignore_index=True)
-            
-            # 检查并处理重复的post_id
-            if 'post_id' in final_df.columns:
-                duplicate_mask = final_df['post_id'].duplicated(keep=False)
-                duplicates = final_df[duplicate_mask]
-                
-                if not duplicates.empty:
-                    print(f"发现{len(duplicates)}行重复的post_id，进行合并处理")
-                    
-                    # 定义需要合并的数值列
-                    numeric_cols = ['video_views', 'like', 'comment', 'share', 'collect']
-                    # 只使用存在的列
-                    numeric_cols = [col for col in numeric_cols if col in final_df.columns]
-                    
-                    # 保留第一次出现的记录
-                    unique_records = final_df[~final_df['post_id'].duplicated(keep='first')]
-                    # 获取重复的记录（不包括第一次出现的）
-                    duplicate_records = final_df[final_df['post_id'].duplicated(keep='first')]
-                    
-                    # 对重复记录按post_id分组并求和
-                    if numeric_cols:
-                        sums = duplicate_records.groupby('post_id')[numeric_cols].sum()
-                        
-                        # 更新原始数据中的数值
-                        for post_id in sums.index:
-                            mask = unique_records['post_id'] == post_id
-                            for col in numeric_cols:
-                                unique_records.loc[mask, col] += sums.loc[post_id, col]
-                    
-                    final_df = unique_records
-                    print(f"合并后的数据行数: {len(final_df)}")
-            
-            # 保存处理后的文件
-            output_path = os.path.join(PROCESSED_FOLDER, 'processed_data.xlsx')
-            final_df.to_excel(output_path, index=False, engine='openpyxl')
-            
-            return jsonify({
-                'success': True,
-                'message': '文件处理成功',
-                'download_ready': True
-            })
-        else:
-            return jsonify({
-                'error': '文件处理失败'
-            }), 500
+        if not saved_files:
+            workspaces.remove(workspace.id)
+            return jsonify({'error': '没有选择文件'}), 400
+
+        # 处理文件：国内文件在前、国外文件在后，按文件名排序
+        from main import order_files
+        saved_files = order_files(saved_files)
+        job = submit_job(
+            'upload',
+            workspace,
+            lambda job: run_upload_job(job, workspace, saved_files, output_format),
+            [os.path.basename(path) for path in saved_files]
+        )
+        return jsonify({
+            'success': True,
+            'message': '文件已提交处理',
+            'job_id': job.id
+        }), 202
 
     except Exception as e:
+        workspaces.remove(workspace.id)
         return jsonify({
             'error': f'处理过程中出错: {str(e)}'
         }), 500
 
-@app.route('/download')
-def download():
-    output_path = os.path.join(PROCESSED_FOLDER, 'processed_data.xlsx')
-    if os.path.exists(output_path):
-        try:
-            return send_file(
-                output_path,
-                as_attachment=True,
-                download_name='processed_data.xlsx',
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-        except Exception as e:
-            return jsonify({'error': f'下载文件时出错: {str(e)}'}), 500
-    return jsonify({'error': '文件不存在'}), 404
+def run_upload_job(job, workspace, saved_files, output_format):
+    """后台执行的上传处理任务：处理各文件 -> 合并 -> 去重 -> 写出结果"""
+    from main import process_files
+
+    def on_file_done(file_path, df):
+        job.set_file_status(os.path.basename(file_path), 'done' if df is not None else 'failed')
+        finished = job.files_finished()
+        job.set_stage('processing', 0.8 * finished / len(saved_files), f'已处理 {finished}/{len(saved_files)} 个文件')
+
+    job.set_stage('processing', 0.0, f'正在处理 {len(saved_files)} 个文件')
+    # 多个文件时并行处理；取消或超时时终止仍在处理的子进程
+    results = process_files(saved_files, cache=get_processed_cache(), progress=on_file_done, should_stop=job.should_stop)
+    job.check()
+    return finish_upload_job(job, workspace, [df for df in results if df is not None], output_format)
+
+def finish_upload_job(job, workspace, all_data, output_format):
+    """合并各文件的处理结果 -> 去重 -> 写出结果"""
+    from main import merge_duplicate_posts, concat_processed, format_for_export
+
+    if not all_data:
+        raise RuntimeError('文件处理失败')
+
+    # 合并所有数据，合并重复的post_id
+    job.set_stage('merging', 0.85, '正在合并数据')
+    final_df = concat_processed(all_data)
+    final_df = merge_duplicate_posts(final_df)
+    job.check()
+
+    # 保留处理结果供预览接口分页查询
+    from preview import RESULT_FILE
+    get_result_store().put((workspace.id, RESULT_FILE), workspace.data_path(RESULT_FILE), final_df)
+
+    # 保存处理后的文件
+    job.set_stage('writing', 0.9, '正在写出结果文件')
+    output_path = output_path_for(workspace.output_path('processed_data'), output_format)
+    write_output(format_for_export(final_df), output_path, output_format)
+    return {
+        'download_url': f'/download/{workspace.id}',
+        'preview_url': f'/preview/{workspace.id}',
+        'csv_url': f'/download/{workspace.id}/csv',
+        'rows': len(final_df)
+    }
+
+@app.route('/uploads', methods=['POST'])
+def create_upload():
+    """开始分块上传：{"files": [{"name": 文件名, "size": 字节数}], "format": 输出格式}
+
+    创建任务后立即返回；文件通过 PUT /uploads/<ID>/files/<序号>?offset=<起始位置> 分块上传，
+    每个文件接收完成后立即开始处理，与其余文件的上传同时进行。
+    """
+    payload = request.get_json(silent=True) or {}
+    try:
+        output_format = check_format(payload.get('format'))
+        files = [(str(entry['name']), int(entry['size'])) for entry in payload.get('files') or []]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except (KeyError, TypeError):
+        return jsonify({'error': '文件列表格式不正确'}), 400
+    if not files:
+        return jsonify({'error': '没有选择文件'}), 400
+    if any(size < 0 for _, size in files):
+        return jsonify({'error': '文件大小不正确'}), 400
+
+    try:
+        workspace = workspaces.create(sum(size for _, size in files))
+    except WorkspaceQuotaExceeded as e:
+        return jsonify({'error': str(e)}), 507
+
+    try:
+        session = upload_sessions.create(workspace, files)
+    except UploadError as e:
+        workspaces.remove(workspace.id)
+        return jsonify({'error': str(e)}), 400
+
+    def on_finish(job):
+        upload_sessions.remove(session.id)
+        workspaces.release(workspace.id)
+
+    # 上传期间任务只登记不执行：第一个文件接收完成后才交给任务线程池，并从那时开始计算处理超时
+    job = job_manager.create('upload', files=[upload.name for upload in session.files], job_id=workspace.id)
+    job.set_stage('uploading', 0.0, f'等待上传 {len(session.files)} 个文件')
+    threading.Thread(
+        target=start_when_uploaded,
+        args=(job, session, lambda job: run_chunked_upload_job(job, workspace, session, output_format), on_finish),
+        name=f'upload-{session.id}',
+        daemon=True
+    ).start()
+    return jsonify({
+        'success': True,
+        'upload_id': session.id,
+        'job_id': job.id,
+        'chunk_size': UPLOAD_CHUNK_BYTES,
+        'files': session.to_dict()['files']
+    }), 201
+
+@app.route('/uploads/<upload_id>')
+def upload_status(upload_id):
+    """查询各文件已接收的字节数，断线后据此继续上传"""
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': '上传不存在或已结束'}), 404
+    return jsonify(session.to_dict())
+
+@app.route('/uploads/<upload_id>/files/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    """接收一个分块（请求体为原始字节），直接写入文件，不在内存中缓冲整个请求"""
+    session = upload_sessions.get(upload_id)
+    if session is None:
+        return jsonify({'error': '上传不存在或已结束'}), 404
+    try:
+        offset = int(request.args.get('offset', 0))
+        received = session.write_chunk(index, offset, request.stream, request.content_length)
+    except UploadOffsetMismatch as e:
+        return jsonify({'error': str(e), 'received': e.received}), 409
+    except (UploadError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    upload = session.files[index]
+    return jsonify({'received': received, 'complete': upload.complete})
+
+def start_when_uploaded(job, session, func, on_finish):
+    """在每个上传各自的线程中等待第一个文件接收完成，再提交处理任务
+
+    等待期间不占用任务线程，缓慢或被放弃的上传不会让其他任务一直排队；
+    长时间没有收到数据时直接标记任务失败，取消的任务交给线程池后立即结束。
+    """
+    while not job.cancelled() and not session.wait_completed(UPLOAD_POLL_SECONDS):
+        if session.idle_seconds() > UPLOAD_IDLE_TIMEOUT:
+            job_manager.fail(job, f'超过 {UPLOAD_IDLE_TIMEOUT // 60} 分钟没有收到上传数据，已放弃', on_finish)
+            return
+    job_manager.start(job, func, on_finish)
+
+def run_chunked_upload_job(job, workspace, session, output_format):
+    """分块上传的处理任务：每当有文件接收完成就开始处理，全部处理完后按文件顺序合并"""
+    from main import process_files, order_files
+
+    def on_file_done(file_path, df):
+        job.set_file_status(os.path.basename(file_path), 'done' if df is not None else 'failed')
+
+    total = len(session.files)
+    results = {}
+    while len(results) < total:
+        job.check()
+        ready = session.take_completed(UPLOAD_POLL_SECONDS)
+        if not ready:
+            if session.idle_seconds() > UPLOAD_IDLE_TIMEOUT:
+                raise RuntimeError(f'超过 {UPLOAD_IDLE_TIMEOUT // 60} 分钟没有收到上传数据，已放弃')
+            continue
+        job.set_stage('processing', 0.8 * len(results) / total,
+                      f'已处理 {len(results)}/{total} 个文件，正在处理 {len(ready)} 个文件')
+        # 同时接收完成的多个文件并行处理；取消或超时时终止仍在处理的子进程
+        processed = process_files(ready, cache=get_processed_cache(), progress=on_file_done, should_stop=job.should_stop)
+        results.update(zip(ready, processed))
+        job.set_stage('processing', 0.8 * len(results) / total, f'已处理 {len(results)}/{total} 个文件')
+    job.check()
+
+    # 与一次性上传相同：国内文件在前、国外文件在后，按文件名排序后合并
+    all_data = [results[path] for path in order_files(list(results)) if results[path] is not None]
+    return finish_upload_job(job, workspace, all_data, output_format)
+
+@app.route('/download/<result_id>')
+def download(result_id):
+    return send_result(result_id, '文件不存在')
+
+@app.route('/download/<result_id>/csv')
+def download_csv(result_id):
+    from preview import RESULT_FILE
+    return stream_result(result_id, RESULT_FILE, '', '文件不存在')
+
+@app.route('/preview/<result_id>')
+def preview_result(result_id):
+    """分页查询上传任务的处理结果，参数见 preview.parse_query"""
+    from preview import RESULT_FILE, parse_query
+    workspace = workspaces.get(result_id)
+    result = get_result(workspace, RESULT_FILE)
+    if result is None:
+        return jsonify({'error': '预览数据不存在'}), 404
+    workspace.touch()
+    try:
+        return jsonify(result.page(**parse_query(request.args)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
 @app.route('/compare', methods=['POST'])
 def compare_files():
@@ -152,77 +415,129 @@ def compare_files():
     
     if not file1 or not file2:
         return jsonify({'error': '请选择两个文件'}), 400
+    
+    try:
+        output_format = check_format(request.form.get('format'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     try:
-        # 清理比较文件夹
-        for filename in os.listdir(COMPARE_FOLDER):
-            file_path = os.path.join(COMPARE_FOLDER, filename)
-            try:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                print(f"清理文件失败 {file_path}: {e}")
+        workspace = workspaces.create(request.content_length or 0)
+    except WorkspaceQuotaExceeded as e:
+        return jsonify({'error': str(e)}), 507
 
+    try:
         # 保存上传的文件，使用安全的文件名
-        file1_path = os.path.join(COMPARE_FOLDER, 'file1.xlsx')
-        file2_path = os.path.join(COMPARE_FOLDER, 'file2.xlsx')
+        file1_path = workspace.input_path('file1.xlsx')
+        file2_path = workspace.input_path('file2.xlsx')
         
         file1.save(file1_path)
         file2.save(file2_path)
 
-        # 执行比较
-        merged_df, calc_df = compare_excel_files(file1_path, file2_path)
-        
-        if merged_df is not None and calc_df is not None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = os.path.join(COMPARE_FOLDER, f"compared_data_{timestamp}.xlsx")
-            
-            # 使用 openpyxl 引擎保存 Excel
-            with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-                merged_df.to_excel(writer, sheet_name='Data', index=False)
-                calc_df.to_excel(writer, sheet_name='Calculation', index=False)
-            
-            return jsonify({
-                'success': True,
-                'message': '文件比较成功',
-                'download_ready': True,
-                'timestamp': timestamp
-            })
-        else:
-            return jsonify({
-                'error': '文件比较失败'
-            }), 500
+        # 执行比较，结果写入任务的输出目录
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_base = workspace.output_path(f"compared_data_{timestamp}")
+        file_names = [file1.filename or 'file1.xlsx', file2.filename or 'file2.xlsx']
+        job = submit_job(
+            'compare',
+            workspace,
+            lambda job: run_compare_job(job, workspace, file1_path, file2_path, output_format, output_base, file_names),
+            file_names
+        )
+        return jsonify({
+            'success': True,
+            'message': '文件已提交比较',
+            'job_id': job.id
+        }), 202
 
     except Exception as e:
+        workspaces.remove(workspace.id)
         return jsonify({
             'error': f'比较过程中出错: {str(e)}'
         }), 500
 
-@app.route('/download_comparison/<timestamp>')
-def download_comparison(timestamp):
-    filename = f"compared_data_{timestamp}.xlsx"
-    file_path = os.path.join(COMPARE_FOLDER, filename)
-    
-    if os.path.exists(file_path):
-        try:
-            return send_file(
-                file_path,
-                as_attachment=True,
-                download_name=filename,
-                mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-        except Exception as e:
-            return jsonify({'error': f'下载文件时出错: {str(e)}'}), 500
-    return jsonify({'error': '比较结果文件不存在'}), 404
+# 比较各阶段对应的进度
+COMPARE_STAGE_PROGRESS = {
+    'reading': (0.1, '正在读取文件'),
+    'comparing': (0.5, '正在比较数据'),
+    'writing': (0.8, '正在写出比较结果'),
+}
+
+def run_compare_job(job, workspace, file1_path, file2_path, output_format, output_base, file_names):
+    """后台执行的比较任务；比较完成或失败后更新两个文件的状态（取消时保持未完成）"""
+    from main import ProcessingCancelled
+    from compare_excel import compare_excel_files
+    from preview import COMPARISON_RESULT_FILES
+
+    def on_stage(stage):
+        job.check()
+        progress, message = COMPARE_STAGE_PROGRESS[stage]
+        job.set_stage(stage, progress, message)
+
+    def set_files_status(status):
+        for name in file_names:
+            job.set_file_status(name, status)
+
+    try:
+        merged_df, calc_df = compare_excel_files(file1_path, file2_path, output_format, output_base, progress=on_stage)
+    except ProcessingCancelled:
+        raise
+    except Exception:
+        set_files_status('failed')
+        raise
+    if merged_df is None or calc_df is None:
+        set_files_status('failed')
+        raise RuntimeError('文件比较失败')
+    set_files_status('done')
+    # 保留两张表供流式下载 CSV
+    store = get_result_store()
+    for sheet_name, df in (('Data', merged_df), ('Calculation', calc_df)):
+        filename = COMPARISON_RESULT_FILES[sheet_name]
+        store.put((workspace.id, filename), workspace.data_path(filename), df)
+    return {
+        'download_url': f'/download_comparison/{workspace.id}',
+        'csv_url': f'/download_comparison/{workspace.id}/csv'
+    }
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'error': '任务不存在'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/download_comparison/<result_id>')
+def download_comparison(result_id):
+    return send_result(result_id, '比较结果文件不存在')
+
+@app.route('/download_comparison/<result_id>/csv')
+def download_comparison_csv(result_id):
+    """流式下载比较结果的一张表，sheet 为 Data（默认）或 Calculation"""
+    from preview import COMPARISON_RESULT_FILES
+    sheet_name = request.args.get('sheet', 'Data')
+    if sheet_name not in COMPARISON_RESULT_FILES:
+        return jsonify({'error': f"sheet 只能为 {', '.join(COMPARISON_RESULT_FILES)}"}), 400
+    return stream_result(result_id, COMPARISON_RESULT_FILES[sheet_name], f'_{sheet_name}', '比较结果文件不存在')
 
 def start_server():
+    mark_startup('服务启动')
+    workspaces.start_cleanup()
     app.run(port=5001, debug=False)
 
 def main():
+    mark_startup('模块导入')
     t = threading.Thread(target=start_server)
     t.daemon = True
     t.start()
     
+    import webview
     webview.create_window(
         'Excel 处理工具', 
         'http://localhost:5001',
@@ -230,7 +545,10 @@ def main():
         height=600,
         resizable=True
     )
+    mark_startup('创建窗口')
     webview.start()
 
 if __name__ == '__main__':
+    # 打包后的可执行文件使用多进程时需要
+    multiprocessing.freeze_support()
     main()
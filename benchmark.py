@@ -0,0 +1,665 @@
+"""性能基准脚本
+
+用法:
+    python benchmark.py load --rows 50000
+    python benchmark.py stream --rows 50000 --chunk-size 5000
+    python benchmark.py game_label --rows 200000
+    python benchmark.py dates --rows 1000000 --repeat 1
+    python benchmark.py dedup --rows 20000
+    python benchmark.py writers --rows 100000 --repeat 1
+    python benchmark.py csv --rows 500000 --repeat 1
+    python benchmark.py metrics --rows 200000
+    python benchmark.py schema --rows 200000
+    python benchmark.py sheets --rows 20000 --sheets 4
+    python benchmark.py stages --rows 200000
+    python benchmark.py post_key --rows 200000
+    python benchmark.py row_loops --rows 200000
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import io
+import random
+import re
+import tracemalloc
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+import main
+import writers
+
+
+def timed(func, repeat=3):
+    """执行 repeat 次，返回最短耗时（秒）和最后一次的结果"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # 屏蔽处理过程中的调试输出
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def make_sample_frame(rows, seed=0):
+    """生成模拟平台导出的数据"""
+    rng = random.Random(seed)
+    posts = ["流放之路 新赛季攻略", "吃鸡 精彩时刻", "随便聊聊", "黑神话 悟空 实况", "日常 vlog"]
+    base = datetime(2024, 1, 1)
+    return pd.DataFrame({
+        "作品名称": [rng.choice(posts) + str(i) for i in range(rows)],
+        "发布时间": [(base + timedelta(minutes=7 * i)).strftime("%Y年%m月%d日 %H:%M:%S") for i in range(rows)],
+        "播放量": [rng.randint(0, 10 ** 6) for _ in range(rows)],
+        "点赞": [rng.randint(0, 10 ** 4) for _ in range(rows)],
+        "评论": [rng.randint(0, 1000) for _ in range(rows)],
+        "平均播放时长": [f"{rng.uniform(1, 60):.1f}秒" for _ in range(rows)],
+    })
+
+
+def write_sample_excel(path, rows):
+    """写入带标题行的 xlsx，使表头位于第 2 行
+
+    平台导出的 xlsx 使用共享字符串表，每次打开都要完整解析；xlsxwriter 的输出与之一致，
+    openpyxl 只会写内联字符串，仅在未安装 xlsxwriter 时使用。
+    """
+    df = make_sample_frame(rows)
+    try:
+        import xlsxwriter  # noqa: F401
+        engine = 'xlsxwriter'
+    except ImportError:
+        engine = 'openpyxl'
+    with pd.ExcelWriter(path, engine=engine) as writer:
+        pd.DataFrame([["数据导出"]]).to_excel(writer, index=False, header=False)
+        df.to_excel(writer, index=False, startrow=1)
+
+
+def write_sample_csv(path, rows, encoding='gbk'):
+    """写入 GBK 编码的 CSV（平台导出的 CSV 通常没有标题行）"""
+    make_sample_frame(rows).to_csv(path, index=False, encoding=encoding)
+
+
+def legacy_two_pass_read(file_path):
+    """旧的读取方式：先读前 5 行确定表头，再按表头重新读取整个文件"""
+    if file_path.endswith('.xlsx'):
+        df_head = pd.read_excel(file_path, nrows=5, header=None)
+        header_row = main.detect_header_row(df_head)
+        return pd.read_excel(file_path, header=header_row)
+
+    for encoding in ['utf-8', 'gbk', 'gb2312', 'utf-16']:
+        try:
+            df_head = pd.read_csv(file_path, nrows=5, header=None, encoding=encoding)
+            break
+        except Exception:
+            continue
+    header_row = main.detect_header_row(df_head)
+    return pd.read_csv(file_path, encoding=encoding, header=header_row)
+
+
+def bench_load(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        xlsx_path = os.path.join(tmp, "抖音-benchmark.xlsx")
+        csv_path = os.path.join(tmp, "抖音-benchmark.csv")
+        write_sample_excel(xlsx_path, args.rows)
+        write_sample_csv(csv_path, args.rows)
+
+        for path in [xlsx_path, csv_path]:
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"样例文件: {os.path.basename(path)}, {args.rows} 行, {size_mb:.1f} MB")
+
+            legacy_time, legacy_df = timed(lambda: legacy_two_pass_read(path), args.repeat)
+            single_time, single_df = timed(lambda: main.read_table(path), args.repeat)
+
+            pd.testing.assert_frame_equal(legacy_df, single_df)
+            print(f"  两次读取: {legacy_time:.3f}s")
+            print(f"  单次读取: {single_time:.3f}s")
+            print(f"  耗时降低: {(1 - single_time / legacy_time) * 100:.1f}%")
+
+
+def peak_memory(func):
+    """返回 func 执行期间 tracemalloc 记录的峰值内存（MB）与耗时（秒）"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, elapsed
+
+
+def bench_stream(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "抖音-benchmark.xlsx")
+        write_sample_excel(path, args.rows)
+        print(f"样例文件: {args.rows} 行, 批大小 {args.chunk_size} 行")
+
+        def consume_stream():
+            for chunk in main.iter_process_excel(path, chunk_size=args.chunk_size):
+                pass
+
+        full_peak, full_time = peak_memory(lambda: main.process_excel(path))
+        stream_peak, stream_time = peak_memory(consume_stream)
+        print(f"  整体处理: 峰值 {full_peak:.1f} MB, 耗时 {full_time:.3f}s")
+        print(f"  流式处理: 峰值 {stream_peak:.1f} MB, 耗时 {stream_time:.3f}s")
+
+
+def make_sample_posts(rows, seed=0):
+    """生成长文本 post，约三成包含游戏关键词"""
+    rng = random.Random(seed)
+    words = "今天 我们 一起 来 看看 这个 视频 精彩 时刻 攻略 日常 vlog the game is fun play with friends".split()
+    keywords = [kw for keywords in main.DEFAULT_GAME_RULES.values() for kw in keywords]
+    posts = []
+    for _ in range(rows):
+        post = [rng.choice(words) for _ in range(40)]
+        if rng.random() < 0.3:
+            post.insert(rng.randint(0, len(post)), rng.choice(keywords).upper())
+        posts.append(" ".join(post))
+    return pd.Series(posts)
+
+
+def bench_game_label(args):
+    posts = make_sample_posts(args.rows)
+    print(f"样例 post: {args.rows} 行")
+
+    apply_time, apply_labels = timed(lambda: posts.apply(main.determine_game_label), args.repeat)
+    vector_time, vector_labels = timed(lambda: main.label_games(posts), args.repeat)
+
+    assert (apply_labels == vector_labels).all()
+    print(f"  逐行 apply: {apply_time:.3f}s")
+    print(f"  向量化匹配: {vector_time:.3f}s")
+    print(f"  加速比: {apply_time / vector_time:.1f}x")
+
+
+def legacy_convert_dates(values):
+    """旧的日期处理：两次逐行 convert_date，再逐行生成 date 列"""
+    def convert_full(date_val):
+        if pd.isna(date_val):
+            return date_val
+        date_str = str(date_val).strip()
+        if '年' in date_str and '月' in date_str and '日' in date_str:
+            match = re.search(r'(\d{4})年(\d{2})月(\d{2})日\s*(\d{2})?:?(\d{2})?:?(\d{2})?', date_str)
+            if match:
+                year, month, day, hours, minutes, seconds = match.groups()
+                return f"{year}-{month}-{day}_{hours or '00'}:{minutes or '00'}:{seconds or '00'}"
+        parsed_date = pd.to_datetime(date_str, errors='coerce')
+        if pd.notna(parsed_date):
+            return parsed_date.strftime('%Y-%m-%d_%H:%M:%S')
+        return date_str
+
+    def convert_day(date_val):
+        if pd.isna(date_val):
+            return date_val
+        date_str = str(date_val).strip()
+        if '年' in date_str and '月' in date_str and '日' in date_str:
+            match = re.search(r'(\d{4})年(\d{2})月(\d{2})日', date_str)
+            if match:
+                year, month, day = match.groups()
+                return f"{year}-{month}-{day}"
+        parsed_date = pd.to_datetime(date_str, errors='coerce')
+        if pd.notna(parsed_date):
+            return parsed_date.strftime('%Y-%m-%d')
+        return date_str
+
+    published = values.apply(convert_full).apply(convert_day)
+    dates = published.apply(
+        lambda x: str(x).split('_')[0] if pd.notna(x) and '_' in str(x) else (str(x).split(' ')[0] if pd.notna(x) and ' ' in str(x) else (str(x) if pd.notna(x) else pd.NA))
+    )
+    return published, pd.to_datetime(dates, errors='coerce').dt.strftime('%Y-%m-%d')
+
+
+def make_sample_dates(rows, seed=0):
+    """生成混合格式的发布时间：中文格式、ISO 格式和 Excel 日期单元格"""
+    rng = random.Random(seed)
+    base = datetime(2023, 1, 1)
+    values = []
+    for i in range(rows):
+        value = base + timedelta(seconds=rng.randint(0, 3 * 365 * 86400))
+        kind = i % 3
+        if kind == 0:
+            values.append(value.strftime("%Y年%m月%d日 %H:%M:%S"))
+        elif kind == 1:
+            values.append(value.strftime("%Y-%m-%d %H:%M:%S"))
+        else:
+            values.append(value)
+    return pd.Series(values, dtype=object)
+
+
+def bench_dates(args):
+    values = make_sample_dates(args.rows)
+    print(f"样例发布时间: {args.rows} 行")
+
+    vector_time, (published, dates) = timed(lambda: main.normalize_dates(values), args.repeat)
+    print(f"  向量化日期处理: {vector_time:.3f}s")
+    if args.no_legacy:
+        return
+
+    legacy_time, (legacy_published, legacy_dates) = timed(lambda: legacy_convert_dates(values), args.repeat)
+    assert (published == legacy_published).all() and (dates == legacy_dates).all()
+    print(f"  逐行日期处理: {legacy_time:.3f}s")
+    print(f"  加速比: {legacy_time / vector_time:.1f}x")
+
+
+def legacy_merge_duplicates(final_df):
+    """旧的 /upload 合并方式：逐个 post_id、逐列用 .loc 累加"""
+    numeric_cols = ['video_views', 'like', 'comment', 'share', 'collect']
+    unique_records = final_df[~final_df['post_id'].duplicated(keep='first')].copy()
+    duplicate_records = final_df[final_df['post_id'].duplicated(keep='first')]
+    sums = duplicate_records.groupby('post_id')[numeric_cols].sum()
+    for post_id in sums.index:
+        mask = unique_records['post_id'] == post_id
+        for col in numeric_cols:
+            unique_records.loc[mask, col] += sums.loc[post_id, col]
+    return unique_records
+
+
+def make_sample_processed(rows, duplicate_ratio=0.2, seed=0):
+    """生成已处理格式的数据，其中约 duplicate_ratio 的行与之前的 post_id 重复"""
+    rng = random.Random(seed)
+    unique_count = max(1, int(rows * (1 - duplicate_ratio)))
+    post_ids = [f"post_{i}" for i in range(unique_count)]
+    post_ids += [rng.choice(post_ids) for _ in range(rows - unique_count)]
+    df = pd.DataFrame({col: pd.NA for col in main.MASTER_COLUMNS}, index=range(rows))
+    df['post_id'] = post_ids
+    df['post'] = [f"post text {post_id}" for post_id in post_ids]
+    for col in ['video_views', 'like', 'comment', 'share', 'collect', 'subscribers']:
+        df[col] = [rng.randint(0, 1000) for _ in range(rows)]
+    return df
+
+
+def bench_dedup(args):
+    df = make_sample_processed(args.rows)
+    print(f"样例数据: {args.rows} 行, 重复 post_id {df['post_id'].duplicated().sum()} 行")
+
+    new_time, merged = timed(lambda: main.merge_duplicate_posts(df), args.repeat)
+    print(f"  groupby 合并: {new_time:.3f}s")
+    if args.no_legacy:
+        return
+
+    legacy_time, legacy_merged = timed(lambda: legacy_merge_duplicates(df), args.repeat)
+    # 合并结果的指标列会收窄为能容纳取值的最窄整数类型
+    pd.testing.assert_frame_equal(merged, main.narrow_integer_columns(legacy_merged))
+    print(f"  逐个 post_id 合并: {legacy_time:.3f}s")
+    print(f"  加速比: {legacy_time / new_time:.1f}x")
+
+
+def legacy_csv_read(file_path):
+    """旧的 CSV 读取方式：依次尝试编码读取前 5 行，成功后按该编码用 C 解析器重新读取整个文件"""
+    for encoding in ['utf-8', 'gbk', 'gb2312', 'utf-16']:
+        try:
+            df_head = pd.read_csv(file_path, nrows=5, header=None, encoding=encoding)
+            break
+        except Exception:
+            continue
+    header_row = main.detect_header_row(df_head)
+    return pd.read_csv(file_path, encoding=encoding, header=header_row)
+
+
+def bench_csv(args):
+    pa, pa_csv = main._import_pyarrow_csv()
+    if pa_csv is None:
+        print("未安装 pyarrow，只对比编码探测与单次解码（解析器均为 pandas C 解析器）")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, filename, encoding in [("小红书 GBK", "小红书-benchmark.csv", "gbk"), ("抖音 UTF-8", "抖音-benchmark.csv", "utf-8-sig")]:
+            path = os.path.join(tmp, filename)
+            write_sample_csv(path, args.rows, encoding=encoding)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"{label}: {args.rows} 行, {size_mb:.1f} MB")
+
+            legacy_time, legacy_df = (None, None) if args.no_legacy else timed(lambda: legacy_csv_read(path), args.repeat)
+            new_time, new_df = timed(lambda: main.read_table(path), args.repeat)
+            if legacy_df is not None:
+                pd.testing.assert_frame_equal(legacy_df, new_df)
+                print(f"  旧方式: {legacy_time:.3f}s ({size_mb / legacy_time:.1f} MB/s)")
+            print(f"  read_table: {new_time:.3f}s ({size_mb / new_time:.1f} MB/s)")
+            if legacy_time:
+                print(f"  加速比: {legacy_time / new_time:.2f}x")
+
+
+def make_sample_metrics(rows, seed=0):
+    """生成 Excel 读入后的指标列：以整数为主，混有千位分隔符、带单位、全角数字、占位符和空值"""
+    rng = random.Random(seed)
+    kinds = [
+        lambda: rng.randint(0, 100000),
+        lambda: rng.randint(0, 100000),
+        lambda: rng.randint(0, 100000),
+        lambda: f"{rng.randint(1000, 999999):,}",
+        lambda: f"{rng.randint(10, 999) / 10}万",
+        lambda: f"{rng.randint(10, 99) / 10}w",
+        lambda: f"{rng.randint(1, 999)}k",
+        lambda: "１２３",
+        lambda: "-",
+        lambda: None,
+    ]
+    return pd.DataFrame({
+        col: pd.Series([rng.choice(kinds)() for _ in range(rows)], dtype=object)
+        for col in main.METRIC_COLUMNS
+    })
+
+
+def legacy_parse_metrics(df):
+    """旧的数值列处理：每列单独转换为字符串、替换、正则提取后取整"""
+    for col in main.METRIC_COLUMNS:
+        df[col] = df[col].astype(str)
+        df[col] = df[col].str.replace(',', '').str.replace('，', '')
+        df[col] = df[col].str.extract(r'([-+]?\d*\.?\d+)', expand=False)
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64')
+    return df
+
+
+def bench_metrics(args):
+    df = make_sample_metrics(args.rows)
+    print(f"样例数据: {args.rows} 行 x {len(main.METRIC_COLUMNS)} 个指标列")
+
+    new_time, parsed = timed(lambda: main.parse_metric_columns(df.copy()), args.repeat)
+    print(f"  合并解析: {new_time:.3f}s")
+    if args.no_legacy:
+        return
+
+    legacy_time, legacy = timed(lambda: legacy_parse_metrics(df.copy()), args.repeat)
+    # 不带单位、不含全角数字的值两种方式结果应一致
+    plain = df.apply(lambda s: ~s.astype(str).str.contains('[万wk１２３]'))
+    for col in main.METRIC_COLUMNS:
+        pd.testing.assert_series_equal(parsed[col][plain[col]], legacy[col][plain[col]])
+    changed = int((parsed != legacy).to_numpy().sum())
+    print(f"  逐列解析: {legacy_time:.3f}s")
+    print(f"  加速比: {legacy_time / new_time:.1f}x")
+    print(f"  单位/全角值修正: {changed} 个单元格（例如 1.2万 旧方式为 1，现为 12000）")
+
+
+def bench_schema(args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        typed = [main.normalize_dataframe(make_sample_frame(args.rows, seed=seed), filename)
+                 for seed, filename in enumerate(["抖音-账号A.xlsx", "快手-账号B.xlsx"])]
+    # 紧凑类型之前的表示：日期和标签为文本，指标为 int64
+    legacy = [main.format_for_export(df).astype({col: 'int64' for col in main.METRIC_COLUMNS}) for df in typed]
+
+    merged_time, merged = timed(lambda: main.concat_processed([df.copy() for df in typed]), args.repeat)
+    legacy_merged = pd.concat(legacy, ignore_index=True)
+    print(f"样例数据: 2 个文件 x {args.rows} 行，合并耗时 {merged_time:.3f}s")
+
+    before = legacy_merged.memory_usage(deep=True, index=False)
+    after = merged.memory_usage(deep=True, index=False)
+    for col in main.MASTER_COLUMNS:
+        if before[col] != after[col]:
+            print(f"  {col}: {legacy_merged[col].dtype} {before[col] / 1024 / 1024:.1f} MB -> "
+                  f"{merged[col].dtype} {after[col] / 1024 / 1024:.1f} MB")
+    print(f"  合计: {before.sum() / 1024 / 1024:.1f} MB -> {after.sum() / 1024 / 1024:.1f} MB "
+          f"({after.sum() / before.sum():.0%})")
+
+    upcast = [col for col in main.CATEGORY_COLUMNS + list(main.DATETIME_COLUMNS) if merged[col].dtype == object]
+    if upcast:
+        print(f"  警告: 合并后退回 object 的列: {upcast}")
+
+
+def write_sample_workbook(path, rows, sheets):
+    """写入每个 sheet 一个月份的多 sheet 工作簿（表头位于第 2 行）"""
+    with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+        for i in range(sheets):
+            sheet_name = f"{i + 1}月"
+            pd.DataFrame([["数据导出"]]).to_excel(writer, sheet_name=sheet_name, index=False, header=False)
+            make_sample_frame(rows, seed=i).to_excel(writer, sheet_name=sheet_name, index=False, startrow=1)
+
+
+def legacy_per_sheet_process(file_path):
+    """手工拆分的方式：每个 sheet 单独打开工作簿读取并依次处理"""
+    results = []
+    for sheet_name in pd.ExcelFile(file_path).sheet_names:
+        raw_df = pd.read_excel(file_path, sheet_name=sheet_name, header=None)
+        df = main.promote_header(raw_df, main.detect_header_row(raw_df))
+        processed = main.normalize_dataframe(df, os.path.basename(file_path))
+        processed[main.SHEET_NAME_COLUMN] = sheet_name
+        results.append(processed)
+    return results
+
+
+def bench_sheets(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "抖音-benchmark.xlsx")
+        write_sample_workbook(path, args.rows, args.sheets)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"样例文件: {args.sheets} 个 sheet x {args.rows} 行, {size_mb:.1f} MB")
+
+        new_time, processed = timed(lambda: main.process_excel(path), args.repeat)
+        print(f"  一次打开、并行处理各 sheet: {new_time:.3f}s")
+        if args.no_legacy:
+            return
+
+        legacy_time, legacy = timed(lambda: legacy_per_sheet_process(path), args.repeat)
+        legacy = main.format_for_export(main.concat_processed(legacy))
+        pd.testing.assert_frame_equal(main.format_for_export(processed), legacy)
+        print(f"  每个 sheet 单独打开: {legacy_time:.3f}s")
+        print(f"  加速比: {legacy_time / new_time:.1f}x")
+
+
+def legacy_clean_posts(posts):
+    """原来的 post 处理：逐行 re.sub 清理，之后再逐行替换一次换行符"""
+    def clean_post(text):
+        if pd.isna(text): return ""
+        return re.sub(r'\s+', ' ', str(text).strip()).replace('\n', ' ')
+
+    cleaned = posts.apply(clean_post)
+    return cleaned.astype(str).apply(lambda x: x.replace('\n', ' ').replace('\r', ''))
+
+
+def bench_stages(args):
+    df = make_sample_frame(args.rows)
+    # 加入需要合并的空白字符（全角空格、换行、制表符）
+    df["作品名称"] = df["作品名称"].str.replace(" ", "\u3000\n ", regex=False) + "\t"
+    timings = {}
+    total, _ = timed(lambda: main.normalize_dataframe(df.copy(), "抖音-账号A.xlsx", timings=timings), args.repeat)
+    print(f"样例数据: {args.rows} 行，规范化耗时 {total:.3f}s（各阶段为 {args.repeat} 次的平均值）")
+    for name, seconds in timings.items():
+        print(f"  {name}: {seconds / args.repeat * 1000:.1f}ms")
+
+    posts = df["作品名称"]
+    new_time, cleaned = timed(lambda: main.stage_post_text(pd.DataFrame({"post": posts}), None)["post"], args.repeat)
+    legacy_time, legacy = timed(lambda: legacy_clean_posts(posts), args.repeat)
+    pd.testing.assert_series_equal(cleaned, legacy, check_names=False, check_dtype=False)
+    print(f"post 文本: 按列处理一次 {new_time:.3f}s，原来逐行处理两次 {legacy_time:.3f}s，"
+          f"加速比 {legacy_time / new_time:.1f}x")
+
+
+def legacy_build_post_ids(df):
+    """旧的 post_id 生成方式：iterrows 逐行拼接"""
+    post_ids = []
+    for _, row in df.iterrows():
+        post = str(row['post']) if pd.notna(row['post']) else 'unknown_post'
+        post = post.replace('\n', ' ').replace('\r', '')
+        network = str(row['network']) if pd.notna(row['network']) else 'unknown_network'
+        profile = str(row['profile']) if pd.notna(row['profile']) else 'unknown_profile'
+        pub_date = row['published_date']
+        pub_date_str = 'unknown_date' if pd.isna(pub_date) else pub_date.replace('/', '-').replace(' ', '_')
+        post_ids.append(f"{post}_{network}_{profile}_{pub_date_str}")
+    return pd.Series(post_ids, index=df.index, name='post_id')
+
+
+def legacy_merge_by_text(df):
+    """按 post_id 文本分组的合并方式（引入 post_key 之前）"""
+    sum_cols = [col for col, policy in main.DEDUP_POLICIES.items() if policy == 'sum' and col in df.columns]
+    unique_posts = df.drop_duplicates('post_id', keep='first')
+    aggregated = df[sum_cols].astype('int64').groupby(df['post_id'], sort=False, dropna=False).sum()
+    for col in sum_cols:
+        unique_posts[col] = aggregated[col].to_numpy()
+    return main.narrow_integer_columns(unique_posts)
+
+
+def make_sample_long_ids(rows, duplicate_ratio=0.2, seed=0):
+    """生成需要合成 post_id 的数据：post 为较长的文本，约 duplicate_ratio 的行与之前的行重复（模拟重复导出）"""
+    rng = random.Random(seed)
+    unique_count = max(1, int(rows * (1 - duplicate_ratio)))
+    base = datetime(2024, 1, 1)
+    words = ["流放之路", "新赛季", "攻略", "精彩时刻", "黑神话", "悟空", "实况", "日常", "vlog", "开箱"]
+    records = [(" ".join(rng.choice(words) for _ in range(20)) + f" #{i}",
+                rng.choice(["抖音", "B站", "小红书"]), f"账号{rng.randint(0, 200)}",
+                (base + timedelta(minutes=7 * i)).strftime("%Y-%m-%d_%H:%M:%S"))
+               for i in range(unique_count)]
+    records += [rng.choice(records[:unique_count]) for _ in range(rows - unique_count)]
+    df = pd.DataFrame(records, columns=['post', 'network', 'profile', 'published_date'])
+    for col in ['video_views', 'like', 'comment', 'share', 'collect']:
+        df[col] = [rng.randint(0, 1000) for _ in range(rows)]
+    return df
+
+
+def bench_post_key(args):
+    df = make_sample_long_ids(args.rows)
+    ids_time, with_ids = timed(lambda: main.stage_post_id(df.copy(), None), args.repeat)
+    print(f"样例数据: {args.rows} 行，post_id 平均长度 {with_ids['post_id'].str.len().mean():.0f} 个字符")
+    print(f"  生成 post_id（按列拼接）: {ids_time:.3f}s")
+    if not args.no_legacy:
+        legacy_time, legacy_ids = timed(lambda: legacy_build_post_ids(df), 1)
+        pd.testing.assert_series_equal(with_ids['post_id'], legacy_ids, check_dtype=False)
+        print(f"  生成 post_id（iterrows）: {legacy_time:.3f}s，加速比 {legacy_time / ids_time:.1f}x")
+
+    key_time, keyed = timed(lambda: main.stage_post_key(with_ids.copy(), None), args.repeat)
+    id_mb = keyed['post_id'].memory_usage(deep=True, index=False) / 1024 / 1024
+    key_mb = keyed[main.POST_KEY_COLUMN].memory_usage(index=False) / 1024 / 1024
+    print(f"  生成 post_key: {key_time:.3f}s；post_id 列 {id_mb:.1f} MB，post_key 列 {key_mb:.1f} MB")
+
+    # 去重：规范化时已生成 post_key，合并时按哈希键分组
+    text_time, by_text = timed(lambda: legacy_merge_by_text(with_ids), args.repeat)
+    key_time, by_key = timed(lambda: main.merge_duplicate_posts(keyed), args.repeat)
+    pd.testing.assert_frame_equal(by_key.drop(columns=main.POST_KEY_COLUMN), by_text)
+    text_peak, _ = peak_memory(lambda: legacy_merge_by_text(with_ids))
+    key_peak, _ = peak_memory(lambda: main.merge_duplicate_posts(keyed))
+    print(f"  去重（{args.rows - len(by_key)} 行重复）: 按 post_id 文本 {text_time:.3f}s / 峰值 {text_peak:.1f} MB，"
+          f"按 post_key {key_time:.3f}s / 峰值 {key_peak:.1f} MB")
+
+    # 比较：新旧两个文件按 post_id 关联（读取的结果文件没有 post_key，两边一起编号后按整数编号关联）
+    old = by_text[['post_id', 'video_views']].rename(columns={'video_views': 'video_views_old'})
+    new = with_ids[['post_id', 'video_views']]
+
+    def join_by_key():
+        post_ids = pd.concat([new['post_id'], old['post_id']], ignore_index=True)
+        codes, _ = pd.factorize(post_ids, use_na_sentinel=False)
+        return pd.merge(new.assign(post_key=codes[:len(new)]), old[['video_views_old']].assign(post_key=codes[len(new):]),
+                        on='post_key', how='left').drop(columns='post_key')
+
+    text_time, joined_text = timed(lambda: pd.merge(new, old[['post_id', 'video_views_old']], on='post_id', how='left'), args.repeat)
+    key_time, joined_key = timed(join_by_key, args.repeat)
+    pd.testing.assert_frame_equal(joined_key, joined_text)
+    text_peak, _ = peak_memory(lambda: pd.merge(new, old[['post_id', 'video_views_old']], on='post_id', how='left'))
+    key_peak, _ = peak_memory(join_by_key)
+    print(f"  比较关联: 按 post_id 文本 {text_time:.3f}s / 峰值 {text_peak:.1f} MB，"
+          f"按整数编号 {key_time:.3f}s / 峰值 {key_peak:.1f} MB")
+
+
+def legacy_parse_durations(values):
+    """旧的 avg_play_duration 处理：逐行 re.search 和 float"""
+    processed_values = []
+    for value in values:
+        if pd.isna(value):
+            processed_values.append(0)
+            continue
+        value_str = str(value)
+        if '秒' in value_str:
+            match = re.search(r'(\d+\.?\d*)', value_str)
+            processed_values.append(float(match.group(1)) if match else 0)
+        else:
+            try:
+                processed_values.append(float(value_str))
+            except ValueError:
+                match = re.search(r'(\d+\.?\d*)', value_str)
+                processed_values.append(float(match.group(1)) if match else 0)
+    return processed_values
+
+
+def legacy_region_labels(profiles):
+    """旧的国内/国外标签：逐行判断账号名称中是否包含关键词"""
+    return ['未知' if pd.isna(profile) else
+            ('国外' if any(kw in str(profile) for kw in main.OVERSEAS_PROFILE_KEYWORDS) else '国内')
+            for profile in profiles]
+
+
+def make_sample_profiles(rows, seed=0):
+    """生成账号名称：约 1/4 为海外账号，少量缺失"""
+    rng = random.Random(seed)
+    names = ["主号", "小号", "官方", "海外号", "国际服", "Global", "攻略组", "直播间"]
+    return pd.Series([None if rng.random() < 0.02 else f"{rng.choice(names)}{rng.randint(0, 500)}"
+                      for _ in range(rows)])
+
+
+def bench_row_loops(args):
+    df = make_sample_frame(args.rows)
+    durations = df["平均播放时长"]
+    print(f"样例数据: {args.rows} 行")
+
+    new_time, parsed = timed(lambda: main.parse_duration_values(durations), args.repeat)
+    legacy_time, legacy = timed(lambda: legacy_parse_durations(durations), args.repeat)
+    assert parsed.tolist() == legacy
+    print(f"  avg_play_duration: 按列 {new_time:.3f}s，逐行 {legacy_time:.3f}s，加速比 {legacy_time / new_time:.1f}x")
+
+    profiles = make_sample_profiles(args.rows)
+    ctx = main.NormalizeContext("抖音-账号A.xlsx")
+    new_time, labeled = timed(lambda: main.stage_labels(pd.DataFrame({"profile": profiles}), ctx), args.repeat)
+    legacy_time, legacy = timed(lambda: legacy_region_labels(profiles), args.repeat)
+    assert labeled["domestic_overseas_label"].tolist() == legacy
+    print(f"  domestic_overseas_label: 按列 {new_time:.3f}s，逐行 {legacy_time:.3f}s，加速比 {legacy_time / new_time:.1f}x")
+
+    # date 列在 normalize_dates 中与 published_date 一起按列生成
+    print("  published_date / date:")
+    bench_dates(args)
+
+
+def bench_writers(args):
+    df = make_sample_processed(args.rows)
+    formats = ['xlsx', 'csv']
+    try:
+        import pyarrow  # noqa: F401
+        formats += ['parquet', 'feather']
+    except ImportError:
+        print("未安装 pyarrow，跳过 parquet/feather")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"样例数据: {args.rows} 行 x {len(df.columns)} 列")
+        if not args.no_legacy:
+            legacy_path = os.path.join(tmp, "legacy.xlsx")
+            legacy_time, _ = timed(lambda: df.to_excel(legacy_path, index=False, engine='openpyxl'), args.repeat)
+            legacy_peak, _ = peak_memory(lambda: df.to_excel(legacy_path, index=False, engine='openpyxl'))
+            print(f"  to_excel(openpyxl): {legacy_time:.3f}s, 峰值 {legacy_peak:.1f} MB")
+
+        for fmt in formats:
+            path = writers.output_path_for(os.path.join(tmp, "benchmark"), fmt)
+            elapsed, _ = timed(lambda: writers.write_output(df, path, fmt), args.repeat)
+            peak, _ = peak_memory(lambda: writers.write_output(df, path, fmt))
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            print(f"  write_output({fmt}): {elapsed:.3f}s, 峰值 {peak:.1f} MB, 文件 {size_mb:.1f} MB")
+
+
+BENCHMARKS = {
+    "load": bench_load,
+    "stream": bench_stream,
+    "game_label": bench_game_label,
+    "dates": bench_dates,
+    "dedup": bench_dedup,
+    "writers": bench_writers,
+    "csv": bench_csv,
+    "metrics": bench_metrics,
+    "schema": bench_schema,
+    "sheets": bench_sheets,
+    "stages": bench_stages,
+    "post_key": bench_post_key,
+    "row_loops": bench_row_loops,
+}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Excel 处理工具性能基准")
+    parser.add_argument("name", choices=sorted(BENCHMARKS), help="要运行的基准")
+    parser.add_argument("--rows", type=int, default=50000, help="样例数据行数")
+    parser.add_argument("--repeat", type=int, default=3, help="重复次数（取最短耗时）")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="流式处理的批大小")
+    parser.add_argument("--sheets", type=int, default=4, help="多 sheet 工作簿的 sheet 数")
+    parser.add_argument("--no-legacy", action="store_true", help="只运行新实现（旧实现在大数据量下很慢）")
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
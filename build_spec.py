@@ -16,11 +16,13 @@ a = Analysis(
         'webview',
         'pandas',
         'openpyxl',
+        'xlsxwriter',
         'numpy',
     ],
     hookspath=[],
     runtime_hooks=[],
-    excludes=[],
+    # pandas 的可选依赖，本工具用不到；单文件版每次启动都要解压全部内容，包越小启动越快
+    excludes=['matplotlib', 'scipy', 'IPython', 'pytest'],
     noarchive=False
 )
 
@@ -0,0 +1,194 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+import main
+from workspace import make_private_dir
+
+# 缓存目录的默认容量上限，超出后按最近使用时间淘汰
+CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# 处理逻辑发生不兼容的变化时递增，使旧的缓存全部失效
+CACHE_FORMAT_VERSION = 3
+
+# 处理结果优先以 Feather（Arrow IPC，按列存储，读取时不执行任何代码）保存；
+# 未安装 pyarrow 或无法按列原样还原（如同时含数字和文本的 object 列）时退回 pickle
+FEATHER_SUFFIX = '.feather'
+PICKLE_SUFFIX = '.pkl'
+CACHE_SUFFIXES = (FEATHER_SUFFIX, PICKLE_SUFFIX)
+
+# Feather 文件元数据中记录原为 object 类型的列及其缺失值（NaN、pd.NA 或 None），读取时还原
+# （Arrow 会把只含整数的 object 列读为 int64，缺失值统一读为 None）
+OBJECT_COLUMNS_KEY = b'excel_processor.object_columns'
+MISSING_VALUES = {'nan': np.nan, 'na': pd.NA, 'none': None}
+
+
+def file_content_hash(file_path, block_size=1024 * 1024):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def active_stages():
+    """实际执行的规范化阶段：名称、函数和限定的平台（register_stage 添加或替换、SKIP_STAGES 跳过的阶段都会改变结果）"""
+    return [
+        [stage['name'], f"{stage['func'].__module__}.{stage['func'].__qualname__}", sorted(stage['platforms'] or [])]
+        for stage in main.NORMALIZE_STAGES if stage['name'] not in main.SKIP_STAGES
+    ]
+
+
+def rules_fingerprint():
+    """处理规则的指纹：列名映射、主列模板、平台映射、游戏标签规则或规范化阶段变化时，缓存自动失效"""
+    payload = json.dumps({
+        'version': CACHE_FORMAT_VERSION,
+        'column_mapping': main.COLUMN_MAPPING,
+        'master_columns': main.MASTER_COLUMNS,
+        'platform_mapping': main.PLATFORM_MAPPING,
+        'game_rules': main.get_game_matcher()['rules'],
+        'stages': active_stages(),
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _write_feather(df, path):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(df)
+    object_columns = {col: _missing_name(df[col]) for col in df.columns if df[col].dtype == object}
+    metadata = dict(table.schema.metadata or {})
+    metadata[OBJECT_COLUMNS_KEY] = json.dumps(object_columns, ensure_ascii=False).encode('utf-8')
+    feather.write_feather(table.replace_schema_metadata(metadata), path)
+
+
+def _read_feather(path):
+    import pyarrow.feather as feather
+
+    table = feather.read_table(path)
+    df = table.to_pandas()
+    object_columns = json.loads((table.schema.metadata or {}).get(OBJECT_COLUMNS_KEY, b'{}'))
+    for col, missing in object_columns.items():
+        values = df[col].astype(object)
+        df[col] = values.where(values.notna(), MISSING_VALUES[missing])
+    return df
+
+
+def _missing_name(values):
+    """object 列中缺失值的类型；同一列混用多种缺失值时按第一个记录（写入后的校验会发现差异）"""
+    missing = values[values.isna()]
+    if missing.empty:
+        return 'nan'
+    first = missing.iloc[0]
+    if first is pd.NA:
+        return 'na'
+    return 'none' if first is None else 'nan'
+
+
+def _same_frame(left, right):
+    """列类型和数据都完全一致（包括索引）"""
+    return left.dtypes.equals(right.dtypes) and left.equals(right)
+
+
+class ProcessedFileCache:
+    """process_excel 结果的磁盘缓存
+
+    缓存键由文件内容哈希、文件名（平台、账号和国内外标记都从文件名推断）和规则指纹组成，
+    结果以 Feather 按列保存，无法原样还原时退回 pickle，
+    目录总大小超过 max_bytes 时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, directory, max_bytes=CACHE_MAX_BYTES):
+        # 退回 pickle 的缓存读取时会反序列化，目录只允许当前用户访问，其他用户无法放入文件
+        self.directory = make_private_dir(directory)
+        self.max_bytes = max_bytes
+
+    def key_for(self, file_path):
+        filename = os.path.basename(file_path)
+        digest = hashlib.sha256()
+        digest.update(file_content_hash(file_path).encode('ascii'))
+        digest.update(filename.encode('utf-8'))
+        digest.update(rules_fingerprint().encode('ascii'))
+        return digest.hexdigest()
+
+    def _path(self, key, suffix):
+        return os.path.join(self.directory, key + suffix)
+
+    def get(self, key):
+        """读取缓存，未命中或缓存损坏时返回 None"""
+        for suffix in CACHE_SUFFIXES:
+            path = self._path(key, suffix)
+            if os.path.exists(path):
+                break
+        else:
+            return None
+        try:
+            df = _read_feather(path) if suffix == FEATHER_SUFFIX else pd.read_pickle(path)
+        except Exception as e:
+            print(f"读取缓存 {path} 失败，将重新处理: {str(e)}")
+            self._remove(path)
+            return None
+        # 更新访问时间，用于 LRU 淘汰
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return df
+
+    def put(self, key, df):
+        """写入缓存，先写临时文件再替换，避免并发读取到写了一半的文件
+
+        Feather 文件写出后读回校验，与原数据不完全一致（或未安装 pyarrow）时改为 pickle。
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            try:
+                _write_feather(df, tmp_path)
+                suffix = FEATHER_SUFFIX if _same_frame(df, _read_feather(tmp_path)) else PICKLE_SUFFIX
+            except Exception:
+                suffix = PICKLE_SUFFIX
+            if suffix == PICKLE_SUFFIX:
+                df.to_pickle(tmp_path)
+            os.replace(tmp_path, self._path(key, suffix))
+        except Exception as e:
+            print(f"写入缓存失败: {str(e)}")
+            self._remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        """目录总大小超过上限时，按最近使用时间从旧到新删除缓存"""
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(CACHE_SUFFIXES):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            self._remove(os.path.join(self.directory, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,93 @@
+import os
+import sys
+import glob
+import argparse
+import contextlib
+
+# 命令行退出码
+EXIT_OK = 0          # 全部成功
+EXIT_FAILED = 1      # 出错，没有生成结果
+EXIT_USAGE = 2       # 参数错误（与 argparse 一致）
+EXIT_PARTIAL = 3     # 部分文件处理失败，结果中只包含处理成功的文件
+EXIT_NO_INPUT = 4    # 没有找到需要处理的文件
+
+# 输出详细程度
+QUIET = 0
+NORMAL = 1
+VERBOSE = 2
+
+EXIT_CODES_HELP = (
+    f"退出码: {EXIT_OK} 成功, {EXIT_FAILED} 出错, {EXIT_USAGE} 参数错误, "
+    f"{EXIT_PARTIAL} 部分文件失败, {EXIT_NO_INPUT} 没有需要处理的文件"
+)
+
+
+def add_common_arguments(parser):
+    """添加 -q/-v 和 --pause 参数"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("-q", "--quiet", action="store_true", help="只输出错误和结果文件路径")
+    group.add_argument("-v", "--verbose", action="store_true", help="额外输出各阶段耗时")
+    parser.add_argument("--pause", action=argparse.BooleanOptionalAction, default=None,
+                        help="结束后等待按回车（默认只在不带任何参数、从终端运行时等待，便于双击运行时查看结果）")
+
+
+def verbosity(args):
+    if args.quiet:
+        return QUIET
+    return VERBOSE if args.verbose else NORMAL
+
+
+def should_pause(args, argv):
+    """不带参数双击运行时保持原来的行为（结束后等待按回车）；带参数或没有终端（cron、流水线）时不等待"""
+    if args.pause is not None:
+        return args.pause
+    return not argv and sys.stdin is not None and sys.stdin.isatty()
+
+
+@contextlib.contextmanager
+def quiet_output(enabled):
+    """quiet 模式下屏蔽处理过程中的输出（错误信息输出到 stderr，不受影响）"""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, 'w', encoding='utf-8') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def error(message):
+    print(message, file=sys.stderr)
+
+
+def _is_input_file(path, extensions):
+    name = os.path.basename(path)
+    # 跳过合并结果、隐藏文件以及 Excel 打开文件时生成的 ~$ 锁文件
+    return (os.path.isfile(path) and name.lower().endswith(extensions)
+            and not name.startswith(('merged_', '.', '~$')))
+
+
+def expand_inputs(patterns, extensions):
+    """展开命令行传入的文件、目录和通配符（支持 **），返回 (去重后的文件列表, 不存在的输入)
+
+    目录只取第一层中指定扩展名的文件；直接指定的文件不检查扩展名。
+    """
+    files = []
+    missing = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = [path for path in sorted(os.path.join(pattern, name) for name in os.listdir(pattern))
+                          if _is_input_file(path, extensions)]
+        elif any(ch in pattern for ch in '*?['):
+            candidates = [path for path in sorted(glob.glob(pattern, recursive=True))
+                          if _is_input_file(path, extensions)]
+        elif os.path.isfile(pattern):
+            candidates = [pattern]
+        else:
+            missing.append(pattern)
+            continue
+        for path in candidates:
+            key = os.path.normcase(os.path.abspath(path))
+            if key not in seen:
+                seen.add(key)
+                files.append(path)
+    return files, missing
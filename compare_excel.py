@@ -3,9 +3,33 @@ import os
 from datetime import datetime
 import traceback
 import sys
+import time
+import argparse
+import cli
+from writers import OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, check_format, sheets_output_path_for, write_sheets
+from main import ProcessingCancelled
+
+# 两个文件按 post_id 关联时使用的临时编号列，关联后删除；与文件中已有的列重名时在后面加下划线
+JOIN_KEY_COLUMN = '_compare_post_code'
+
+def join_key_column(*frames):
+    """返回不与任何输入列重名的临时列名，避免覆盖文件中真实的列（如 post_key）"""
+    name = JOIN_KEY_COLUMN
+    while any(name in df.columns for df in frames):
+        name += '_'
+    return name
+
+def compare_excel_files(file1_path, file2_path, output_format=DEFAULT_OUTPUT_FORMAT, output_base=None, progress=None):
+    """比较新旧两个文件，结果写入 output_base（不含扩展名，默认与旧文件同目录）
+
+    progress(stage) 在进入读取、比较、写出各阶段时调用，可抛出 ProcessingCancelled 中止比较。
+    """
+    def report(stage):
+        if progress is not None:
+            progress(stage)
 
-def compare_excel_files(file1_path, file2_path):
     try:
+        report('reading')
         # 使用 utf-8 编码读取 Excel 文件
         df1 = pd.read_excel(file1_path, engine='openpyxl')  # 旧文件
         df2 = pd.read_excel(file2_path, engine='openpyxl')  # 新文件
@@ -13,6 +37,8 @@ def compare_excel_files(file1_path, file2_path):
         print(f"文件1(旧)行数: {len(df1)}")
         print(f"文件2(新)行数: {len(df2)}")
         
+        report('comparing')
+
         # 确保两个DataFrame都有必要的列
         required_cols = ['post_id', 'video_views']
         for col in required_cols:
@@ -27,16 +53,24 @@ def compare_excel_files(file1_path, file2_path):
         rename_dict = {col: f'{col}_old' for col in available_numeric_cols}
         df1 = df1.rename(columns=rename_dict)
         
+        # 两个文件的 post_id 一起编号后按整数编号关联，只哈希一次 post_id 文本。
+        # 读取的结果文件中没有 post_key，现场计算哈希键比直接编号更慢，这里不使用
+        post_ids = pd.concat([df2['post_id'], df1['post_id']], ignore_index=True)
+        codes, _ = pd.factorize(post_ids, use_na_sentinel=False)
+        join_key = join_key_column(df1, df2)
+        df2[join_key] = codes[:len(df2)]
+        df1[join_key] = codes[len(df2):]
+        
         # 准备要合并的列
-        merge_cols = ['post_id'] + [f'{col}_old' for col in available_numeric_cols]
+        merge_cols = [join_key] + [f'{col}_old' for col in available_numeric_cols]
         
         # 基于post_id合并两个DataFrame，以新文件(df2)为基准
         merged_df = pd.merge(
             df2,  # 新文件作为基准
             df1[merge_cols],  # 旧文件的数据
-            on='post_id', 
+            on=join_key, 
             how='left'  # 保留所有新文件的记录
-        )
+        ).drop(columns=join_key)
         
         # 计算所有数值列的差异（新 - 旧）
         for col in available_numeric_cols:
@@ -79,16 +113,17 @@ def compare_excel_files(file1_path, file2_path):
         calc_df = pd.DataFrame(calc_data)
         
         # 生成输出文件名
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_path = os.path.join(
-            os.path.dirname(file1_path),
-            f"compared_data_{timestamp}.xlsx"
-        )
-        
-        # 使用ExcelWriter保存多个sheet
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            merged_df.to_excel(writer, sheet_name='Data', index=False)
-            calc_df.to_excel(writer, sheet_name='Calculation', index=False)
+        if output_base is None:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_base = os.path.join(
+                os.path.dirname(file1_path),
+                f"compared_data_{timestamp}"
+            )
+        
+        report('writing')
+
+        # 保存 Data 和 Calculation 两个 sheet
+        output_path = write_sheets({'Data': merged_df, 'Calculation': calc_df}, output_base, output_format)
         
         print(f"比较完成！输出文件：{output_path}")
         
@@ -102,43 +137,87 @@ def compare_excel_files(file1_path, file2_path):
         
         return merged_df, calc_df
         
+    except ProcessingCancelled:
+        raise
     except Exception as e:
         print(f"比较文件时发生错误: {str(e)}")
         traceback.print_exc()
         return None, None
 
-def main():
-    try:
-        if len(sys.argv) != 3:
-            print("使用方法: python compare_excel.py <旧文件路径> <新文件路径>")
-            print("例如: python compare_excel.py old_data.xlsx new_data.xlsx")
-            return
-        
-        file1_path = sys.argv[1]  # 较旧的文件
-        file2_path = sys.argv[2]  # 较新的文件
-        
-        # 检查文件是否存在
-        if not os.path.exists(file1_path):
-            print(f"错误: 找不到文件 {file1_path}")
-            return
+def resolve_output_base(output, output_format, file1_path):
+    """确定输出路径（不含扩展名）和格式：未指定 -o 时与旧文件同目录；未指定 --format 时按 -o 的扩展名判断"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if output is None or os.path.isdir(output):
+        directory = output or os.path.dirname(os.path.abspath(file1_path))
+        return os.path.join(directory, f"compared_data_{timestamp}"), check_format(output_format)
+    
+    base, extension = os.path.splitext(output)
+    extension = extension.lower().lstrip('.')
+    if output_format is None:
+        output_format = extension if extension in OUTPUT_FORMATS else DEFAULT_OUTPUT_FORMAT
+    # 非 xlsx 格式输出为 zip，-o 可以写成 result.zip
+    if extension in OUTPUT_FORMATS or extension == 'zip':
+        output = base
+    return output, check_format(output_format)
+
+def main(argv=None):
+    """命令行入口，返回退出码"""
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = argparse.ArgumentParser(
+        description="比较新旧两个 Excel 文件",
+        epilog="例如: python compare_excel.py old_data.xlsx new_data.xlsx -o result.csv -q。"
+               f"退出码: {cli.EXIT_OK} 成功, {cli.EXIT_FAILED} 比较失败, {cli.EXIT_USAGE} 参数错误"
+    )
+    parser.add_argument("file1", help="旧文件路径")
+    parser.add_argument("file2", help="新文件路径")
+    parser.add_argument("-o", "--output", help="结果文件路径或目录，默认为旧文件所在目录下的 compared_data_<时间>")
+    parser.add_argument("-f", "--format", choices=list(OUTPUT_FORMATS), default=None,
+                        help=f"比较结果的输出格式，默认按 -o 的扩展名判断，否则为 {DEFAULT_OUTPUT_FORMAT}")
+    cli.add_common_arguments(parser)
+    args = parser.parse_args(argv)
+    level = cli.verbosity(args)
+    
+    file1_path = args.file1  # 较旧的文件
+    file2_path = args.file2  # 较新的文件
+    
+    # 检查文件是否存在
+    for path in (file1_path, file2_path):
+        if not os.path.isfile(path):
+            parser.error(f"找不到文件 {path}")
+    
+    output_base, output_format = resolve_output_base(args.output, args.format, file1_path)
+    output_path = sheets_output_path_for(output_base, output_format)
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    
+    start = time.perf_counter()
+    code = cli.EXIT_FAILED
+    with cli.quiet_output(level == cli.QUIET):
+        try:
+            print(f"\n开始比较文件:")
+            print(f"文件1 (较旧): {file1_path}")
+            print(f"文件2 (较新): {file2_path}")
             
-        if not os.path.exists(file2_path):
-            print(f"错误: 找不到文件 {file2_path}")
-            return
-        
-        print(f"\n开始比较文件:")
-        print(f"文件1 (较旧): {file1_path}")
-        print(f"文件2 (较新): {file2_path}")
-        
-        compare_excel_files(file1_path, file2_path)
-        
-    except Exception as e:
-        print(f"程序运行错误: {str(e)}")
-        traceback.print_exc()
+            merged_df, _ = compare_excel_files(file1_path, file2_path, output_format=output_format, output_base=output_base)
+            if merged_df is not None:
+                code = cli.EXIT_OK
+        except Exception as e:
+            cli.error(f"程序运行错误: {str(e)}")
+            traceback.print_exc()
+    
+    if code == cli.EXIT_OK:
+        if level == cli.QUIET:
+            print(output_path)
+    else:
+        cli.error(f"比较失败: {file1_path} {file2_path}")
+    if level == cli.VERBOSE:
+        print(f"[耗时] 总计: {time.perf_counter() - start:.2f}s，退出码 {code}")
     
-    # 添加暂停，让用户看到结果
-    print("\n处理完成。按回车键退出...")
-    input()
+    # 双击运行时暂停，让用户看到结果
+    if cli.should_pause(args, argv):
+        print("\n处理完成。按回车键退出...")
+        input()
+    return code
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,212 @@
+import time
+import uuid
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+# 同时执行的任务数，超出的任务排队；单个任务内的多文件并行由 process_files 的进程池负责
+JOB_WORKERS = 2
+
+# 单个任务的默认超时时间（秒），避免异常文件使任务一直处于运行状态
+DEFAULT_JOB_TIMEOUT = 30 * 60
+
+# 内存中最多保留的已结束任务数，超出后删除最早结束的任务
+JOB_HISTORY_LIMIT = 100
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+TIMEOUT = 'timeout'
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED, TIMEOUT)
+
+
+class Job:
+    """后台任务的状态：当前阶段、整体进度、每个文件的处理结果"""
+
+    def __init__(self, kind, files=(), timeout=DEFAULT_JOB_TIMEOUT, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.timeout = timeout
+        self.status = QUEUED
+        self.stage = QUEUED
+        self.progress = 0.0
+        self.message = '等待处理'
+        self.error = None
+        self.result = None
+        self.files = [{'name': name, 'status': 'pending'} for name in files]
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def set_stage(self, stage, progress=None, message=None):
+        with self._lock:
+            self.stage = stage
+            if progress is not None:
+                self.progress = progress
+            if message is not None:
+                self.message = message
+
+    def set_file_status(self, name, status):
+        """更新单个文件的状态（done/failed），同名文件按顺序更新第一个未完成的"""
+        with self._lock:
+            for entry in self.files:
+                if entry['name'] == name and entry['status'] not in ('done', 'failed'):
+                    entry['status'] = status
+                    break
+
+    def files_finished(self):
+        with self._lock:
+            return sum(entry['status'] in ('done', 'failed') for entry in self.files)
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def timed_out(self):
+        return self.started_at is not None and self.timeout is not None and time.time() - self.started_at > self.timeout
+
+    def should_stop(self):
+        return self.cancelled() or self.timed_out()
+
+    def check(self):
+        """已取消或超时时抛出 ProcessingCancelled，在各阶段之间调用"""
+        if self.should_stop():
+            from main import ProcessingCancelled
+            raise ProcessingCancelled('任务超时' if self.timed_out() else '任务已取消')
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'stage': self.stage,
+                'progress': round(self.progress, 3),
+                'message': self.message,
+                'error': self.error,
+                'result': self.result,
+                'files': [dict(entry) for entry in self.files],
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class JobManager:
+    """后台任务队列：提交后立即返回任务，由线程池依次执行，状态可随时查询"""
+
+    def __init__(self, max_workers=JOB_WORKERS, timeout=DEFAULT_JOB_TIMEOUT, history_limit=JOB_HISTORY_LIMIT):
+        self.timeout = timeout
+        self.history_limit = history_limit
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+
+    def submit(self, kind, func, files=(), timeout=None, job_id=None, on_finish=None):
+        """提交任务，func(job) 在后台线程中执行，返回值保存为 job.result
+
+        job_id 默认随机生成；on_finish(job) 在任务结束（包括失败、取消）后调用，用于释放任务占用的资源。
+        """
+        job = self.create(kind, files, timeout, job_id)
+        self.start(job, func, on_finish)
+        return job
+
+    def create(self, kind, files=(), timeout=None, job_id=None):
+        """登记任务但暂不执行（如等待文件上传），之后调用 start() 或 fail()
+
+        登记后即可查询和取消，状态为排队中；不占用任务线程，超时从 start() 后真正开始执行时计算。
+        """
+        job = Job(kind, files, self.timeout if timeout is None else timeout, job_id)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        return job
+
+    def start(self, job, func, on_finish=None):
+        """把 create() 登记的任务交给线程池执行；已取消的任务不会执行"""
+        self._executor.submit(self._run, job, func, on_finish)
+
+    def fail(self, job, error, on_finish=None):
+        """不执行 create() 登记的任务，直接标记为失败（如等待上传超时）"""
+        self._finish(job, FAILED, '处理失败', error=error)
+        if on_finish is not None:
+            on_finish(job)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """请求取消任务；排队中的任务不会再执行，运行中的任务在下一次检查时中止"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        if job.status not in FINISHED_STATUSES:
+            job.cancel()
+        return job
+
+    def _finish(self, job, status, message, error=None, result=None):
+        with job._lock:
+            job.status = status
+            job.stage = status
+            job.message = message
+            job.error = error
+            job.result = result
+            job.finished_at = time.time()
+            if status == SUCCEEDED:
+                job.progress = 1.0
+
+    def _run(self, job, func, on_finish=None):
+        try:
+            self._execute(job, func)
+        finally:
+            if on_finish is not None:
+                try:
+                    on_finish(job)
+                except Exception as e:
+                    print(f"任务 {job.id} 结束处理失败: {str(e)}")
+
+    def _execute(self, job, func):
+        # main 依赖 pandas，在任务开始执行时才导入，不拖慢应用启动
+        from main import ProcessingCancelled
+
+        if job.cancelled():
+            self._finish(job, CANCELLED, '任务已取消')
+            return
+
+        with job._lock:
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        try:
+            result = func(job)
+        except ProcessingCancelled:
+            if job.cancelled():
+                self._finish(job, CANCELLED, '任务已取消')
+            else:
+                self._finish(job, TIMEOUT, '任务超时', error=f'处理时间超过 {job.timeout} 秒，已中止')
+        except Exception as e:
+            print(f"任务 {job.id} 执行失败: {str(e)}")
+            traceback.print_exc()
+            self._finish(job, FAILED, '处理失败', error=str(e))
+        else:
+            self._finish(job, SUCCEEDED, '处理完成', result=result)
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if job.status in FINISHED_STATUSES]
+        excess = len(finished) - self.history_limit
+        if excess > 0:
+            for job in sorted(finished, key=lambda job: job.finished_at)[:excess]:
+                del self._jobs[job.id]
+
+    def shutdown(self):
+        for job in list(self._jobs.values()):
+            job.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
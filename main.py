@@ -1,16 +1,33 @@
+import time
+# 启动计时的起点，-v 时输出导入模块的耗时
+_IMPORT_STARTED = time.perf_counter()
+
 import os
+import io
+import codecs
+import itertools
+import json
 import pandas as pd
 from datetime import datetime
+from pandas.tseries.api import guess_datetime_format
 import traceback
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from writers import OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, check_format, output_path_for, write_output
+import cli
 import re
 import sys
+import argparse
 import numpy as np
 
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
 # 定义主列模板
 MASTER_COLUMNS = [
     "post_id", "post", "network", "profile", "domestic_overseas_label", "published_date", "date", # <--在此处添加 "date"
     "video_views", "playthrough_rate", "avg_play_duration", "video_link",
-    "like", "comment", "share", "collect", "subscribers"
+    "like", "comment", "share", "collect", "subscribers", "game_label"
 ]
 
 # 平台名称映射（基于文件名关键词）
@@ -97,6 +114,94 @@ def is_foreign_file(filename):
     """判断文件是否为国外数据文件"""
     return "国外" in filename
 
+# 游戏标签规则：按优先级排列，post 同时命中多个标签时取靠前的标签
+DEFAULT_GAME_RULES = {
+    "poe2": ["poe", "流放之路", "流放", "pathofexile", "path of exile"],
+    "PUBG": ["pubg", "吃鸡", "绝地求生", "和平精英","游戏小剧场"],
+    "Warframe": ["warframe", "星际战甲"],
+    "P2": ["exoborne"],
+    "Dyinglight": ["消逝的光芒", "消光", "拉万", "lawan", "克兰", "clane", "消失的光芒", "dyinglight", "dying light"],
+    "Nikke": ["nikke", "妮姬", "胜利女神"],
+    "英雄联盟": ["leagueoflegends", "lol", "英雄联盟"],
+    "王者荣耀": ["王者荣耀", "hok", "honor of kings", "honorofkings"],
+    "暗区突围": ["暗区突围"],
+    "TGA": ["tga"],
+    "堡垒之夜": ["堡垒之夜", "fortnite"],
+    "Zenless": ["zenless"],
+    "Roblox": ["roblox", "罗布乐思"],
+    "无尽对决": ["无尽对决", "mlbb"],
+    "绝区零": ["绝区零"],
+    "Diablo": ["diablo", "暗黑破坏神", "暗黑"],
+    "美国大选": ["美国大选"],
+    "黑神话悟空": ["黑神话", "黑猴"],
+    "我的世界": ["我的世界"],
+    "Dune": ["沙丘"],
+    "月光骑士": ["月光骑士"],
+    "原子之心": ["原子之心"],
+    "漫威争锋": ["漫威争锋", "marvel"],
+    "怪物猎人": ["怪物猎人", "monsterhunter"]
+}
+
+# 外部规则文件（放在应用程序目录下），格式与 DEFAULT_GAME_RULES 相同：{"标签": ["关键词", ...]}
+GAME_RULES_FILE = "game_rules.json"
+
+# 已编译的规则缓存，规则文件修改后会自动重新加载
+_game_matcher_cache = {}
+_game_matcher_lock = threading.Lock()
+
+def load_game_rules(rules_path=None):
+    """读取外部规则文件，文件不存在或格式错误时使用内置规则"""
+    if rules_path is None:
+        rules_path = os.path.join(get_application_path(), GAME_RULES_FILE)
+    if not os.path.exists(rules_path):
+        return DEFAULT_GAME_RULES
+    
+    try:
+        with open(rules_path, 'r', encoding='utf-8') as f:
+            rules = json.load(f)
+        if not isinstance(rules, dict) or not all(
+            isinstance(keywords, list) and all(isinstance(kw, str) for kw in keywords)
+            for keywords in rules.values()
+        ):
+            raise ValueError("规则文件格式应为 {\"标签\": [\"关键词\", ...]}")
+        print(f"已加载游戏标签规则文件: {rules_path}")
+        return rules
+    except Exception as e:
+        print(f"读取游戏标签规则文件 {rules_path} 失败，使用内置规则: {str(e)}")
+        return DEFAULT_GAME_RULES
+
+def compile_game_rules(rules):
+    """将规则编译为正则：一个包含全部关键词的组合正则用于筛选候选行，每个标签一个正则用于确定优先级"""
+    label_patterns = []
+    all_keywords = []
+    for label, keywords in rules.items():
+        # post 会统一转为小写后再匹配，关键词也统一转为小写
+        keywords = [kw.lower() for kw in keywords if kw]
+        if not keywords:
+            continue
+        label_patterns.append((label, '|'.join(re.escape(kw) for kw in keywords)))
+        all_keywords.extend(keywords)
+    
+    return {
+        'rules': rules,
+        'combined_pattern': '|'.join(re.escape(kw) for kw in all_keywords),
+        'label_patterns': label_patterns,
+    }
+
+def get_game_matcher():
+    """返回当前生效的已编译规则，只在规则文件变化时重新编译"""
+    rules_path = os.path.join(get_application_path(), GAME_RULES_FILE)
+    mtime = os.path.getmtime(rules_path) if os.path.exists(rules_path) else None
+    cache_key = (rules_path, mtime)
+    # 多个线程（多 sheet 并行、任务线程、预热线程）会同时调用：先在局部编译，再一次性发布 (key, matcher)，
+    # 其他线程不会读到新的 key 和旧的（或尚未编译的）matcher
+    with _game_matcher_lock:
+        cached = _game_matcher_cache.get('entry')
+        if cached is None or cached[0] != cache_key:
+            cached = (cache_key, compile_game_rules(load_game_rules(rules_path)))
+            _game_matcher_cache['entry'] = cached
+    return cached[1]
+
 def determine_game_label(post):
     """根据post内容判断游戏标签"""
     if not isinstance(post, str):
@@ -104,473 +209,1097 @@ def determine_game_label(post):
     
     post = post.lower()  # 转换为小写以便统一匹配
     
-    # 使用字典存储游戏关键词及对应的标签
-    game_rules = {
-        "poe2": ["poe", "流放之路", "流放", "pathofexile", "path of exile"],
-        "PUBG": ["pubg", "吃鸡", "绝地求生", "和平精英","游戏小剧场"],
-        "Warframe": ["warframe", "星际战甲"],
-        "P2": ["exoborne"],
-        "Dyinglight": ["消逝的光芒", "消光", "拉万", "lawan", "克兰", "clane", "消失的光芒", "dyinglight", "dying light"],
-        "Nikke": ["nikke", "妮姬", "胜利女神"],
-        "英雄联盟": ["leagueoflegends", "lol", "英雄联盟"],
-        "王者荣耀": ["王者荣耀", "hok", "honor of kings", "honorofkings"],
-        "暗区突围": ["暗区突围"],
-        "TGA": ["tga"],
-        "堡垒之夜": ["堡垒之夜", "fortnite"],
-        "Zenless": ["zenless"],
-        "Roblox": ["roblox", "罗布乐思"],
-        "无尽对决": ["无尽对决", "mlbb"],
-        "绝区零": ["绝区零"],
-        "Diablo": ["diablo", "暗黑破坏神", "暗黑"],
-        "美国大选": ["美国大选"],
-        "黑神话悟空": ["黑神话", "黑猴"],
-        "我的世界": ["我的世界"],
-        "Dune": ["沙丘"],
-        "月光骑士": ["月光骑士"],
-        "原子之心": ["原子之心"],
-        "漫威争锋": ["漫威争锋", "marvel"],
-        "怪物猎人": ["怪物猎人", "monsterhunter"]
-    }
-    
     # 遍历规则字典
-    for label, keywords in game_rules.items():
-        if any(keyword in post for keyword in keywords):
+    for label, keywords in get_game_matcher()['rules'].items():
+        if any(keyword.lower() in post for keyword in keywords if keyword):
             return label
     
     return "others"
 
-def process_excel(file_path):
-    try:
-        filename = os.path.basename(file_path)
-        is_foreign = is_foreign_file(filename)
-        
-        # 读取前几行来确定表头位置
-        if file_path.endswith('.xlsx'):
-            # 对于 .xlsx 文件使用默认引擎
-            df_head = pd.read_excel(file_path, nrows=5, header=None)
-        elif file_path.endswith('.xls'):
-            # 对于 .xls 文件显式指定 xlrd 引擎
-            print('xls 文件')
-            df_head = pd.read_excel(file_path, nrows=5, header=None, engine='xlrd')
+def label_games(posts):
+    """对整列 post 向量化生成游戏标签，结果与逐行调用 determine_game_label 一致"""
+    matcher = get_game_matcher()
+    labels = np.full(len(posts), "others", dtype=object)
+    if len(posts) == 0 or not matcher['label_patterns']:
+        return pd.Series(labels, index=posts.index)
+    
+    text = posts.str.lower()
+    
+    # 先用组合正则一次扫描整列，只有命中任意关键词的行才需要判断具体标签
+    candidates = np.flatnonzero(text.str.contains(matcher['combined_pattern'], na=False).to_numpy(dtype=bool))
+    
+    # 按优先级依次匹配，已确定标签的行不再参与后续匹配
+    for label, pattern in matcher['label_patterns']:
+        if len(candidates) == 0:
+            break
+        hit = text.iloc[candidates].str.contains(pattern, na=False).to_numpy(dtype=bool)
+        labels[candidates[hit]] = label
+        candidates = candidates[~hit]
+    
+    return pd.Series(labels, index=posts.index)
+
+# 表头检测时检查的行数
+HEADER_SCAN_ROWS = 5
+
+# 没有 BOM 的 CSV 文件依次尝试的编码（GB18030 是 GBK 的超集，用于兜底个别 GBK 之外的字符）
+CSV_ENCODINGS = ['utf-8', 'gbk', 'gb18030']
+
+# 带 BOM 的文件直接按 BOM 确定编码
+CSV_BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 判断无 BOM 的 UTF-16 时检查的字节数
+CSV_SNIFF_BYTES = 64 * 1024
+
+# 安装了 pyarrow 时使用其多线程 CSV 解析器，解析失败或结果无法与 pandas 对齐时退回 pandas 的 C 解析器
+USE_PYARROW_CSV = True
+
+# float64 能精确表示的最大整数；pyarrow 把超出 int64 范围的整数（如很长的视频 ID）推断为 float64，超过此值会丢失精度
+FLOAT_EXACT_INT_LIMIT = 2 ** 53
+
+# pandas read_csv 默认识别为缺失值的文本，pyarrow 解析时使用同一组
+CSV_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+]
+
+# 批量处理文件时的默认进程数
+MAX_WORKERS = os.cpu_count() or 1
+
+# 进程池的启动方式：网页任务在多线程的进程中创建进程池，fork 会把其他线程正持有的锁（日志、规则缓存、
+# pyarrow 线程池等）一起复制到子进程，子进程可能因此死锁；spawn 的子进程重新导入模块，不继承这些状态
+POOL_START_METHOD = 'spawn'
+
+# 可中止的批量处理检查取消/超时的间隔（秒）
+STOP_POLL_INTERVAL = 0.2
+
+# 流式处理时每批的行数
+STREAM_CHUNK_ROWS = 50000
+
+# 流式处理 CSV 时用于判断编码的样本大小
+STREAM_ENCODING_SAMPLE_BYTES = 1024 * 1024
+
+# 多 sheet 工作簿中标记来源 sheet 的列（只有一个 sheet 时不添加，输出与之前一致）
+SHEET_NAME_COLUMN = 'sheet_name'
+
+# 多 sheet 工作簿中数据 sheet 的表头必须能映射出的标准列；缺少时（如说明、汇总 sheet）整个 sheet 跳过
+SHEET_REQUIRED_COLUMNS = ('post', 'published_date')
+
+# 多 sheet 工作簿并行规范化各 sheet 的线程数
+SHEET_WORKERS = 4
+
+# 表头结构缓存的容量上限（不同表头布局的数量），超出后清空重建
+SCHEMA_PLAN_CACHE_SIZE = 256
+
+# 同一平台导出的文件表头布局相同，缓存识别结果，重复的布局跳过表头检测和列名解析
+# 已识别为表头的行：表头指纹 -> True
+_header_row_cache = {}
+# 列名处理方案：原始列名 -> {'names': 清洗并映射后的列名, 'duplicates': [(保留列位置, 重复列位置), ...]}
+_column_plan_cache = {}
+
+def _cache_put(cache, key, value):
+    if len(cache) >= SCHEMA_PLAN_CACHE_SIZE:
+        cache.clear()
+    cache[key] = value
+
+def clear_schema_plan_cache():
+    _header_row_cache.clear()
+    _column_plan_cache.clear()
+
+def header_fingerprint(values):
+    """表头行的指纹：各单元格的类型和去掉首尾空白后的文本"""
+    return tuple(None if pd.isna(x) else (type(x).__name__, str(x).strip()) for x in values)
+
+def score_header_row(values):
+    """统计一行中清洗后能在 COLUMN_MAPPING 中找到的单元格数（与重命名时使用同样的列名清洗）"""
+    return sum(1 for x in values if pd.notna(x) and clean_column_name(str(x)) in COLUMN_MAPPING)
+
+def detect_header_row(df_head):
+    """检查前几行，返回与COLUMN_MAPPING的键匹配度最高的行号"""
+    rows = min(HEADER_SCAN_ROWS, len(df_head))
+    fingerprints = [header_fingerprint(df_head.iloc[i]) for i in range(rows)]
+    for i, fingerprint in enumerate(fingerprints):
+        if fingerprint in _header_row_cache:
+            print(f"表头与已处理的文件一致，使用第 {i + 1} 行作为表头")
+            return i
+    
+    header_row = 0
+    max_matches = 0
+    
+    for i in range(rows):
+        current_matches = score_header_row(df_head.iloc[i])
+        print(f"第 {i+1} 行匹配的列数: {current_matches}")
+        if current_matches > max_matches:
+            max_matches = current_matches
+            header_row = i
+    
+    if max_matches > 0:
+        _cache_put(_header_row_cache, fingerprints[header_row], True)
+    print(f"使用第 {header_row + 1} 行作为表头")
+    return header_row
+
+def build_column_plan(columns):
+    """根据原始列名生成列名处理方案：清洗、映射为标准列名，并记录需要合并的重复列"""
+    names = [COLUMN_MAPPING.get(name, name) for name in (clean_column_name(col) for col in columns)]
+    duplicates = []
+    seen = {}
+    for i, name in enumerate(names):
+        if name in seen:
+            duplicates.append((seen[name], i))
         else:
-            encodings = ['utf-8', 'gbk', 'gb2312', 'utf-16']
-            df_head = None
-            for encoding in encodings:
-                try:
-                    df_head = pd.read_csv(file_path, nrows=5, header=None, encoding=encoding)
-                    print(f"成功使用 {encoding} 编码读取CSV文件")
-                    break
-                except Exception as e:
-                    continue
-            if df_head is None:
-                # 如果是其他不支持的文件类型，可以在这里抛出或记录错误
-                print(f"警告: 文件 {filename} 不是支持的Excel或CSV格式，跳过处理。")
-                return None # 或者 raise Exception("不支持的文件类型")
-
-        # 确定真正的表头行
-        header_row = 0
-        max_matches = 0
-        
-        # 检查前5行，看哪一行与COLUMN_MAPPING的键匹配度最高
-        for i in range(min(5, len(df_head))):
-            # 将该行的值转换为字符串并清理
-            row_values = [str(x).strip() if pd.notna(x) else '' for x in df_head.iloc[i]]
-            current_matches = sum(1 for col in row_values if col in COLUMN_MAPPING)
-            print(f"第 {i+1} 行匹配的列数: {current_matches}")
-            if current_matches > max_matches:
-                max_matches = current_matches
-                header_row = i
-
-        print(f"使用第 {header_row + 1} 行作为表头")
-        
-        # 使用确定的表头行重新读取文件
-        if file_path.endswith('.xlsx'):
-            df = pd.read_excel(file_path, header=header_row)
-        elif file_path.endswith('.xls'):
-            df = pd.read_excel(file_path, header=header_row, engine='xlrd')
-        else: # 假设其他情况为CSV文件 (这里需要确保 encoding 变量在 df_head 读取时已正确设置)
-            # 确保 encoding 变量在此处可用
-            # 如果 df_head 读取失败，encoding 可能未定义
-            # 为了安全，可以再次尝试获取 encoding 或在 df_head 读取失败时就返回
-            if df_head is None: # 再次检查，如果上面返回了None，这里理论上不会执行
-                print(f"无法读取文件头部: {filename}, 跳过。")
-                return None
-
-            # 尝试找到用于读取df_head的encoding，如果之前没有成功读取，则encoding可能未定义
-            # 为了稳妥，这里可以重新执行一遍CSV的encoding尝试，或者确保encoding在上面成功设置
-            # 假设encoding已在上面正确设置
-            try:
-                df = pd.read_csv(file_path, encoding=encoding, header=header_row)
-            except NameError: # 如果encoding未定义 (例如，如果文件不是.xlsx, .xls, 也不是有效的CSV)
-                 print(f"无法确定CSV文件的编码: {filename}, 跳过。")
-                 return None
-            except Exception as e:
-                print(f"使用编码 {encoding} 读取CSV文件 {filename} 时出错: {e}")
-                return None
-        
-        print(f"成功读取文件，行数: {len(df)}")
-        
-        # 打印列名用于调试
-        
-        # 清理列名
-        df.columns = (
-            df.columns.str.strip()
-            .str.lower()  # 统一转为小写
-            .str.replace(r'[^\w]+', '_', regex=True)  # 替换所有非单词字符为下划线
-            .str.replace(r'_+', '_', regex=True)  # 合并连续下划线
+            seen[name] = i
+    return {'names': names, 'duplicates': duplicates}
+
+def get_column_plan(columns):
+    key = tuple(columns)
+    plan = _column_plan_cache.get(key)
+    if plan is None:
+        plan = build_column_plan(key)
+        _cache_put(_column_plan_cache, key, plan)
+    return plan
+
+def make_header_names(values):
+    """根据表头行的单元格生成列名，效果与 pandas 读取表头时一致"""
+    names = []
+    counts = {}
+    for i, value in enumerate(values):
+        name = f"Unnamed: {i}" if pd.isna(value) else value
+        # 与 pandas 一致：重复列名依次加上 .1, .2 后缀
+        cur_count = counts.get(name, 0)
+        while cur_count > 0:
+            counts[name] = cur_count + 1
+            name = f"{name}.{cur_count}"
+            cur_count = counts.get(name, 0)
+        counts[name] = cur_count + 1
+        names.append(name)
+    return names
+
+def missing_sheet_columns(header_values):
+    """检查多 sheet 工作簿中某个 sheet 的表头行，返回无法识别时跳过的原因，可以处理时返回 None"""
+    if score_header_row(header_values) == 0:
+        return "没有可识别的表头"
+    names = set(get_column_plan(make_header_names(header_values))['names'])
+    missing = [col for col in SHEET_REQUIRED_COLUMNS if col not in names]
+    if missing:
+        return f"缺少关键列 {', '.join(missing)}"
+    return None
+
+def promote_header(raw_df, header_row):
+    """将已读入内存的第 header_row 行提升为列名，效果与 read_excel(header=header_row) 一致"""
+    df = raw_df.iloc[header_row + 1:].reset_index(drop=True)
+    df.columns = make_header_names(raw_df.iloc[header_row])
+    # 表头及其上方的文本行会影响整列的类型推断，这里去掉表头后重新推断
+    string_cols = [col for col, dtype in df.dtypes.items() if isinstance(dtype, pd.StringDtype)]
+    if string_cols:
+        df = df.astype({col: object for col in string_cols})
+    return df.infer_objects()
+
+def sniff_csv_encodings(sample):
+    """根据文件开头的字节给出候选编码：BOM 优先；大量空字节说明是无 BOM 的 UTF-16；否则依次为 CSV_ENCODINGS"""
+    for bom, encoding in CSV_BOMS:
+        if sample.startswith(bom):
+            return [encoding]
+    
+    probe = sample[:CSV_SNIFF_BYTES]
+    if probe and probe.count(0) > len(probe) // 4:
+        # UTF-16 中 ASCII 字符的高位字节为 0，根据空字节出现在奇数位还是偶数位判断字节序
+        return ['utf-16-le' if probe[1::2].count(0) >= probe[0::2].count(0) else 'utf-16-be']
+    return list(CSV_ENCODINGS)
+
+def decode_csv_bytes(raw_bytes):
+    """确定 CSV 的编码并只完整解码一次，返回 (UTF-8 字节, 编码)，无法解码时返回 (None, None)
+    
+    完整解码本身就是校验，前几行能解码但后面出错的文件会继续尝试下一个编码，而不是被错误解码。
+    UTF-8 文件校验后直接使用原始字节，其他编码转码为 UTF-8，后续解析器不需要再处理编码。
+    """
+    for encoding in sniff_csv_encodings(raw_bytes):
+        try:
+            if encoding in ('utf-8', 'utf-8-sig'):
+                data = raw_bytes[len(codecs.BOM_UTF8):] if encoding == 'utf-8-sig' else raw_bytes
+                data.decode('utf-8')
+                return data, encoding
+            return raw_bytes.decode(encoding).encode('utf-8'), encoding
+        except UnicodeDecodeError:
+            continue
+    return None, None
+
+def _import_pyarrow_csv():
+    """pyarrow 为可选依赖，未安装时返回 (None, None)"""
+    if not USE_PYARROW_CSV:
+        return None, None
+    try:
+        import pyarrow
+        import pyarrow.csv as pyarrow_csv
+    except ImportError:
+        return None, None
+    return pyarrow, pyarrow_csv
+
+def _read_csv_pyarrow(pa, pa_csv, data, header_row, names):
+    """使用 pyarrow 解析 UTF-8 字节，列类型与 pandas C 解析器的结果保持一致
+    
+    pyarrow 会把日期文本推断为日期类型，而 pandas 保留为文本（后续由 normalize_dates 统一处理），
+    因此推断为时间类型的列强制按文本重新读取；含有超出 int64 范围的整数时抛出 ValueError，交给 pandas 解析。
+    """
+    read_options = pa_csv.ReadOptions(skip_rows=header_row + 1, column_names=names)
+    # 帖子正文中常有带引号的换行
+    parse_options = pa_csv.ParseOptions(newlines_in_values=True)
+    column_types = {}
+    
+    def read(reader):
+        convert_options = pa_csv.ConvertOptions(
+            column_types=column_types,
+            null_values=CSV_NA_VALUES,
+            true_values=['True', 'TRUE', 'true'],
+            false_values=['False', 'FALSE', 'false'],
+            strings_can_be_null=True,
         )
+        return reader(io.BytesIO(data), read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+    
+    def temporal_columns(schema):
+        return {field.name: pa.string() for field in schema if pa.types.is_temporal(field.type)}
+    
+    # 先用第一个数据块的推断结果找出时间类型的列，通常只需要完整解析一次
+    column_types.update(temporal_columns(read(pa_csv.open_csv).schema))
+    table = read(pa_csv.read_csv)
+    # 第一个数据块中为空、之后才出现日期的列，需要再读一次
+    temporal = temporal_columns(table.schema)
+    if temporal:
+        column_types.update(temporal)
+        table = read(pa_csv.read_csv)
+    
+    # 全空的列在 pandas 中为 float64
+    for i, field in enumerate(table.schema):
+        if pa.types.is_null(field.type):
+            table = table.set_column(i, field.name, table.column(i).cast(pa.float64()))
+        elif pa.types.is_floating(field.type):
+            # pandas 把超出 int64 范围的整数读为 uint64 并保持原值，pyarrow 读为 float64 后不同的 ID 会变成同一个值
+            values = table.column(i).to_numpy()
+            if (np.abs(values) >= FLOAT_EXACT_INT_LIMIT).any():
+                raise ValueError(f"列 {field.name} 含有浮点数无法精确表示的大整数")
+    
+    string_dtype = pd.StringDtype(na_value=np.nan) if pd.get_option('future.infer_string') else None
+    df = table.to_pandas(types_mapper={pa.string(): string_dtype, pa.large_string(): string_dtype}.get if string_dtype else None)
+    if list(df.columns) != list(names):
+        raise ValueError("pyarrow 解析的列与表头不一致")
+    return df
+
+def read_csv_bytes(data, filename, header_row=None):
+    """解析 UTF-8 编码的 CSV 字节；header_row 为空时先检测表头所在行"""
+    if header_row is None:
+        df_head = pd.read_csv(io.BytesIO(data), nrows=HEADER_SCAN_ROWS, header=None, encoding='utf-8')
+        header_row = detect_header_row(df_head)
+    
+    pa, pa_csv = _import_pyarrow_csv()
+    # pyarrow 按物理行跳过表头，表头之前有空行时与 pandas 的行号不一致，交给 pandas 处理
+    leading_lines = data.split(b'\n', header_row + 1)[:header_row + 1]
+    if pa_csv is not None and all(line.strip() for line in leading_lines):
+        try:
+            names = list(pd.read_csv(io.BytesIO(data), header=header_row, nrows=0, encoding='utf-8').columns)
+            return _read_csv_pyarrow(pa, pa_csv, data, header_row, names)
+        except Exception as e:
+            print(f"pyarrow 解析 {filename} 失败，改用 pandas 解析: {e}")
+    
+    return pd.read_csv(io.BytesIO(data), header=header_row, encoding='utf-8')
+
+def read_table(file_path):
+    """只打开并解析文件一次：读入全部行，在内存中检测表头并提升为列名"""
+    filename = os.path.basename(file_path)
+    
+    if file_path.endswith('.xlsx') or file_path.endswith('.xls'):
+        # 对于 .xls 文件显式指定 xlrd 引擎
+        engine = 'xlrd' if file_path.endswith('.xls') else None
+        raw_df = pd.read_excel(file_path, header=None, engine=engine)
+        header_row = detect_header_row(raw_df)
+        return promote_header(raw_df, header_row)
+    
+    # CSV：只读取一次原始字节，按字节判断编码后只解码一次
+    with open(file_path, 'rb') as f:
+        raw_bytes = f.read()
+    
+    data, encoding = decode_csv_bytes(raw_bytes)
+    if data is None:
+        print(f"警告: 文件 {filename} 不是支持的Excel或CSV格式，跳过处理。")
+        return None
+    
+    try:
+        print(f"成功使用 {encoding} 编码读取CSV文件")
+        return read_csv_bytes(data, filename)
+    except Exception as e:
+        print(f"使用编码 {encoding} 读取CSV文件 {filename} 时出错: {e}")
+        return None
+
+def read_sheets(file_path):
+    """只打开一次工作簿，读入所有 sheet 并分别检测表头，返回 {sheet 名称: DataFrame}
+
+    空的 sheet 会被跳过；有多个 sheet 时，表头无法识别或缺少 SHEET_REQUIRED_COLUMNS 的 sheet（说明、汇总等）也会被跳过。
+    CSV 文件返回 {None: DataFrame}。
+    """
+    if not (file_path.endswith('.xlsx') or file_path.endswith('.xls')):
+        df = read_table(file_path)
+        return {} if df is None else {None: df}
+    
+    engine = 'xlrd' if file_path.endswith('.xls') else None
+    raw_sheets = pd.read_excel(file_path, sheet_name=None, header=None, engine=engine)
+    sheets = {}
+    for sheet_name, raw_df in raw_sheets.items():
+        if raw_df.empty:
+            print(f"sheet {sheet_name} 为空，跳过")
+            continue
+        header_row = detect_header_row(raw_df)
+        if len(raw_sheets) > 1:
+            reason = missing_sheet_columns(raw_df.iloc[header_row])
+            if reason is not None:
+                print(f"sheet {sheet_name} {reason}，不是数据表，跳过")
+                continue
+            print(f"读取 sheet: {sheet_name}")
+        sheets[sheet_name] = promote_header(raw_df, header_row)
+    return sheets
+
+def normalize_sheets(sheets, filename, workers=SHEET_WORKERS):
+    """规范化工作簿的各个 sheet 并合并为一个结果
+
+    只有一个 sheet 时与之前完全相同；多个 sheet 时用线程并行处理，每行在 sheet_name 列中记录来源 sheet，
+    单个 sheet 处理失败不影响其他 sheet。
+    """
+    if len(sheets) == 1:
+        return normalize_dataframe(next(iter(sheets.values())), filename)
+    
+    def normalize_sheet(item):
+        sheet_name, df = item
+        try:
+            processed = normalize_dataframe(df, filename)
+        except Exception as e:
+            print(f"处理 sheet {sheet_name} 失败: {str(e)}")
+            traceback.print_exc()
+            return None
+        processed[SHEET_NAME_COLUMN] = pd.Categorical([sheet_name] * len(processed))
+        return processed
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(sheets)))) as executor:
+        results = [df for df in executor.map(normalize_sheet, sheets.items()) if df is not None]
+    if not results:
+        return None
+    print(f"已合并 {len(results)} 个 sheet")
+    return concat_processed(results)
+
+# 中文日期格式，例如 2024年01月02日 10:00:00
+CHINESE_DATE_PATTERN = r'(\d{4})年(\d{2})月(\d{2})日\s*(\d{2})?:?(\d{2})?:?(\d{2})?'
+
+# 以数字形式导出的 Excel 日期（序列号）的识别范围，约为 1954 年至 2119 年
+EXCEL_SERIAL_DATE_RANGE = (20000, 80000)
+EXCEL_EPOCH = '1899-12-30'
+
+def _format_datetimes(parsed):
+    """将已解析的日期列格式化为 (YYYY-MM-DD_HH:MM:SS, YYYY-MM-DD) 两列字符串"""
+    if getattr(parsed.dt, 'tz', None) is not None:
+        # 带时区的时间保留当地时间
+        parsed = parsed.dt.tz_localize(None)
+    text = pd.Series(np.datetime_as_string(parsed.to_numpy(dtype='datetime64[s]'), unit='s'), index=parsed.index)
+    return text.str.replace('T', '_', regex=False), text.str[:10]
+
+def _parse_datetime_text(text):
+    """解析日期文本：先用推断出的格式整列解析，解析失败的行再逐个格式兼容解析"""
+    fmt = guess_datetime_format(text.iloc[0])
+    if fmt:
+        parsed = pd.to_datetime(text, format=fmt, errors='coerce')
+    else:
+        parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+    
+    retry = parsed.isna()
+    if not retry.any():
+        return [parsed]
+    
+    try:
+        return [parsed[~retry], pd.to_datetime(text[retry], format='mixed', errors='coerce')]
+    except (ValueError, TypeError):
+        # 混合时区等情况无法整列解析，退回逐个解析，并保留各自的当地时间
+        retried = text[retry].map(lambda value: pd.to_datetime(value, errors='coerce'))
+        retried = retried.map(lambda ts: ts.tz_localize(None) if pd.notna(ts) and ts.tzinfo else ts)
+        return [parsed[~retry], pd.to_datetime(retried)]
+
+def normalize_dates(values):
+    """向量化统一日期格式，返回 (published_date, date)
+    
+    published_date 统一为 YYYY-MM-DD_HH:MM:SS，date 为 YYYY-MM-DD；无法解析的 published_date 保留原文本，
+    对应的 date 为空。
+    """
+    published = pd.Series(np.nan, index=values.index, dtype=object)
+    dates = pd.Series(np.nan, index=values.index, dtype=object)
+    
+    if pd.api.types.is_datetime64_any_dtype(values):
+        valid = values.notna()
+        published[valid], dates[valid] = _format_datetimes(values[valid])
+        return published.infer_objects(), dates.infer_objects()
+    
+    valid = values.notna()
+    text = values[valid].astype(str).str.strip()
+    published[valid] = text
+    
+    # 中文格式：直接按正则提取的年月日时分秒拼接
+    parts = text[text.str.contains('年', regex=False)].str.extract(CHINESE_DATE_PATTERN)
+    is_chinese = parts[0].notna().reindex(text.index, fill_value=False)
+    if is_chinese.any():
+        chinese = parts[parts[0].notna()].fillna('00')
+        day = chinese[0] + '-' + chinese[1] + '-' + chinese[2]
+        published[day.index] = day + '_' + chinese[3] + ':' + chinese[4] + ':' + chinese[5]
+        day = pd.to_datetime(day, format='%Y-%m-%d', errors='coerce')
+        dates[day.index] = day.dt.strftime('%Y-%m-%d')
+    text = text[~is_chinese]
+    
+    # Excel 序列号：以数字形式保存的日期
+    serial = pd.to_numeric(text.where(text.str.fullmatch(r'\d{5}(?:\.\d+)?')), errors='coerce')
+    is_serial = serial.between(*EXCEL_SERIAL_DATE_RANGE)
+    if is_serial.any():
+        parsed = pd.to_datetime(serial[is_serial], unit='D', origin=EXCEL_EPOCH).dt.round('s')
+        published[parsed.index], dates[parsed.index] = _format_datetimes(parsed)
+    text = text[~is_serial]
+    
+    # 其他格式
+    if len(text):
+        for parsed in _parse_datetime_text(text):
+            parsed = parsed.dropna()
+            if len(parsed):
+                published[parsed.index], dates[parsed.index] = _format_datetimes(parsed)
         
-        # 映射列名
-        df.rename(columns=lambda x: COLUMN_MAPPING.get(x, x), inplace=True)
-        print(f"映射后列名: {df.columns.tolist()}")
-
-        # 处理重复列
-        if len(df.columns) != len(set(df.columns)):
-            print("警告: 检测到重复列名")
-            seen = {}
-            duplicates = set()
-            
-            # 遍历列名并标记重复列
-            for i, col in enumerate(df.columns):
-                if col in seen:
-                    print(f"处理重复列 '{col}'，位置 {i}")
-                    duplicates.add(i)
-                    # 合并数据到第一个出现的列
-                    first_idx = seen[col]
-                    # 数值列相加，非数值列保留第一个非空值
-                    if df.iloc[:, first_idx].dtype in [np.int64, np.float64]:
-                        df.iloc[:, first_idx] += pd.to_numeric(df.iloc[:, i], errors='coerce').fillna(0)
-                    else:
-                        df.iloc[:, first_idx] = df.iloc[:, first_idx].combine(
-                            df.iloc[:, i], 
-                            lambda x, y: x if pd.notna(x) else y
-                        )
-                else:
-                    seen[col] = i
-            
-            # 删除重复列
-            df = df.drop(df.columns[list(duplicates)], axis=1)
-            print(f"去重后列名: {df.columns.tolist()}")
-        
-        # 检查并添加必要的列
-        for col in ['post', 'profile', 'published_date']:
-            if col not in df.columns:
-                print(f"警告: 缺少关键列 '{col}'")
-                if col == 'profile':
-                    # 尝试从文件名中提取 profile
-                    try:
-                        # 移除文件扩展名
-                        filename_without_ext = os.path.splitext(filename)[0]
-                        # 查找并提取 profile
-                        for platform in PLATFORM_MAPPING.keys():
-                            if platform in filename_without_ext:
-                                # 找到平台名称在文件名中的位置
-                                platform_index = filename_without_ext.find(platform)
-                                # 从平台名称后的第一个'-'开始截取
-                                remaining = filename_without_ext[platform_index + len(platform):]
-                                if remaining.startswith('-'):
-                                    # 去掉开头的'-'并获取剩余部分作为profile
-                                    profile_name = remaining[1:].strip()
-                                    df[col] = profile_name
-                                    print(f"从文件名成功提取 profile: {profile_name}")
-                                    break
-                        else:
-                            # 如果没有找到平台标识，直接尝试获取最后一部分
-                            if '-' in filename_without_ext:
-                                profile_name = filename_without_ext.split('-')[-1].strip()
-                                df[col] = profile_name
-                                print(f"从文件名提取 profile（无平台标识）: {profile_name}")
-                            else:
-                                df[col] = "未知" + col
-                                print("无法从文件名提取 profile")
-                    except Exception as e:
-                        print(f"从文件名提取 profile 时出错: {str(e)}")
-                        df[col] = "未知" + col
-                else:
-                    df[col] = "未知" + col  # 添加默认列
-        
-        # 先处理 published_date 格式
-        if 'published_date' in df.columns:
-            def convert_date(date_val):
-                if pd.isna(date_val):
-                    return date_val
-                try:
-                    # 转换为字符串
-                    date_str = str(date_val).strip()
-                    
-                    # 处理中文格式日期
-                    if '年' in date_str and '月' in date_str and '日' in date_str:
-                        # 提取年月日
-                        match = re.search(r'(\d{4})年(\d{2})月(\d{2})日\s*(\d{2})?:?(\d{2})?:?(\d{2})?', date_str)
-                        if match:
-                            year, month, day, hours, minutes, seconds = match.groups()
-                            # 如果时分秒为None，设置为00
-                            hours = hours or "00"
-                            minutes = minutes or "00"
-                            seconds = seconds or "00"
-                            return f"{year}-{month}-{day}_{hours}:{minutes}:{seconds}"
-                    
-                    # 尝试用pandas处理其他格式
-                    parsed_date = pd.to_datetime(date_str, errors='coerce')
-                    if pd.notna(parsed_date):
-                        return parsed_date.strftime('%Y-%m-%d_%H:%M:%S')
-                    
-                    return date_str
-                except Exception as e:
-                    print(f"日期转换错误 ({date_val}): {str(e)}")
-                    return date_val
-
-            df['published_date'] = df['published_date'].apply(convert_date)
-
-        # 生成network字段
-        if is_foreign:
-            # 对于国外文件，直接使用数据中的network列
-            if 'network' in df.columns:
-                print("使用数据中的network列")
-            else:
-                df['network'] = "国外平台"
+        # 无法整体解析的文本，尝试取其中的日期部分
+        unparsed = text[dates[text.index].isna()]
+        if len(unparsed):
+            day_part = unparsed.str.split('_').str[0].str.split(' ').str[0]
+            day = pd.to_datetime(day_part, format='mixed', errors='coerce').dropna()
+            dates[day.index] = day.dt.strftime('%Y-%m-%d')
+    
+    return published.infer_objects(), dates.infer_objects()
+
+# 合并重复 post_id 时各列的处理方式：sum 求和，max 取最大值，first 保留首次出现的行的值，last 取最后一个非空值
+# 未列出的列使用 DEFAULT_DEDUP_POLICY
+DEDUP_POLICIES = {
+    'video_views': 'sum',
+    'like': 'sum',
+    'comment': 'sum',
+    'share': 'sum',
+    'collect': 'sum',
+}
+DEFAULT_DEDUP_POLICY = 'first'
+
+# post_id 的 64 位哈希键（uint64）所在的列，规范化时与 post_id 一起生成。
+# 合并多个文件后去重时按哈希键分组，不需要再哈希和比较包含完整 post 文本的 post_id；
+# 该列只在内存中使用，导出文件、预览和数据库中都不包含
+POST_KEY_COLUMN = 'post_key'
+MISSING_POST_KEY = np.uint64(0)
+
+def hash_post_ids(post_ids):
+    """post_id 的稳定哈希键（uint64 数组）：每次运行结果相同，与列的类型（object/str/category）无关
+
+    直接哈希每个值（categorize=False），不先去重；缺失值（None/NaN）统一为同一个键。
+    """
+    keys = pd.util.hash_pandas_object(post_ids, index=False, categorize=False).to_numpy()
+    return np.where(post_ids.isna().to_numpy(), MISSING_POST_KEY, keys)
+
+def post_keys(df):
+    """返回 df 的哈希键，没有 post_key 列（如读取的结果文件）时现场计算"""
+    if POST_KEY_COLUMN in df.columns:
+        return df[POST_KEY_COLUMN].to_numpy()
+    return hash_post_ids(df['post_id'])
+
+def _first_rows(codes, count):
+    """每个编号首次出现的行位置"""
+    first = np.empty(count, dtype=np.intp)
+    first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+    return first
+
+def factorize_post_ids(post_ids, keys):
+    """按哈希键为 post_id 编号（按首次出现的顺序），返回 (每行的编号, 每个编号首次出现的行位置)
+
+    哈希键相同的行再核对一次 post_id 文本（只比较不哈希）；出现哈希冲突（64 位，概率约为 行数²/2⁶⁵）时
+    改为直接按 post_id 编号，结果与按 post_id 分组完全相同。缺失的 post_id 编为同一组。
+    """
+    codes, uniques = pd.factorize(keys)
+    first = _first_rows(codes, len(uniques))
+    ids = post_ids.reset_index(drop=True)
+    firsts = ids.take(first[codes]).reset_index(drop=True)
+    if not ((ids == firsts) | (ids.isna() & firsts.isna())).all():
+        print("post_id 哈希键有冲突，改为按 post_id 文本分组")
+        codes, uniques = pd.factorize(post_ids, use_na_sentinel=False)
+        first = _first_rows(codes, len(uniques))
+    return codes, first
+
+def merge_duplicate_posts(df, policies=None):
+    """按 post_id 合并重复记录：每个 post_id 保留首次出现的一行，其余列按 policies 聚合
+    
+    policies 会覆盖 DEDUP_POLICIES 中的同名配置，整个过程只做一次编号（按 post_key 哈希键）。
+    """
+    if 'post_id' not in df.columns:
+        return df
+    
+    codes, first = factorize_post_ids(df['post_id'], post_keys(df))
+    duplicate_count = len(df) - len(first)
+    if duplicate_count == 0:
+        return df
+    print(f"发现{duplicate_count}个重复的post_id，进行数据合并")
+    
+    policies = {**DEDUP_POLICIES, **(policies or {})}
+    unknown = {policy for policy in policies.values() if policy not in ('sum', 'max', 'first', 'last')}
+    if unknown:
+        raise ValueError(f"不支持的合并方式: {unknown}")
+    
+    unique_posts = df.iloc[first]
+    # 编号按首次出现的顺序分配，分组顺序与 unique_posts 的行顺序一致
+    grouped = df.groupby(codes, sort=False)
+    
+    for policy in ('sum', 'max', 'last'):
+        cols = [col for col in df.columns
+                if col not in ('post_id', POST_KEY_COLUMN) and policies.get(col, DEFAULT_DEDUP_POLICY) == policy]
+        if not cols:
+            continue
+        if policy == 'sum':
+            # 指标列可能是 int32，求和前转为 int64 避免溢出，合并后再重新收窄
+            widened = df[cols].astype({col: 'int64' for col in cols if pd.api.types.is_integer_dtype(df[col])})
+            aggregated = widened.groupby(codes, sort=False).sum()
+        elif policy == 'max':
+            aggregated = grouped[cols].max()
         else:
-            # 对于国内文件，从文件名推断平台
-            found_platform = None
-            for platform_name in PLATFORM_MAPPING:
-                if platform_name in filename:
-                    found_platform = PLATFORM_MAPPING[platform_name]
-                    break
-            
-            df['network'] = found_platform if found_platform else 'Unknown'
-            print(f"从文件名推断平台: {df['network'].iloc[0]}")
+            aggregated = grouped[cols].last()
+        for col in cols:
+            unique_posts[col] = aggregated[col].to_numpy()
+    
+    print(f"合并后行数: {len(unique_posts)}")
+    return narrow_integer_columns(unique_posts)
+
+# 需要转换为整数的指标列
+METRIC_COLUMNS = ['like', 'comment', 'share', 'collect', 'subscribers', 'video_views']
+
+# 数值文本：可选正负号的整数或小数，后面可跟数量单位
+# 英文字母单位后面不能紧跟字母，避免把 5 weeks、3 kids 中单词的首字母当作单位
+NUMBER_UNIT_PATTERN = re.compile(r'([-+]?\d*\.?\d+)\s*([万千亿]|[wWkK](?![A-Za-z]))?')
+NUMBER_UNITS = {'万': 1e4, 'w': 1e4, 'W': 1e4, 'k': 1e3, 'K': 1e3, '千': 1e3, '亿': 1e8}
+
+# 全角数字和符号转为半角，删除千位分隔符
+NUMBER_TRANSLATION = str.maketrans({
+    **{chr(ord('０') + i): str(i) for i in range(10)},
+    '．': '.', '＋': '+', '－': '-', '\u3000': ' ',
+    ',': None, '，': None,
+})
+
+def parse_number_text(text):
+    """解析单个数值文本，返回浮点数，无法识别时返回 NaN
+    
+    全角转半角、去掉千位分隔符后提取第一个数字；带 万/w/k/千/亿 单位的按单位换算并四舍五入。
+    """
+    match = NUMBER_UNIT_PATTERN.search(text.translate(NUMBER_TRANSLATION))
+    if match is None:
+        return np.nan
+    number = float(match.group(1))
+    unit = match.group(2)
+    return float(round(number * NUMBER_UNITS[unit])) if unit else number
+
+def parse_metric_columns(df, columns=METRIC_COLUMNS):
+    """一次处理所有指标列，转换为 int64，无法识别的值为 0
+    
+    数值单元格直接使用，不再转换为字符串；所有列的文本单元格合并后去重，每个不同的文本只解析一次。
+    不带单位的小数与原来一样截断取整。
+    """
+    parsed = {}
+    pending = []
+    for col in columns:
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            parsed[col] = values.to_numpy(dtype='float64', na_value=np.nan, copy=True)
+            continue
         
-        # 预处理：强制规范化post内容（同时处理国内外数据）
-        def clean_post(text):
-            if pd.isna(text): return ""
-            return re.sub(r'\s+', ' ', str(text).strip()).replace('\n', ' ')
-
-        df['post'] = df['post'].apply(clean_post)
-
-        # 处理post_id        
-        # 检查post_id是否存在（包括模糊匹配）
-        post_id_cols = [c for c in df.columns if 'post_id' in c]
-        if post_id_cols:
-            # 如果找到post_id列，直接使用第一个匹配的列
-            print(f"使用已有的post_id列: {post_id_cols[0]}")
-            df['post_id'] = df[post_id_cols[0]].astype(str).str.strip()
+        # 混合列（Excel 中数字和文本混排）：数字部分直接转换，文本部分留待统一解析
+        objects = values.to_numpy(dtype=object)
+        is_text = np.fromiter((isinstance(x, str) for x in objects), dtype=bool, count=len(objects))
+        parsed[col] = np.full(len(objects), np.nan)
+        if not is_text.all():
+            parsed[col][~is_text] = pd.to_numeric(pd.Series(objects[~is_text]), errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+        if is_text.any():
+            pending.append((col, np.flatnonzero(is_text), objects[is_text]))
+    
+    if pending:
+        codes, uniques = pd.factorize(np.concatenate([texts for _, _, texts in pending]))
+        numbers = np.array([parse_number_text(text) for text in uniques], dtype='float64')[codes]
+        offset = 0
+        for col, positions, texts in pending:
+            parsed[col][positions] = numbers[offset:offset + len(texts)]
+            offset += len(texts)
+    
+    for col in columns:
+        values = parsed[col]
+        values[~np.isfinite(values)] = 0
+        df[col] = np.trunc(values).astype('int64')
+    return df
+
+# 主列的紧凑类型：取值较少的标签列使用 category，日期列使用 datetime64，指标列使用能容纳取值的最窄整数
+CATEGORY_COLUMNS = ['network', 'profile', 'domestic_overseas_label', 'game_label', SHEET_NAME_COLUMN]
+# 日期列及其导出时的文本格式（与 normalize_dates 的输出一致）
+DATETIME_COLUMNS = {'published_date': '%Y-%m-%d_%H:%M:%S', 'date': '%Y-%m-%d'}
+# 指标列的最窄宽度为 int32，避免用户对 int8/int16 列做加法时静默溢出
+METRIC_INT_TYPES = ['int32', 'int64']
+
+def narrow_integer_columns(df, columns=METRIC_COLUMNS):
+    """整数列转换为能容纳全部取值的最窄类型"""
+    for col in columns:
+        if col not in df.columns or not pd.api.types.is_integer_dtype(df[col]):
+            continue
+        values = df[col]
+        for int_type in METRIC_INT_TYPES:
+            info = np.iinfo(int_type)
+            if len(values) == 0 or (values.min() >= info.min and values.max() <= info.max):
+                if values.dtype != int_type:
+                    df[col] = values.astype(int_type)
+                break
+    return df
+
+def apply_master_schema(df):
+    """按主列的紧凑类型转换单个文件的处理结果
+
+    published_date 中有无法解析的原文本时保留为文本列，不丢弃原值。
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col, fmt in DATETIME_COLUMNS.items():
+        if col not in df.columns or pd.api.types.is_datetime64_any_dtype(df[col]):
+            continue
+        values = df[col]
+        parsed = pd.to_datetime(values, format=fmt, errors='coerce')
+        unparsed = parsed.isna() & values.notna()
+        if unparsed.any():
+            print(f"{col}列有{unparsed.sum()}个值不是标准日期格式，保留为文本")
+            continue
+        df[col] = parsed
+
+    return narrow_integer_columns(df)
+
+def concat_processed(frames):
+    """合并多个文件的处理结果，先统一各文件 category 列的类别，避免合并后退回 object"""
+    frames = list(frames)
+    for col in CATEGORY_COLUMNS:
+        if not all(col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype) for df in frames):
+            continue
+        # 全为空值的列类别为空（且类别的类型不同），不参与合并类别
+        non_empty = [df[col] for df in frames if len(df[col].cat.categories)]
+        if not non_empty:
+            continue
+        try:
+            categories = pd.api.types.union_categoricals(non_empty).categories
+        except TypeError:
+            # 各文件类别的类型不一致时无法合并类别，该列合并后为普通文本列
+            continue
+        for df in frames:
+            df[col] = df[col].cat.set_categories(categories)
+    return pd.concat(frames, ignore_index=True)
+
+def format_for_export(df):
+    """转换回原有的导出格式：日期列为文本，category 列为普通文本列，写出的文件内容与紧凑类型前一致（不含 post_key）"""
+    df = df.drop(columns=POST_KEY_COLUMN, errors='ignore')
+    for col in DATETIME_COLUMNS:
+        if col not in df.columns:
+            continue
+        values = df[col]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            text = pd.Series(np.nan, index=values.index, dtype=object)
+            valid = values.notna()
+        elif values.dtype == object:
+            # 日期全部可解析的文件（datetime64）与含无法解析文本的文件（文本列）合并后为 object 列，
+            # 其中的 Timestamp 也要按同样的格式输出，否则同一列中会混有两种格式
+            valid = pd.Series([isinstance(value, datetime) for value in values], index=values.index, dtype=bool)
+            if not valid.any():
+                continue
+            text = values.copy()
         else:
-            print("生成post_id")
-            post_ids = []
-            for idx, row in df.iterrows():
-                try:
-                    post = str(row.get('post', '')) if pd.notna(row.get('post', '')) else 'unknown_post'
-                    # 替换post中的换行符，避免因换行导致的识别问题
-                    post = post.replace('\n', ' ').replace('\r', '')
-                    
-                    network = str(row.get('network', '')) if pd.notna(row.get('network', '')) else 'unknown_network'
-                    profile = str(row.get('profile', '')) if pd.notna(row.get('profile', '')) else 'unknown_profile'
-                    
-                    # 处理发布日期
-                    pub_date = row.get('published_date', '')
-                    if pd.isna(pub_date):
-                        pub_date_str = 'unknown_date'
-                    elif isinstance(pub_date, str):
-                        pub_date_str = pub_date.replace('/', '-').replace(' ', '_')
-                    else:
-                        try:
-                            pub_date_str = pd.Timestamp(pub_date).strftime('%Y-%m-%d_%H:%M:%S')
-                        except:
-                            pub_date_str = str(pub_date).replace('/', '-').replace(' ', '_')
-                    
-                    post_id = f"{post}_{network}_{profile}_{pub_date_str}"
-                    post_ids.append(post_id)
-                except Exception as e:
-                    print(f"生成第{idx}行post_id时出错: {str(e)}")
-                    post_ids.append(f"error_row_{idx}")
-            
-            df['post_id'] = post_ids
+            continue
+        published, dates = _format_datetimes(pd.to_datetime(values[valid]))
+        text[valid] = published if col == 'published_date' else dates
+        df[col] = text.infer_objects()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(df[col].cat.categories.dtype)
+    return df
+
+def clean_column_name(name):
+    """列名统一为小写，非单词字符替换为下划线并合并连续下划线
+    
+    使用 Python 的 re 而不是 Series.str：安装 pyarrow 后字符串列使用 RE2，其 \\w 不匹配中文。
+    """
+    if not isinstance(name, str):
+        return np.nan
+    name = re.sub(r'[^\w]+', '_', name.strip().lower())  # 替换所有非单词字符为下划线
+    return re.sub(r'_+', '_', name)  # 合并连续下划线
+
+# post 文本中的空白字符（与 Python 的 str.isspace 相同），连续的空白合并为一个空格。
+# 直接写出字符而不用 \s：安装 pyarrow 后字符串列使用 RE2，其 \s 不包含全角空格等字符
+POST_WHITESPACE_PATTERN = '[\t\n\x0b\x0c\r\x1c-\x1f \x85\xa0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]+'
+
+# 可作为 video_link 的列，按顺序使用第一个存在的列
+LINK_COLUMNS = ['link', 'video_link', 'video_url', 'url', 'ahmain']
+
+# 国内账号名称中包含这些关键词时标记为国外
+OVERSEAS_PROFILE_KEYWORDS = ['海外', '国际', 'Global']
+# 一次匹配所有关键词的正则（关键词只含普通字符，Python re 和 pyarrow 的 RE2 结果相同）
+OVERSEAS_PROFILE_PATTERN = '|'.join(re.escape(keyword) for keyword in OVERSEAS_PROFILE_KEYWORDS)
+
+class NormalizeContext:
+    """一次规范化的上下文：文件名、国内/国外、从文件名识别的平台，以及各阶段耗时（秒）"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.is_foreign = is_foreign_file(filename)
+        self.platform = detect_platform(filename)
+        self.timings = {}
+
+def detect_platform(filename):
+    """按 PLATFORM_MAPPING 的顺序，返回文件名中第一个出现的平台，没有时返回 None"""
+    for platform_name in PLATFORM_MAPPING:
+        if platform_name in filename:
+            return PLATFORM_MAPPING[platform_name]
+    return None
 
-        # 设置国内/国外标签
-        if is_foreign:
-            # 如果是国外文件，直接全部标记为"国外"
-            df['domestic_overseas_label'] = '国外'
-            print("文件标记为国外数据")
+def stage_rename(df, ctx):
+    """清理并映射列名（相同的表头布局直接使用缓存的处理方案）"""
+    ctx.plan = get_column_plan(df.columns)
+    df.columns = ctx.plan['names']
+    print(f"映射后列名: {df.columns.tolist()}")
+    return df
+
+def stage_dedup_columns(df, ctx):
+    """合并映射后同名的列：数值列相加，非数值列保留第一个非空值"""
+    plan = getattr(ctx, 'plan', None) or build_column_plan(df.columns)
+    if not plan['duplicates']:
+        return df
+    print("警告: 检测到重复列名")
+    for first_idx, i in plan['duplicates']:
+        print(f"处理重复列 '{plan['names'][i]}'，位置 {i}")
+        if df.iloc[:, first_idx].dtype in [np.int64, np.float64]:
+            df.iloc[:, first_idx] += pd.to_numeric(df.iloc[:, i], errors='coerce').fillna(0)
         else:
-            # 对于国内文件，使用现有逻辑判断
-            domestic_labels = []
-            for idx, profile in enumerate(df['profile']):
-                try:
-                    if pd.isna(profile):
-                        domestic_labels.append('未知')
-                    else:
-                        profile_str = str(profile)
-                        overseas_keywords = ['海外', '国际', 'Global']
-                        is_overseas = any(kw in profile_str for kw in overseas_keywords)
-                        domestic_labels.append('国外' if is_overseas else '国内')
-                except Exception as e:
-                    print(f"处理第{idx}行区域标签时出错: {str(e)}")
-                    domestic_labels.append('未知')
-            
-            df['domestic_overseas_label'] = domestic_labels
-            print("已生成国内/国外标签")
-        
-        # 处理 video_link 列
-        # 修改处理 video_link 列的逻辑
-        # 在 process_excel 函数中找到处理 video_link 的部分，替换为：
-        # 处理 video_link 列
-        possible_link_columns = ['link', 'video_link', 'video_url', 'url', 'ahmain']
-        link_found = False
-        for link_col in possible_link_columns:
-            if link_col in df.columns:
-                df['video_link'] = df[link_col]
-                link_found = True
-                print(f"使用 {link_col} 列作为 video_link")
-                break
-        
-        if not link_found:
-            df['video_link'] = pd.NA
-            print("未找到任何链接列，video_link 设置为空")
-
-        # 处理 published_date 格式
-        if 'published_date' in df.columns:
-            def convert_date(date_val):
-                if pd.isna(date_val):
-                    return date_val
-                try:
-                    # 转换为字符串
-                    date_str = str(date_val).strip()
-                    
-                    # 处理中文格式日期
-                    if '年' in date_str and '月' in date_str and '日' in date_str:
-                        # 提取年月日
-                        match = re.search(r'(\d{4})年(\d{2})月(\d{2})日', date_str)
-                        if match:
-                            year, month, day = match.groups()
-                            return f"{year}-{month}-{day}"
-                    
-                    # 尝试用pandas处理其他格式
-                    parsed_date = pd.to_datetime(date_str, errors='coerce')
-                    if pd.notna(parsed_date):
-                        return parsed_date.strftime('%Y-%m-%d')
-                    
-                    return date_str
-                except Exception as e:
-                    print(f"日期转换错误 ({date_val}): {str(e)}")
-                    return date_val
-
-            df['published_date'] = df['published_date'].apply(convert_date)
-            print("统一 published_date 格式完成")
-
-        # 新增：根据 published_date 创建 date 列
-        if 'published_date' in df.columns:
-            df['date'] = df['published_date'].apply(
-                lambda x: str(x).split('_')[0] if pd.notna(x) and '_' in str(x) else (str(x).split(' ')[0] if pd.notna(x) and ' ' in str(x) else (str(x) if pd.notna(x) else pd.NA))
+            df.iloc[:, first_idx] = df.iloc[:, first_idx].combine(
+                df.iloc[:, i], 
+                lambda x, y: x if pd.notna(x) else y
             )
-            # 再次尝试转换为标准日期格式 YYYY-MM-DD，以防原始数据只有日期
-            df['date'] = pd.to_datetime(df['date'], errors='coerce').dt.strftime('%Y-%m-%d')
-        else:
-            print("警告: 缺少 published_date 列，无法创建 date 列")
-            df['date'] = pd.NA
-
-
-        # 填充缺失列
-        for col in MASTER_COLUMNS:
-            if col not in df.columns:
-                print(f"添加缺失列: {col}")
-                df[col] = pd.NA
-                
-        # 列排序过滤
-        df = df.reindex(columns=MASTER_COLUMNS)
-        
-        # 数据类型转换
-        # 处理数值列
-        numeric_columns = ['like', 'comment', 'share', 'collect', 'subscribers', 'video_views']
-        for col in numeric_columns:
-            if col in df.columns:
-                try:
-                    # 1. 先将列转换为字符串
-                    df[col] = df[col].astype(str)
-                    
-                    # 2. 清理千位分隔符和其他非数字字符（保留小数点）
-                    df[col] = df[col].str.replace(',', '').str.replace('，', '')
-                    df[col] = df[col].str.extract('([-+]?\d*\.?\d+)', expand=False)
-                    
-                    # 3. 转换为数值类型
-                    df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype('int64')
-                    
-                    # 4. 打印一些调试信息
-                    print(f"处理 {col} 列完成，最大值: {df[col].max()}, 最小值: {df[col].min()}")
-                except Exception as e:
-                    print(f"处理 {col} 列时出错: {str(e)}")
-                    continue
-        
-        # 注意：根据要求，不再转换playthrough_rate，保留原始数据
-        # 只进行基础类型处理，确保是字符串或数值类型
-        if 'playthrough_rate' in df.columns:
-            try:
-                # 确保playthrough_rate列非空
-                df['playthrough_rate'] = df['playthrough_rate'].fillna(0)
-            except Exception as e:
-                print(f"处理playthrough_rate列时出错: {str(e)}")
-        
-        # 处理avg_play_duration列：对于国内数据，需要去除"秒"字
-        if 'avg_play_duration' in df.columns:
+    
+    # 按位置删除重复列（按列名删除会把同名的第一列也一起删掉）
+    duplicate_positions = {i for _, i in plan['duplicates']}
+    df = df.iloc[:, [i for i in range(len(df.columns)) if i not in duplicate_positions]]
+    print(f"去重后列名: {df.columns.tolist()}")
+    return df
+
+def profile_from_filename(filename):
+    """从文件名中提取账号：优先取平台名称后 '-' 之后的部分，没有平台名称时取最后一个 '-' 之后的部分"""
+    filename_without_ext = os.path.splitext(filename)[0]
+    for platform in PLATFORM_MAPPING.keys():
+        if platform in filename_without_ext:
+            # 从平台名称后的第一个'-'开始截取
+            remaining = filename_without_ext[filename_without_ext.find(platform) + len(platform):]
+            if remaining.startswith('-'):
+                profile_name = remaining[1:].strip()
+                print(f"从文件名成功提取 profile: {profile_name}")
+                return profile_name
+    if '-' in filename_without_ext:
+        profile_name = filename_without_ext.split('-')[-1].strip()
+        print(f"从文件名提取 profile（无平台标识）: {profile_name}")
+        return profile_name
+    print("无法从文件名提取 profile")
+    return None
+
+def stage_required_columns(df, ctx):
+    """补全关键列：缺少 profile 时从文件名提取，其他缺少的列填入“未知”"""
+    for col in ['post', 'profile', 'published_date']:
+        if col in df.columns:
+            continue
+        print(f"警告: 缺少关键列 '{col}'")
+        value = None
+        if col == 'profile':
             try:
-                # 创建一个新列用于存储处理后的值
-                processed_values = []
-                
-                for idx, value in enumerate(df['avg_play_duration']):
-                    try:
-                        if pd.isna(value):
-                            processed_values.append(0)
-                            continue
-                            
-                        # 将值转换为字符串
-                        value_str = str(value)
-                        
-                        # 对于包含"秒"的值(国内数据)，提取数字部分
-                        if '秒' in value_str:
-                            # 使用正则表达式提取数字部分，包括小数点
-                            match = re.search(r'(\d+\.?\d*)', value_str)
-                            if match:
-                                processed_values.append(float(match.group(1)))
-                            else:
-                                processed_values.append(0)
-                        else:
-                            # 尝试直接转换为数值
-                            try:
-                                processed_values.append(float(value_str))
-                            except:
-                                # 如果无法转换，尝试提取数字部分
-                                match = re.search(r'(\d+\.?\d*)', value_str)
-                                if match:
-                                    processed_values.append(float(match.group(1)))
-                                else:
-                                    processed_values.append(0)
-                    except Exception as e:
-                        print(f"处理第{idx}行avg_play_duration时出错: {str(e)}")
-                        processed_values.append(0)
-                
-                # 更新列值
-                df['avg_play_duration'] = processed_values
-                print("avg_play_duration列处理完成")
-                
+                value = profile_from_filename(ctx.filename)
             except Exception as e:
-                print(f"处理avg_play_duration列时出错: {str(e)}")
-        
-        # 处理post列中的换行符，确保数据一致性
-        if 'post' in df.columns:
-            df['post'] = df['post'].astype(str).apply(lambda x: x.replace('\n', ' ').replace('\r', ''))
-            print("处理post列中的换行符")
-        
-        # 在处理完其他列之后，添加game_label列
-        if 'post' in df.columns:
-            print("正在生成game_label...")
-            df['game_label'] = df['post'].apply(determine_game_label)
-            print("game_label生成完成")
+                print(f"从文件名提取 profile 时出错: {str(e)}")
+        df[col] = value if value is not None else "未知" + col
+    return df
+
+def stage_dates(df, ctx):
+    """统一 published_date 格式，并同时生成 date 列"""
+    if 'published_date' in df.columns:
+        df['published_date'], df['date'] = normalize_dates(df['published_date'])
+        print("统一 published_date 格式完成")
+    else:
+        print("警告: 缺少 published_date 列，无法创建 date 列")
+        df['date'] = pd.NA
+    return df
+
+def stage_network(df, ctx):
+    """国外文件使用数据中的 network 列，国内文件从文件名推断平台"""
+    if ctx.is_foreign:
+        if 'network' in df.columns:
+            print("使用数据中的network列")
+        else:
+            df['network'] = "国外平台"
+    else:
+        df['network'] = ctx.platform if ctx.platform else 'Unknown'
+        print(f"从文件名推断平台: {df['network'].iloc[0]}")
+    return df
+
+def stage_post_text(df, ctx):
+    """规范化 post：去掉首尾空白，连续空白（包括换行）合并为一个空格，缺失值为空字符串"""
+    posts = df['post']
+    text = posts.astype(str).str.replace(POST_WHITESPACE_PATTERN, ' ', regex=True).str.strip(' ')
+    df['post'] = text.where(posts.notna(), '')
+    return df
+
+def _id_part(df, col, missing):
+    """post_id 的一个组成部分：缺失值为 missing，其余转换为文本；没有该列时为空字符串"""
+    if col not in df.columns:
+        return pd.Series('', index=df.index)
+    values = df[col]
+    return values.astype(str).where(values.notna(), missing)
+
+def _format_pub_date(value):
+    """非文本的发布时间（如 Timestamp）转换为 post_id 中的日期部分"""
+    try:
+        return pd.Timestamp(value).strftime('%Y-%m-%d_%H:%M:%S')
+    except Exception:
+        return str(value).replace('/', '-').replace(' ', '_')
+
+def _pub_date_part(df):
+    """post_id 的发布时间部分：文本中的 / 替换为 -、空格替换为 _，缺失值为 unknown_date"""
+    if 'published_date' not in df.columns:
+        return pd.Series('', index=df.index)
+    dates = df['published_date']
+    missing = dates.isna()
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        text = dates.dt.strftime('%Y-%m-%d_%H:%M:%S')
+    else:
+        text = dates.astype(str).str.replace('/', '-', regex=False).str.replace(' ', '_', regex=False)
+        if dates.dtype == object:
+            # 跳过 dates 阶段时可能混有 Timestamp、数字等非文本值，逐个转换（通常很少）
+            objects = dates.to_numpy(dtype=object)
+            is_text = np.fromiter((isinstance(x, str) for x in objects), dtype=bool, count=len(objects))
+            others = ~is_text & ~missing.to_numpy()
+            if others.any():
+                text = text.astype(object)
+                text[others] = [_format_pub_date(value) for value in objects[others]]
+    return text.where(~missing, 'unknown_date')
+
+def stage_post_id(df, ctx):
+    """使用已有的 post_id 列（包括模糊匹配），没有时由 post、network、profile 和发布时间生成
+
+    生成时按列拼接，结果与逐行拼接 f"{post}_{network}_{profile}_{发布时间}" 相同。
+    """
+    post_id_cols = [c for c in df.columns if 'post_id' in c]
+    if post_id_cols:
+        print(f"使用已有的post_id列: {post_id_cols[0]}")
+        df['post_id'] = df[post_id_cols[0]].astype(str).str.strip()
+        return df
+
+    print("生成post_id")
+    # 替换post中的换行符，避免因换行导致的识别问题
+    post = _id_part(df, 'post', 'unknown_post').str.replace('\n', ' ', regex=False).str.replace('\r', '', regex=False)
+    network = _id_part(df, 'network', 'unknown_network')
+    profile = _id_part(df, 'profile', 'unknown_profile')
+    df['post_id'] = post + '_' + network + '_' + profile + '_' + _pub_date_part(df)
+    return df
+
+def stage_labels(df, ctx):
+    """国内/国外标签：国外文件全部为国外，国内文件按账号名称中的关键词判断"""
+    if ctx.is_foreign:
+        df['domestic_overseas_label'] = '国外'
+        print("文件标记为国外数据")
+        return df
+
+    profiles = df['profile']
+    missing = profiles.isna().to_numpy()
+    overseas = profiles.astype(str).str.contains(OVERSEAS_PROFILE_PATTERN, regex=True, na=False).to_numpy(dtype=bool)
+    labels = np.where(overseas, '国外', '国内').astype(object)
+    labels[missing] = '未知'
+    df['domestic_overseas_label'] = labels
+    print("已生成国内/国外标签")
+    return df
+
+def stage_video_link(df, ctx):
+    for link_col in LINK_COLUMNS:
+        if link_col in df.columns:
+            df['video_link'] = df[link_col]
+            print(f"使用 {link_col} 列作为 video_link")
+            return df
+    df['video_link'] = pd.NA
+    print("未找到任何链接列，video_link 设置为空")
+    return df
+
+def stage_master_columns(df, ctx):
+    """补全缺失的列并按 MASTER_COLUMNS 排序，去掉其他列"""
+    for col in MASTER_COLUMNS:
+        if col not in df.columns:
+            print(f"添加缺失列: {col}")
+            df[col] = pd.NA
+    return df.reindex(columns=MASTER_COLUMNS)
+
+# avg_play_duration 文本中的数字，例如 12.5秒 中的 12.5
+DURATION_NUMBER_PATTERN = r'(\d+\.?\d*)'
+
+def _text_to_float(text):
+    """与 float(text) 相同，无法转换时返回 None"""
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+def parse_duration_values(values):
+    """avg_play_duration 转换为秒数：国内数据带“秒”字，提取其中的数字；无法识别时为 0
+
+    按列处理：数值单元格直接转换；文本单元格去重后每个不同的文本只解析一次，不带“秒”字的先按 float 转换，
+    带“秒”字或无法转换的再用 str.extract 一次提取数字。没有任何可识别的值时与原来一样为整数 0。
+    """
+    values = pd.Series(values)
+    seconds = np.zeros(len(values))
+    found = np.zeros(len(values), dtype=bool)
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        numbers = values.to_numpy(dtype='float64', na_value=np.nan)
+        found = ~np.isnan(numbers)
+        seconds[found] = numbers[found]
+    else:
+        objects = values.to_numpy(dtype=object)
+        present = np.flatnonzero(~values.isna().to_numpy())
+        codes, uniques = pd.factorize(objects[present])
+        # 使用 object 类型：Series.str 使用 Python 的 re，\d 与原来一样匹配全角数字
+        texts = pd.Series([str(value) for value in uniques], dtype=object)
+        parsed = np.zeros(len(texts))
+        parsed_found = np.zeros(len(texts), dtype=bool)
+        # 不使用 to_numeric：它转换小数的舍入与 float 不完全相同
+        for i, text in enumerate(texts):
+            number = None if '秒' in text else _text_to_float(text)
+            if number is not None:
+                parsed[i] = number
+                parsed_found[i] = True
+        extract = np.flatnonzero(~parsed_found)
+        if len(extract):
+            digits = texts.iloc[extract].str.extract(DURATION_NUMBER_PATTERN, expand=False)
+            matched = digits.notna().to_numpy()
+            parsed[extract[matched]] = [float(text) for text in digits[matched]]
+            parsed_found[extract[matched]] = True
+        seconds[present] = parsed[codes]
+        found[present] = parsed_found[codes]
+    
+    if found.any() or len(values) == 0:
+        return seconds
+    return seconds.astype('int64')
+
+def stage_numerics(df, ctx):
+    """指标列解析为整数，playthrough_rate 保留原始数据只补 0，avg_play_duration 转换为秒数"""
+    try:
+        df = parse_metric_columns(df)
+        for col in METRIC_COLUMNS:
+            print(f"处理 {col} 列完成，最大值: {df[col].max()}, 最小值: {df[col].min()}")
+    except Exception as e:
+        print(f"处理数值列时出错: {str(e)}")
+    
+    # 注意：根据要求，不再转换playthrough_rate，保留原始数据
+    if 'playthrough_rate' in df.columns:
+        try:
+            df['playthrough_rate'] = df['playthrough_rate'].fillna(0)
+        except Exception as e:
+            print(f"处理playthrough_rate列时出错: {str(e)}")
+    
+    if 'avg_play_duration' in df.columns:
+        try:
+            df['avg_play_duration'] = parse_duration_values(df['avg_play_duration'])
+            print("avg_play_duration列处理完成")
+        except Exception as e:
+            print(f"处理avg_play_duration列时出错: {str(e)}")
+    return df
+
+def stage_game_label(df, ctx):
+    if 'post' in df.columns:
+        print("正在生成game_label...")
+        df['game_label'] = label_games(df['post'])
+        print("game_label生成完成")
+    return df
+
+def stage_schema(df, ctx):
+    """转换为紧凑类型，各文件类型一致，合并时不会退回 object"""
+    return apply_master_schema(df)
+
+def stage_post_key(df, ctx):
+    """生成 post_id 的哈希键（post_key 列），合并多个文件后去重时直接使用"""
+    df[POST_KEY_COLUMN] = hash_post_ids(df['post_id'])
+    return df
+
+# 规范化流水线：按顺序执行的命名阶段，每个阶段为 func(df, ctx) -> df，每列只在一个阶段中处理。
+# 表头检测在读取文件时完成（read_sheets / iter_process_excel），这里从列名映射开始。
+# platforms 不为空时该阶段只处理文件名中识别出这些平台的文件（见 register_stage）
+NORMALIZE_STAGES = [
+    {'name': 'rename', 'func': stage_rename, 'platforms': None},
+    {'name': 'dedup_columns', 'func': stage_dedup_columns, 'platforms': None},
+    {'name': 'required_columns', 'func': stage_required_columns, 'platforms': None},
+    {'name': 'dates', 'func': stage_dates, 'platforms': None},
+    {'name': 'network', 'func': stage_network, 'platforms': None},
+    {'name': 'post_text', 'func': stage_post_text, 'platforms': None},
+    {'name': 'post_id', 'func': stage_post_id, 'platforms': None},
+    {'name': 'labels', 'func': stage_labels, 'platforms': None},
+    {'name': 'video_link', 'func': stage_video_link, 'platforms': None},
+    {'name': 'columns', 'func': stage_master_columns, 'platforms': None},
+    {'name': 'numerics', 'func': stage_numerics, 'platforms': None},
+    {'name': 'game_label', 'func': stage_game_label, 'platforms': None},
+    {'name': 'schema', 'func': stage_schema, 'platforms': None},
+    {'name': 'post_key', 'func': stage_post_key, 'platforms': None},
+]
+
+# 默认跳过的阶段名称，例如 {'game_label'}；也可以在调用 normalize_dataframe 时指定
+SKIP_STAGES = set()
+
+def register_stage(name, func, after=None, before=None, platforms=None):
+    """添加自定义阶段，例如新平台需要的特殊处理
+
+    after/before 为已有阶段的名称，都不指定时放在 columns 之前（此时 MASTER_COLUMNS 以外的列仍然可用）；
+    platforms 为平台名称列表（PLATFORM_MAPPING 中的值），只处理这些平台的文件。同名阶段会被替换。
+    """
+    names = [stage['name'] for stage in NORMALIZE_STAGES]
+    if name in names:
+        NORMALIZE_STAGES.pop(names.index(name))
+        names.remove(name)
+    anchor = after or before or 'columns'
+    if anchor not in names:
+        raise ValueError(f"不存在的阶段: {anchor}")
+    position = names.index(anchor) + (1 if after else 0)
+    NORMALIZE_STAGES.insert(position, {'name': name, 'func': func, 'platforms': set(platforms) if platforms else None})
+
+def normalize_dataframe(df, filename, skip=None, timings=None):
+    """对已读取的数据依次执行 NORMALIZE_STAGES：列名清洗、字段补全、格式统一和标签生成
+
+    skip 为需要跳过的阶段名称（默认 SKIP_STAGES）；传入 timings（dict）时累加各阶段的耗时（秒）。
+    """
+    skip = SKIP_STAGES if skip is None else set(skip)
+    ctx = NormalizeContext(filename)
+    for stage in list(NORMALIZE_STAGES):
+        name = stage['name']
+        if name in skip or (stage['platforms'] is not None and ctx.platform not in stage['platforms']):
+            continue
+        start = time.perf_counter()
+        df = stage['func'](df, ctx)
+        ctx.timings[name] = time.perf_counter() - start
+
+    if timings is not None:
+        for name, seconds in ctx.timings.items():
+            timings[name] = timings.get(name, 0.0) + seconds
+    print(f"处理完成，最终数据行数: {len(df)}")
+    print("各阶段耗时: " + ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in ctx.timings.items()))
+    return df
+
+def process_excel(file_path):
+    try:
+        filename = os.path.basename(file_path)
         
-        # 确保game_label在MASTER_COLUMNS中
-        if 'game_label' not in MASTER_COLUMNS:
-            MASTER_COLUMNS.append('game_label')
+        # 一次性读取文件（工作簿只打开一次并读入所有 sheet），并在内存中确定表头行
+        sheets = read_sheets(file_path)
+        if not sheets:
+            print(f"{filename} 中没有可处理的数据")
+            return None
         
-        print(f"处理完成，最终数据行数: {len(df)}")
-        return df
+        print(f"成功读取文件，行数: {sum(len(df) for df in sheets.values())}")
+        return normalize_sheets(sheets, filename)
         
     except Exception as e:
         print(f"处理 {file_path} 失败: {str(e)}")
@@ -578,113 +1307,454 @@ def process_excel(file_path):
         traceback.print_exc()
         return None
 
-# 主处理流程
-def main():
+def _rows_to_frame(rows, columns):
+    """将 openpyxl 读出的行元组转换为 DataFrame，行长度与表头对齐"""
+    width = len(columns)
+    rows = [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows]
+    df = pd.DataFrame(rows, columns=columns)
+    return df.infer_objects()
+
+def _iter_sheet_chunks(rows, chunk_size, sheet_name=None):
+    """按固定行数分批返回一个 sheet 的原始数据（rows 为 openpyxl 的行迭代器）
+
+    sheet_name 不为空（多 sheet 工作簿）时，与 read_sheets 一样跳过表头无法识别的 sheet。
+    """
+    head = list(itertools.islice(rows, HEADER_SCAN_ROWS))
+    if not head:
+        return
+    header_row = detect_header_row(pd.DataFrame(head))
+    if sheet_name is not None:
+        reason = missing_sheet_columns(pd.Series(head[header_row], dtype=object))
+        if reason is not None:
+            print(f"sheet {sheet_name} {reason}，不是数据表，跳过")
+            return
+    columns = make_header_names(head[header_row])
+    
+    batch = list(head[header_row + 1:])
+    # 与 read_excel 一致：中间的空行保留，末尾的空行丢弃，因此空行先暂存，遇到非空行再放入批次
+    pending_blank = []
+    for row in rows:
+        if all(value is None for value in row):
+            pending_blank.append(row)
+            continue
+        if pending_blank:
+            batch.extend(pending_blank)
+            pending_blank = []
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield _rows_to_frame(batch, columns)
+            batch = []
+    
+    # 去掉表头之后紧跟的末尾空行
+    while batch and all(value is None for value in batch[-1]):
+        batch.pop()
+    if batch:
+        yield _rows_to_frame(batch, columns)
+
+def _iter_xlsx_chunks(file_path, chunk_size):
+    """使用 openpyxl 只读模式逐行读取 xlsx 的所有 sheet，返回 (sheet 名称, 原始数据批)
+
+    只有一个 sheet 时 sheet 名称为 None。
+    """
+    # openpyxl 只在流式读取时需要，不在启动时导入
+    import openpyxl
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
     try:
-        # 使用新的函数获取应用程序路径
-        app_path = get_application_path()
-        print(f"应用程序路径: {app_path}")
-        
-        # 使用应用程序路径来定义文件夹路径
-        EXCEL_DIR = os.path.join(app_path, "files")
-        output_dir = os.path.join(app_path, "processed_files")
-        
-        print(f"输入文件夹路径: {EXCEL_DIR}")
-        print(f"处理后文件夹路径: {output_dir}")
-        
-        # 确保文件夹存在
-        if not os.path.exists(EXCEL_DIR):
-            os.makedirs(EXCEL_DIR)
-            print(f"创建输入文件夹: {EXCEL_DIR}")
-        
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-            print(f"创建处理后文件夹: {output_dir}")
-        
-        all_data = []
-        processed_files = 0
-        failed_files = 0
-        
-        # 获取所有需要处理的文件（同时支持.xlsx和.csv）
-        excel_files = [f for f in os.listdir(EXCEL_DIR) 
-                    if (f.endswith(".xlsx") or f.endswith(".csv")) 
-                    and not f.startswith("merged_")]
+        worksheets = workbook.worksheets
+        for worksheet in worksheets:
+            sheet_name = worksheet.title if len(worksheets) > 1 else None
+            for chunk in _iter_sheet_chunks(worksheet.iter_rows(values_only=True), chunk_size, sheet_name):
+                yield sheet_name, chunk
+    finally:
+        workbook.close()
+
+def _iter_csv_chunks(file_path, chunk_size):
+    """使用 read_csv 的 chunksize 分批读取 CSV，编码只根据文件开头的样本判断（之后的内容无法解码时报错而不是错误解码）"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(STREAM_ENCODING_SAMPLE_BYTES)
+    
+    encoding = None
+    for candidate in sniff_csv_encodings(sample):
+        try:
+            # 样本末尾可能截断多字节字符，使用增量解码器忽略最后不完整的部分
+            decoder = codecs.getincrementaldecoder(candidate)()
+            decoder.decode(sample, final=False)
+            encoding = candidate
+            break
+        except UnicodeDecodeError:
+            continue
+    if encoding is None:
+        raise ValueError(f"无法确定CSV文件的编码: {os.path.basename(file_path)}")
+    
+    df_head = pd.read_csv(file_path, nrows=HEADER_SCAN_ROWS, header=None, encoding=encoding)
+    print(f"成功使用 {encoding} 编码读取CSV文件")
+    header_row = detect_header_row(df_head)
+    
+    with pd.read_csv(file_path, header=header_row, encoding=encoding, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield chunk.reset_index(drop=True)
+
+def iter_process_excel(file_path, chunk_size=STREAM_CHUNK_ROWS):
+    """流式处理大文件：按 chunk_size 行分批读取并执行与 process_excel 相同的规范化，逐批返回结果
+    
+    内存占用只与批大小有关，与文件大小无关。.xls 文件无法流式读取，会整体读入后再分批处理。
+    """
+    filename = os.path.basename(file_path)
+    
+    if file_path.endswith('.xlsx'):
+        raw_chunks = _iter_xlsx_chunks(file_path, chunk_size)
+    elif file_path.endswith('.xls'):
+        sheets = read_sheets(file_path)
+        raw_chunks = ((sheet_name if len(sheets) > 1 else None, df.iloc[i:i + chunk_size].reset_index(drop=True))
+                      for sheet_name, df in sheets.items() for i in range(0, len(df), chunk_size))
+    else:
+        raw_chunks = ((None, chunk) for chunk in _iter_csv_chunks(file_path, chunk_size))
+    
+    total_rows = 0
+    for sheet_name, chunk in raw_chunks:
+        processed = normalize_dataframe(chunk, filename)
+        if sheet_name is not None:
+            processed[SHEET_NAME_COLUMN] = pd.Categorical([sheet_name] * len(processed))
+        total_rows += len(processed)
+        yield processed
+    print(f"流式处理完成 {filename}，共 {total_rows} 行")
+
+def order_files(file_paths):
+    """确定文件处理顺序：国内文件在前、国外文件在后，同类文件按文件名排序"""
+    return sorted(file_paths, key=lambda path: (is_foreign_file(os.path.basename(path)), os.path.basename(path)))
+
+def _process_file_in_worker(file_path):
+    """进程池中执行的任务，打印当前处理的文件便于区分各进程的输出"""
+    process_type = "国外" if is_foreign_file(os.path.basename(file_path)) else "国内"
+    print(f"\n开始处理{process_type}文件: {os.path.basename(file_path)}")
+    return process_excel(file_path)
+
+def _init_worker(stages, skip_stages, quiet):
+    """子进程的初始化函数：使用与主进程相同的规范化阶段，quiet 时丢弃处理日志
+
+    spawn 启动的子进程重新导入本模块，主进程中 register_stage 添加的阶段和修改的 SKIP_STAGES 不会自动带过去，
+    因此自定义阶段的函数需要能被 pickle（定义在模块顶层）。
+    """
+    NORMALIZE_STAGES[:] = stages
+    SKIP_STAGES.clear()
+    SKIP_STAGES.update(skip_stages)
+    if quiet:
+        sys.stdout = open(os.devnull, 'w', encoding='utf-8')
+
+class ProcessingCancelled(Exception):
+    """批量处理被取消或超时"""
+    pass
+
+def _terminate_pool(executor):
+    """强制结束进程池中的工作进程（卡在异常文件上的进程无法通过 shutdown 结束）"""
+    # ProcessPoolExecutor 没有公开的终止接口，只能通过私有属性 _processes 找到子进程；
+    # 该属性不存在时（Python 版本变化）退化为 shutdown，只是无法中断正在执行的文件
+    processes = getattr(executor, '_processes', None) or {}
+    for process in list(processes.values()):
+        try:
+            process.terminate()
+        except Exception:
+            pass
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def _collect_results(executor, file_paths, progress=None, should_stop=None):
+    """提交到进程池并按提交顺序返回结果；每个文件完成时调用 progress，should_stop 为真时终止进程池"""
+    futures = [executor.submit(_process_file_in_worker, file_path) for file_path in file_paths]
+    future_paths = dict(zip(futures, file_paths))
+    not_done = set(futures)
+    try:
+        while not_done:
+            done, not_done = wait(not_done, timeout=STOP_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            if progress is not None:
+                for future in done:
+                    progress(future_paths[future], future.result())
+            if not_done and should_stop is not None and should_stop():
+                raise ProcessingCancelled("处理已中止")
+    except BaseException:
+        # 出错或中止时不等待仍在运行的文件
+        _terminate_pool(executor)
+        raise
+    return [future.result() for future in futures]
+
+def process_files(file_paths, workers=None, cache=None, progress=None, should_stop=None, quiet=False):
+    """处理多个文件，返回与 file_paths 顺序一致的结果列表（处理失败的文件对应 None）
+    
+    workers 为进程数，默认使用 MAX_WORKERS；为 1 或只有一个文件时在当前进程中依次处理。
+    传入 cache（cache.ProcessedFileCache）时，内容未变化的文件直接从缓存读取，只处理新文件。
+    progress(file_path, df) 在每个文件完成（包括命中缓存）时调用。
+    传入 should_stop 时文件总在子进程中处理，should_stop() 返回真（取消或超时）后终止子进程并抛出 ProcessingCancelled。
+    quiet 为真时子进程不输出处理日志（当前进程的输出由调用方控制）。
+    """
+    results = [None] * len(file_paths)
+    pending = list(range(len(file_paths)))
+    keys = {}
+    
+    if cache is not None:
+        pending = []
+        for i, file_path in enumerate(file_paths):
+            keys[i] = cache.key_for(file_path)
+            cached_df = cache.get(keys[i])
+            if cached_df is not None:
+                print(f"使用缓存结果: {os.path.basename(file_path)}")
+                results[i] = cached_df
+                if progress is not None:
+                    progress(file_path, cached_df)
+            else:
+                pending.append(i)
+    
+    pending_paths = [file_paths[i] for i in pending]
+    if workers is None:
+        workers = MAX_WORKERS
+    workers = max(1, min(workers, len(pending_paths)))
+    
+    if not pending_paths:
+        processed = []
+    elif workers == 1 and should_stop is None:
+        processed = []
+        for file_path in pending_paths:
+            processed.append(_process_file_in_worker(file_path))
+            if progress is not None:
+                progress(file_path, processed[-1])
+    else:
+        print(f"使用 {workers} 个进程并行处理 {len(pending_paths)} 个文件")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                                 initializer=_init_worker, initargs=(NORMALIZE_STAGES, SKIP_STAGES, quiet)) as executor:
+            # 按提交顺序返回结果，保证合并后的行顺序与串行处理一致
+            processed = _collect_results(executor, pending_paths, progress, should_stop)
+    
+    for i, df in zip(pending, processed):
+        results[i] = df
+        if cache is not None and df is not None:
+            cache.put(keys[i], df)
+    
+    return results
+
+def move_processed_file(file_path, output_dir):
+    try:
+        os.rename(file_path, os.path.join(output_dir, os.path.basename(file_path)))
+    except Exception as e:
+        print(f"移动文件失败: {str(e)}")
+
+def run_memory_mode(file_paths, output_path, output_format, workers=None, move_to=None, quiet=False, verbose=False):
+    """一次性模式：处理所有文件后在内存中合并、去重并写出
+    
+    返回 {'processed': 成功的文件, 'failed': 失败的文件, 'output': 结果文件路径（没有有效数据时为 None）}。
+    """
+    summary = {'processed': [], 'failed': [], 'output': None}
+    all_data = []
+    
+    start = time.perf_counter()
+    results = process_files(file_paths, workers=workers, quiet=quiet)
+    if verbose:
+        print(f"[耗时] 处理 {len(file_paths)} 个文件: {time.perf_counter() - start:.2f}s")
+    
+    for file_path, processed_df in zip(file_paths, results):
+        filename = os.path.basename(file_path)
+        if processed_df is not None:
+            all_data.append(processed_df)
+            summary['processed'].append(file_path)
+            print(f"已成功处理 {filename}")
+            if move_to:
+                move_processed_file(file_path, move_to)
+        else:
+            summary['failed'].append(file_path)
+            print(f"处理 {filename} 失败，跳过")
+    
+    print(f"\n所有文件处理完成，成功处理{len(summary['processed'])}个文件，失败{len(summary['failed'])}个文件")
+    
+    if all_data:
+        print("开始合并数据...")
+        start = time.perf_counter()
+        final_df = concat_processed(all_data)
+        print(f"合并前总行数: {sum(len(df) for df in all_data)}")
         
-        print(f"找到{len(excel_files)}个文件需要处理: {excel_files}")
+        # 合并重复的post_id
+        final_df = merge_duplicate_posts(final_df)
+        print(f"合并数据内存占用: {final_df.memory_usage(deep=True).sum() / 1024 / 1024:.1f} MB")
+        if verbose:
+            print(f"[耗时] 合并去重: {time.perf_counter() - start:.2f}s")
         
-        # 先处理国内文件，再处理国外文件（可以根据需要调整顺序）
-        for is_foreign_process in [False, True]:
-            process_type = "国外" if is_foreign_process else "国内"
-            
-            for filename in excel_files:
-                # 检查当前文件是否符合当前处理类型
-                if is_foreign_file(filename) == is_foreign_process:
-                    file_path = os.path.join(EXCEL_DIR, filename)
-                    print(f"\n开始处理{process_type}文件: {filename}")
-                    
-                    processed_df = process_excel(file_path)
-                    if processed_df is not None:
-                        all_data.append(processed_df)
-                        processed_files += 1
-                        print(f"已成功处理 {filename}，移动到已处理目录")
-                        try:
-                            os.rename(file_path, os.path.join(output_dir, filename))
-                        except Exception as e:
-                            print(f"移动文件失败: {str(e)}")
-                    else:
-                        failed_files += 1
-                        print(f"处理 {filename} 失败，跳过")
+        # 保存结果
+        start = time.perf_counter()
+        write_output(format_for_export(final_df), output_path, output_format)
+        if verbose:
+            print(f"[耗时] 写出结果: {time.perf_counter() - start:.2f}s")
+        summary['output'] = output_path
+        print(f"合并完成！输出文件：{output_path}")
+    else:
+        print("\n没有需要处理的有效文件")
+    return summary
+
+def run_store_mode(file_paths, store_path, output_path, output_format, move_to=None, verbose=False):
+    """增量模式：逐个文件流式写入 SQLite 数据库（按 post_id 合并），再从数据库流式导出全部累积数据
+    
+    内存占用只与批大小有关；之前运行写入的数据会一并导出。返回值与 run_memory_mode 相同。
+    """
+    from store import PostStore
+    
+    summary = {'processed': [], 'failed': [], 'output': None}
+    with PostStore(store_path) as store:
+        print(f"使用数据库: {store_path}，已有 {store.count()} 个 post")
+        for file_path in file_paths:
+            filename = os.path.basename(file_path)
+            start = time.perf_counter()
+            if store.add_file(file_path) is None:
+                summary['failed'].append(file_path)
+                print(f"处理 {filename} 失败，跳过")
+                continue
+            if verbose:
+                print(f"[耗时] {filename}: {time.perf_counter() - start:.2f}s")
+            summary['processed'].append(file_path)
+            if move_to:
+                move_processed_file(file_path, move_to)
         
-        print(f"\n所有文件处理完成，成功处理{processed_files}个文件，失败{failed_files}个文件")
+        print(f"\n所有文件处理完成，成功处理{len(summary['processed'])}个文件，失败{len(summary['failed'])}个文件")
         
-        if all_data:
-            print("开始合并数据...")
-            final_df = pd.concat(all_data, ignore_index=True)
-            print(f"合并前总行数: {sum(len(df) for df in all_data)}")
-            
-            # 检查重复的post_id
-            duplicate_count = final_df['post_id'].duplicated().sum()
-            if duplicate_count > 0:
-                print(f"发现{duplicate_count}个重复的post_id，进行数据合并")
-                
-                # 使用正确的列名
-                numeric_cols = ['video_views', 'like', 'comment', 'share', 'collect']
-                
-                # 先获取重复的post_id
-                duplicated_posts = final_df[final_df['post_id'].duplicated(keep=False)]
-                unique_posts = final_df[~final_df['post_id'].duplicated(keep='first')]
-                
-                # 对重复的post_id的数值列求和
-                summed_values = duplicated_posts.groupby('post_id')[numeric_cols].sum()
-                
-                # 更新unique_posts中对应行的数值
-                for post_id in summed_values.index:
-                    for col in numeric_cols:
-                        unique_posts.loc[unique_posts['post_id'] == post_id, col] = summed_values.loc[post_id, col]
-                
-                final_df = unique_posts
-                print(f"合并后行数: {len(final_df)}")
-            
-            # 生成输出路径
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_path = os.path.join(
-                app_path,
-                f"merged_data_{timestamp}.xlsx"
-            )
-            
-            # 保存结果
-            final_df.to_excel(output_path, index=False)
-            print(f"合并完成！输出文件：{output_path}")
+        if store.count():
+            start = time.perf_counter()
+            store.export(output_path, output_format)
+            if verbose:
+                print(f"[耗时] 导出结果: {time.perf_counter() - start:.2f}s")
+            summary['output'] = output_path
+            print(f"导出完成！输出文件：{output_path}")
         else:
-            print("\n没有需要处理的有效文件")
+            print("\n数据库中没有数据")
+    return summary
+
+# 直接处理目录或通配符时识别的文件类型
+INPUT_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+def resolve_output(output, output_format, app_path):
+    """确定输出路径和格式：未指定 -o 时为程序目录下的 merged_data_<时间>；-o 为目录时在其中生成该文件名；
+    未指定 --format 时按 -o 的扩展名判断，没有扩展名时使用默认格式"""
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if output is None or os.path.isdir(output):
+        fmt = check_format(output_format)
+        return output_path_for(os.path.join(output or app_path, f"merged_data_{timestamp}"), fmt), fmt
+    
+    base, extension = os.path.splitext(output)
+    if output_format is None:
+        fmt = check_format(extension or None)
+        return (output if extension else output_path_for(base, fmt)), fmt
+    fmt = check_format(output_format)
+    return (output if extension.lower() == OUTPUT_FORMATS[fmt]['extension'] else output_path_for(output, fmt)), fmt
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="批量处理 Excel/CSV 文件：规范化、合并去重后输出一个结果文件",
+        epilog="不指定输入时处理程序目录下的 files 文件夹，处理成功的文件移动到 processed_files。"
+               "例如: python main.py 'exports/**/*.xlsx' data/ -o out/merged.csv -j 4 -q。" + cli.EXIT_CODES_HELP,
+    )
+    parser.add_argument("inputs", nargs="*", help="输入文件、目录或通配符（支持 **）")
+    parser.add_argument("-o", "--output", help="结果文件路径或目录，默认为程序目录下的 merged_data_<时间>")
+    parser.add_argument("-f", "--format", choices=list(OUTPUT_FORMATS), default=None,
+                        help=f"输出格式，默认按 -o 的扩展名判断，否则为 {DEFAULT_OUTPUT_FORMAT}")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="并行处理的进程数，默认为 CPU 核数")
+    parser.add_argument("--move-to", metavar="DIR", default=None,
+                        help="处理成功的文件移动到该目录（不指定输入时默认为 processed_files，指定输入时默认不移动）")
+    parser.add_argument("--store", nargs="?", const="", default=None, metavar="DB",
+                        help="增量模式：处理结果累积到 SQLite 数据库（默认为程序目录下的 processed_data.db），从数据库导出全部数据")
+    parser.add_argument("--watch", action="store_true",
+                        help="持续监视输入目录，只处理新文件并增量更新数据库和 merged_data 合并结果（隐含 --store）")
+    parser.add_argument("--interval", type=float, default=2.0, help="监视模式下轮询目录的间隔（秒）")
+    cli.add_common_arguments(parser)
+    return parser
+
+def main(argv=None):
+    """命令行入口，返回退出码"""
+    if argv is None:
+        argv = sys.argv[1:]
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    level = cli.verbosity(args)
+    app_path = get_application_path()
+    if level == cli.VERBOSE:
+        print(f"[耗时] 启动（导入模块）: {IMPORT_SECONDS:.2f}s")
+    
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers 必须大于 0")
+    
+    # 不指定输入时保持原来的行为：处理 files 目录，处理成功的文件移动到 processed_files
+    if args.inputs:
+        move_to = args.move_to
+        file_paths, missing = cli.expand_inputs(args.inputs, INPUT_EXTENSIONS)
+        if missing:
+            parser.error(f"找不到输入: {', '.join(missing)}")
+    else:
+        input_dir = os.path.join(app_path, "files")
+        move_to = args.move_to or os.path.join(app_path, "processed_files")
+        os.makedirs(input_dir, exist_ok=True)
+        file_paths, _ = cli.expand_inputs([input_dir], INPUT_EXTENSIONS)
+    if move_to:
+        os.makedirs(move_to, exist_ok=True)
+    
+    store_path = args.store
+    if store_path == "" or (args.watch and store_path is None):
+        from store import DEFAULT_STORE_FILE
+        store_path = os.path.join(app_path, DEFAULT_STORE_FILE)
+    
+    try:
+        output_path, output_format = resolve_output(args.output, args.format, app_path)
+    except ValueError as e:
+        parser.error(str(e))
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    
+    if args.watch:
+        from watcher import FolderWatcher
+        if len(args.inputs) > 1 or (args.inputs and not os.path.isdir(args.inputs[0])):
+            parser.error("--watch 只能指定一个输入目录")
+        input_dir = args.inputs[0] if args.inputs else os.path.join(app_path, "files")
+        if args.output is None:
+            output_path = output_path_for(os.path.join(app_path, "merged_data"), output_format)
+        with cli.quiet_output(level == cli.QUIET):
+            FolderWatcher(input_dir, move_to or os.path.join(input_dir, "processed"), store_path,
+                          output_path, output_format, interval=args.interval).run()
+        return cli.EXIT_OK
+    
+    start = time.perf_counter()
+    code = cli.EXIT_FAILED
+    summary = None
+    with cli.quiet_output(level == cli.QUIET):
+        try:
+            print(f"应用程序路径: {app_path}")
+            # 先处理国内文件，再处理国外文件，同类文件按文件名排序；workers>1 时并行处理
+            file_paths = order_files(file_paths)
+            print(f"找到{len(file_paths)}个文件需要处理: {[os.path.basename(path) for path in file_paths]}")
             
-    except Exception as e:
-        print(f"主处理流程发生错误: {str(e)}")
-        traceback.print_exc()
+            # 增量模式下即使没有新文件，也导出数据库中已累积的数据
+            if not file_paths and not store_path:
+                code = cli.EXIT_NO_INPUT
+            elif store_path:
+                summary = run_store_mode(file_paths, store_path, output_path, output_format,
+                                         move_to=move_to, verbose=level == cli.VERBOSE)
+            else:
+                summary = run_memory_mode(file_paths, output_path, output_format, workers=args.workers,
+                                          move_to=move_to, quiet=level == cli.QUIET, verbose=level == cli.VERBOSE)
+        except Exception as e:
+            cli.error(f"主处理流程发生错误: {str(e)}")
+            traceback.print_exc()
+    
+    if code == cli.EXIT_NO_INPUT:
+        cli.error("没有找到需要处理的文件")
+    elif summary is not None:
+        for file_path in summary['failed']:
+            cli.error(f"处理失败: {file_path}")
+        if summary['output'] is None:
+            code = cli.EXIT_FAILED if file_paths else cli.EXIT_NO_INPUT
+        else:
+            code = cli.EXIT_PARTIAL if summary['failed'] else cli.EXIT_OK
+            if level == cli.QUIET:
+                print(summary['output'])
+    if level == cli.VERBOSE:
+        print(f"[耗时] 总计: {time.perf_counter() - start:.2f}s，退出码 {code}")
     
-    # 添加暂停，让用户看到结果
-    print("\n处理完成。按回车键退出...")
-    input()
+    # 双击运行时暂停，让用户看到结果
+    if cli.should_pause(args, argv):
+        print("\n处理完成。按回车键退出...")
+        input()
+    return code
 
 if __name__ == "__main__":
-    main()
+    # 打包后的可执行文件使用多进程时需要
+    multiprocessing.freeze_support()
+    sys.exit(main())
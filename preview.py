@@ -0,0 +1,223 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import main
+
+# 内存中保留的处理结果数，超出后淘汰最久未查看的结果（磁盘上的副本仍然保留，再次查看时重新读取）
+RESULT_MEMORY_LIMIT = 4
+
+# 每个结果缓存的筛选、排序结果数，翻页时不需要重新筛选和排序
+ORDER_CACHE_SIZE = 8
+
+# 每页行数
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# 流式下载时每次转换为导出格式的行数
+STREAM_CHUNK_ROWS = 20000
+
+# 处理结果在任务工作目录中的文件名（pickle，保留紧凑类型，读取时不需要重新解析）
+RESULT_FILE = 'result.pkl'
+
+# 比较结果的两张表在任务工作目录中的文件名
+COMPARISON_RESULT_FILES = {
+    'Data': 'comparison_data.pkl',
+    'Calculation': 'comparison_calculation.pkl',
+}
+
+# 可以按值筛选的列，多个值用逗号分隔
+FILTER_COLUMNS = ['network', 'profile', 'game_label', 'domestic_overseas_label']
+
+# 按日期范围筛选使用的列
+DATE_FILTER_COLUMN = 'date'
+
+
+def _split(value):
+    return [item for item in (value or '').split(',') if item]
+
+
+def _parse_int(args, name, default, minimum, maximum=None):
+    value = args.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{name} 必须为整数")
+    if number < minimum or (maximum is not None and number > maximum):
+        limit = f"必须在 {minimum} 到 {maximum} 之间" if maximum is not None else f"不能小于 {minimum}"
+        raise ValueError(f"{name} {limit}")
+    return number
+
+
+def _parse_date(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return pd.Timestamp(value)
+    except ValueError:
+        raise ValueError(f"{name} 不是有效的日期: {value}")
+
+
+def parse_query(args):
+    """解析预览接口的查询参数（request.args），参数不合法时抛出 ValueError
+
+    offset/limit 分页；columns 逗号分隔的列名；sort 排序列，order=desc 时降序；
+    network/profile/game_label/domestic_overseas_label 按值筛选；date_from/date_to 按日期筛选（包含两端）。
+    """
+    order = args.get('order', 'asc')
+    if order not in ('asc', 'desc'):
+        raise ValueError("order 只能为 asc 或 desc")
+    return {
+        'offset': _parse_int(args, 'offset', 0, 0),
+        'limit': _parse_int(args, 'limit', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE),
+        'columns': _split(args.get('columns')) or None,
+        'sort': args.get('sort') or None,
+        'descending': order == 'desc',
+        'filters': {col: _split(args.get(col)) for col in FILTER_COLUMNS if _split(args.get(col))},
+        'date_from': _parse_date(args, 'date_from'),
+        'date_to': _parse_date(args, 'date_to'),
+    }
+
+
+def _json_rows(df):
+    """转换为可直接序列化为 JSON 的行列表，缺失值为 null，日期与导出文件的格式一致"""
+    df = main.format_for_export(df)
+    return df.astype(object).where(df.notna(), None).values.tolist()
+
+
+class PreviewResult:
+    """一个处理结果的分页查询：筛选、排序后的行位置按查询条件缓存，翻页只取对应的行"""
+
+    def __init__(self, df):
+        # post_key 只用于去重，预览的列与导出文件一致
+        self.df = df.drop(columns=main.POST_KEY_COLUMN, errors='ignore').reset_index(drop=True)
+        self.options = {
+            col: sorted(str(value) for value in self.df[col].dropna().unique())
+            for col in FILTER_COLUMNS if col in self.df.columns
+        }
+        self._orders = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _positions(self, sort, descending, filters, date_from, date_to):
+        df = self.df
+        mask = np.ones(len(df), dtype=bool)
+        for col, values in filters.items():
+            if col in df.columns:
+                mask &= df[col].isin(values).to_numpy(dtype=bool)
+        if (date_from is not None or date_to is not None) and DATE_FILTER_COLUMN in df.columns:
+            dates = df[DATE_FILTER_COLUMN]
+            if not pd.api.types.is_datetime64_any_dtype(dates):
+                dates = pd.to_datetime(dates, errors='coerce')
+            if date_from is not None:
+                mask &= (dates >= date_from).to_numpy(dtype=bool)
+            if date_to is not None:
+                mask &= (dates <= date_to).to_numpy(dtype=bool)
+        positions = np.flatnonzero(mask)
+
+        if sort is not None:
+            values = df[sort].iloc[positions].reset_index(drop=True)
+            try:
+                order = values.sort_values(ascending=not descending, kind='stable', na_position='last').index
+            except TypeError:
+                # 同时含数字和文本的列（如 playthrough_rate）按文本排序
+                text = values.astype(str).where(values.notna())
+                order = text.sort_values(ascending=not descending, kind='stable', na_position='last').index
+            positions = positions[order.to_numpy()]
+        return positions
+
+    def iter_frames(self, chunk_rows=STREAM_CHUNK_ROWS):
+        """按导出格式分批返回全部数据，用于流式下载；没有数据时返回一个只有表头的空表"""
+        for start in range(0, max(len(self.df), 1), chunk_rows):
+            yield main.format_for_export(self.df.iloc[start:start + chunk_rows])
+
+    def page(self, offset=0, limit=DEFAULT_PAGE_SIZE, columns=None, sort=None, descending=False,
+             filters=None, date_from=None, date_to=None):
+        """返回一页数据：{'total', 'offset', 'limit', 'columns', 'rows', 'options'}"""
+        filters = filters or {}
+        columns = columns or list(self.df.columns)
+        unknown = [col for col in columns + ([sort] if sort else []) if col not in self.df.columns]
+        if unknown:
+            raise ValueError(f"不存在的列: {', '.join(unknown)}")
+
+        key = (sort, descending, tuple(sorted((col, tuple(values)) for col, values in filters.items())),
+               date_from, date_to)
+        with self._lock:
+            positions = self._orders.get(key)
+            if positions is not None:
+                self._orders.move_to_end(key)
+        if positions is None:
+            positions = self._positions(sort, descending, filters, date_from, date_to)
+            with self._lock:
+                self._orders[key] = positions
+                while len(self._orders) > ORDER_CACHE_SIZE:
+                    self._orders.popitem(last=False)
+
+        rows = self.df[columns].iloc[positions[offset:offset + limit]]
+        return {
+            'total': int(len(positions)),
+            'offset': offset,
+            'limit': limit,
+            'columns': columns,
+            'rows': _json_rows(rows),
+            'options': self.options,
+        }
+
+
+class ResultStore:
+    """任务的处理结果，供预览和流式下载直接使用，不需要重新生成或解析结果文件
+
+    结果按 key（如 (任务 ID, 文件名)）保存在内存中（最多 memory_limit 个），同时以 pickle 写入 path，
+    被淘汰或应用重启后从磁盘重新读取；工作目录过期清理后结果随之删除。
+    """
+
+    def __init__(self, memory_limit=RESULT_MEMORY_LIMIT):
+        self.memory_limit = memory_limit
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.memory_limit:
+                self._results.popitem(last=False)
+
+    def put(self, key, path, df):
+        """保存处理结果，先写临时文件再替换，避免读取到写了一半的文件"""
+        result = PreviewResult(df)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            result.df.to_pickle(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            # 写盘失败时仍可从内存预览，只是淘汰后无法恢复
+            print(f"保存预览数据失败: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        self._remember(key, result)
+        return result
+
+    def get(self, key, path):
+        """返回 PreviewResult，结果不存在或读取失败时返回 None"""
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                return result
+        if not os.path.exists(path):
+            return None
+        try:
+            result = PreviewResult(pd.read_pickle(path))
+        except Exception as e:
+            print(f"读取预览数据 {path} 失败: {str(e)}")
+            return None
+        self._remember(key, result)
+        return result
@@ -8,8 +8,236 @@ document.addEventListener('DOMContentLoaded', function() {
     const resultArea = document.getElementById('resultArea');
     const resultMessage = document.getElementById('resultMessage');
     const downloadButton = document.getElementById('downloadButton');
+    const downloadCsvButton = document.getElementById('downloadCsvButton');
+    const progressText = document.getElementById('progressText');
+    const progressFiles = document.getElementById('progressFiles');
+    const cancelButton = document.getElementById('cancelButton');
 
     let files = [];
+    let currentJobId = null;
+    let downloadUrl = null;
+    let csvUrl = null;
+    let currentCompareJobId = null;
+
+    // 结果预览：分页查询 /preview/<id>，翻页、排序和筛选都不需要重新生成结果文件
+    const PREVIEW_PAGE_SIZE = 50;
+    const previewArea = document.getElementById('previewArea');
+    const previewTable = document.getElementById('previewTable');
+    const previewInfo = document.getElementById('previewInfo');
+    const previewPrev = document.getElementById('previewPrev');
+    const previewNext = document.getElementById('previewNext');
+    const previewFilters = Array.from(document.querySelectorAll('.preview-filters select'));
+    const filterDateFrom = document.getElementById('filterDateFrom');
+    const filterDateTo = document.getElementById('filterDateTo');
+    let preview = null;
+
+    // 文件状态的显示文字
+    const FILE_STATUS_TEXT = {
+        pending: '等待处理',
+        done: '完成',
+        failed: '失败'
+    };
+
+    const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+    // 分块上传：网络中断时最多连续重试的次数
+    const UPLOAD_RETRIES = 5;
+
+    // 提交后台任务并轮询进度，任务结束后返回最终状态
+    async function runJob(url, formData, onProgress) {
+        const response = await fetch(url, {
+            method: 'POST',
+            body: formData
+        });
+        const submitted = await response.json();
+        if (!response.ok) {
+            throw new Error(submitted.error);
+        }
+        return waitForJob(submitted.job_id, onProgress);
+    }
+
+    // 轮询任务进度，任务结束后返回最终状态
+    async function waitForJob(jobId, onProgress) {
+        onProgress(null, jobId);
+        while (true) {
+            await sleep(500);
+            const statusResponse = await fetch(`/jobs/${jobId}`);
+            const job = await statusResponse.json();
+            if (!statusResponse.ok) {
+                throw new Error(job.error);
+            }
+            onProgress(job, jobId);
+            if (job.status === 'succeeded') {
+                return job;
+            }
+            if (['failed', 'cancelled', 'timeout'].includes(job.status)) {
+                throw new Error(job.error || job.message);
+            }
+        }
+    }
+
+    async function postJson(url, data) {
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(data)
+        });
+        const result = await response.json();
+        if (!response.ok) {
+            throw new Error(result.error);
+        }
+        return result;
+    }
+
+    // 分块上传一个文件，从服务端已接收的位置继续；网络中断时重新查询已接收的字节数后重试
+    async function uploadFileInChunks(upload, index, file, onChunk) {
+        let received = upload.files[index].received;
+        let failures = 0;
+        while (received < file.size) {
+            const chunk = file.slice(received, received + upload.chunk_size);
+            let response;
+            try {
+                response = await fetch(`/uploads/${upload.upload_id}/files/${index}?offset=${received}`, {
+                    method: 'PUT',
+                    headers: { 'Content-Type': 'application/octet-stream' },
+                    body: chunk
+                });
+            } catch (error) {
+                failures += 1;
+                if (failures > UPLOAD_RETRIES) {
+                    throw new Error(`上传 ${file.name} 失败：${error.message}`);
+                }
+                await sleep(1000 * failures);
+                const statusResponse = await fetch(`/uploads/${upload.upload_id}`).catch(() => null);
+                if (statusResponse && statusResponse.ok) {
+                    received = (await statusResponse.json()).files[index].received;
+                }
+                continue;
+            }
+            const result = await response.json();
+            // 409：起始位置与服务端不一致（如上一个分块其实已经写入），从服务端的位置继续
+            if (!response.ok && response.status !== 409) {
+                throw new Error(result.error);
+            }
+            failures = 0;
+            received = result.received;
+            onChunk(file.size ? received / file.size : 1);
+        }
+    }
+
+    // 逐个文件分块上传，每个文件上传完成后服务端立即开始处理
+    async function uploadFiles(upload, files, onUploadProgress) {
+        const total = files.reduce((sum, file) => sum + file.size, 0) || 1;
+        let uploaded = 0;
+        for (let i = 0; i < files.length; i++) {
+            await uploadFileInChunks(upload, i, files[i], (fraction) => {
+                onUploadProgress((uploaded + fraction * files[i].size) / total);
+            });
+            uploaded += files[i].size;
+        }
+        onUploadProgress(1);
+    }
+
+    function cancelJob(jobId) {
+        if (jobId) {
+            fetch(`/jobs/${jobId}/cancel`, { method: 'POST' });
+        }
+    }
+
+    function fillFilterOptions(options) {
+        previewFilters.forEach(select => {
+            select.length = 1;
+            (options[select.dataset.column] || []).forEach(value => {
+                select.add(new Option(value, value));
+            });
+            select.value = '';
+        });
+        filterDateFrom.value = '';
+        filterDateTo.value = '';
+    }
+
+    function renderPreview(page) {
+        previewTable.innerHTML = '';
+        const header = previewTable.createTHead().insertRow();
+        page.columns.forEach(column => {
+            const th = document.createElement('th');
+            const arrow = preview.sort === column ? (preview.order === 'desc' ? ' ▼' : ' ▲') : '';
+            th.textContent = column + arrow;
+            th.addEventListener('click', () => {
+                // 点击表头切换排序：升序 -> 降序
+                preview.order = preview.sort === column && preview.order === 'asc' ? 'desc' : 'asc';
+                preview.sort = column;
+                preview.offset = 0;
+                loadPreview();
+            });
+            header.appendChild(th);
+        });
+        const body = previewTable.createTBody();
+        page.rows.forEach(row => {
+            const tr = body.insertRow();
+            row.forEach(value => {
+                const td = tr.insertCell();
+                td.textContent = value === null ? '' : value;
+                td.title = td.textContent;
+            });
+        });
+        const end = Math.min(page.offset + page.rows.length, page.total);
+        previewInfo.textContent = page.total
+            ? `第 ${page.offset + 1}-${end} 行，共 ${page.total} 行`
+            : '没有符合条件的数据';
+        previewPrev.disabled = page.offset === 0;
+        previewNext.disabled = end >= page.total;
+    }
+
+    async function loadPreview() {
+        const params = new URLSearchParams({ offset: preview.offset, limit: PREVIEW_PAGE_SIZE });
+        if (preview.sort) {
+            params.set('sort', preview.sort);
+            params.set('order', preview.order);
+        }
+        previewFilters.forEach(select => {
+            if (select.value) params.set(select.dataset.column, select.value);
+        });
+        if (filterDateFrom.value) params.set('date_from', filterDateFrom.value);
+        if (filterDateTo.value) params.set('date_to', filterDateTo.value);
+
+        const url = preview.url;
+        const response = await fetch(`${url}?${params}`);
+        const page = await response.json();
+        if (url !== preview.url) return;
+        if (!response.ok) {
+            previewInfo.textContent = `预览失败：${page.error}`;
+            return;
+        }
+        if (!preview.loaded) {
+            fillFilterOptions(page.options);
+            preview.loaded = true;
+        }
+        renderPreview(page);
+    }
+
+    function showPreview(url) {
+        preview = { url: url, offset: 0, sort: null, order: 'asc', loaded: false };
+        previewArea.style.display = 'block';
+        loadPreview();
+    }
+
+    previewPrev.addEventListener('click', () => {
+        preview.offset = Math.max(0, preview.offset - PREVIEW_PAGE_SIZE);
+        loadPreview();
+    });
+
+    previewNext.addEventListener('click', () => {
+        preview.offset += PREVIEW_PAGE_SIZE;
+        loadPreview();
+    });
+
+    [...previewFilters, filterDateFrom, filterDateTo].forEach(input => {
+        input.addEventListener('change', () => {
+            preview.offset = 0;
+            loadPreview();
+        });
+    });
 
     // 拖放功能
     dropZone.addEventListener('dragover', (e) => {
@@ -69,46 +297,78 @@ document.addEventListener('DOMContentLoaded', function() {
     processButton.addEventListener('click', async () => {
         if (files.length === 0) return;
 
-        const formData = new FormData();
-        files.forEach(file => {
-            formData.append('files[]', file);
-        });
-
         processButton.disabled = true;
         progressArea.style.display = 'block';
-        progressBar.style.width = '50%';
+        progressBar.style.width = '0%';
+        progressText.textContent = '上传中...';
+        progressFiles.innerHTML = '';
 
+        let uploadText = '';
         try {
-            const response = await fetch('/upload', {
-                method: 'POST',
-                body: formData
+            const upload = await postJson('/uploads', {
+                files: files.map(file => ({ name: file.name, size: file.size })),
+                format: document.getElementById('outputFormat').value
             });
+            currentJobId = upload.job_id;
+            // 上传失败时取消任务，任务失败时停止上传
+            const uploading = uploadFiles(upload, files, (fraction) => {
+                uploadText = fraction < 1 ? `上传中 ${Math.round(fraction * 100)}%` : '';
+                if (uploadText) progressText.textContent = uploadText;
+            }).catch(error => {
+                cancelJob(upload.job_id);
+                throw error;
+            });
+            const [, job] = await Promise.all([uploading, waitForJob(upload.job_id, (job) => {
+                if (!job) return;
+                progressBar.style.width = `${job.progress * 100}%`;
+                progressText.textContent = uploadText ? `${uploadText}，${job.message}` : job.message;
+                progressFiles.innerHTML = '';
+                job.files.forEach(file => {
+                    const item = document.createElement('div');
+                    item.className = file.status;
+                    item.textContent = `${file.name}: ${FILE_STATUS_TEXT[file.status] || file.status}`;
+                    progressFiles.appendChild(item);
+                });
+            })]);
 
-            const result = await response.json();
-
-            if (response.ok) {
-                progressBar.style.width = '100%';
-                resultArea.style.display = 'block';
-                resultMessage.className = 'success';
-                resultMessage.textContent = '文件处理成功！';
-                downloadButton.style.display = 'block';
-            } else {
-                throw new Error(result.error);
-            }
+            resultArea.style.display = 'block';
+            resultMessage.className = 'success';
+            resultMessage.textContent = '文件处理成功！';
+            downloadUrl = job.result.download_url;
+            downloadButton.style.display = 'block';
+            csvUrl = job.result.csv_url;
+            downloadCsvButton.style.display = 'inline-block';
+            showPreview(job.result.preview_url);
         } catch (error) {
             resultArea.style.display = 'block';
             resultMessage.className = 'error';
             resultMessage.textContent = `错误：${error.message}`;
             downloadButton.style.display = 'none';
+            downloadCsvButton.style.display = 'none';
+            previewArea.style.display = 'none';
         } finally {
+            currentJobId = null;
             progressArea.style.display = 'none';
             processButton.disabled = false;
         }
     });
 
+    cancelButton.addEventListener('click', () => {
+        cancelJob(currentJobId);
+    });
+
     // 下载处理后的文件
     downloadButton.addEventListener('click', () => {
-        window.location.href = '/download';
+        if (downloadUrl) {
+            window.location.href = downloadUrl;
+        }
+    });
+
+    // 直接从内存中的处理结果流式下载压缩的 CSV
+    downloadCsvButton.addEventListener('click', () => {
+        if (csvUrl) {
+            window.location.href = `${csvUrl}?gzip=1`;
+        }
     });
 
     // 添加文件比较相关的代码
@@ -119,6 +379,10 @@ document.addEventListener('DOMContentLoaded', function() {
     const compareResult = document.getElementById('compareResult');
     const compareMessage = document.getElementById('compareMessage');
     const downloadComparisonButton = document.getElementById('downloadComparisonButton');
+    const downloadComparisonCsvButton = document.getElementById('downloadComparisonCsvButton');
+    const compareProgressBar = document.getElementById('compareProgressBar');
+    const compareProgressText = document.getElementById('compareProgressText');
+    const compareCancelButton = document.getElementById('compareCancelButton');
     
     compareButton.addEventListener('click', async () => {
         if (!file1Input.files[0] || !file2Input.files[0]) {
@@ -129,38 +393,47 @@ document.addEventListener('DOMContentLoaded', function() {
         const formData = new FormData();
         formData.append('file1', file1Input.files[0]);
         formData.append('file2', file2Input.files[0]);
+        formData.append('format', document.getElementById('compareFormat').value);
 
         compareButton.disabled = true;
         compareProgress.style.display = 'block';
+        compareProgressBar.style.width = '0%';
+        compareProgressText.textContent = '上传中...';
         compareResult.style.display = 'none';
 
         try {
-            const response = await fetch('/compare', {
-                method: 'POST',
-                body: formData
+            const job = await runJob('/compare', formData, (job, jobId) => {
+                currentCompareJobId = jobId;
+                if (!job) return;
+                compareProgressBar.style.width = `${job.progress * 100}%`;
+                compareProgressText.textContent = job.message;
             });
 
-            const result = await response.json();
-
-            if (response.ok) {
-                compareResult.style.display = 'block';
-                compareMessage.className = 'success';
-                compareMessage.textContent = '文件比较成功！';
-                downloadComparisonButton.style.display = 'block';
-                downloadComparisonButton.onclick = () => {
-                    window.location.href = `/download_comparison/${result.timestamp}`;
-                };
-            } else {
-                throw new Error(result.error);
-            }
+            compareResult.style.display = 'block';
+            compareMessage.className = 'success';
+            compareMessage.textContent = '文件比较成功！';
+            downloadComparisonButton.style.display = 'block';
+            downloadComparisonButton.onclick = () => {
+                window.location.href = job.result.download_url;
+            };
+            downloadComparisonCsvButton.style.display = 'inline-block';
+            downloadComparisonCsvButton.onclick = () => {
+                window.location.href = `${job.result.csv_url}?sheet=Data&gzip=1`;
+            };
         } catch (error) {
             compareResult.style.display = 'block';
             compareMessage.className = 'error';
             compareMessage.textContent = `错误：${error.message}`;
             downloadComparisonButton.style.display = 'none';
+            downloadComparisonCsvButton.style.display = 'none';
         } finally {
+            currentCompareJobId = null;
             compareProgress.style.display = 'none';
             compareButton.disabled = false;
         }
     });
+
+    compareCancelButton.addEventListener('click', () => {
+        cancelJob(currentCompareJobId);
+    });
 });
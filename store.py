@@ -0,0 +1,189 @@
+import os
+import time
+import sqlite3
+import traceback
+import pandas as pd
+import main
+from cache import file_content_hash
+from writers import write_output
+
+# 命令行 --store 未指定路径时使用的数据库文件名（放在应用程序目录下）
+DEFAULT_STORE_FILE = 'processed_data.db'
+
+# 导出时每次从数据库读取的行数
+EXPORT_CHUNK_ROWS = 50000
+
+# 各列在 SQLite 中的类型；playthrough_rate 同时有数字和文本，不指定类型，按原值保存
+COLUMN_TYPES = {
+    'video_views': 'INTEGER',
+    'like': 'INTEGER',
+    'comment': 'INTEGER',
+    'share': 'INTEGER',
+    'collect': 'INTEGER',
+    'subscribers': 'INTEGER',
+    'avg_play_duration': 'REAL',
+    'playthrough_rate': '',
+}
+
+# 需要建立索引的列（post_id 另有唯一索引）
+INDEX_COLUMNS = ['date', 'network']
+
+# 缺失的 post_id 在数据库中保存为该值：SQLite 的唯一索引不认为两个 NULL 冲突，
+# 用一个不会出现在真实 post_id 中的值，使这些行与内存模式（merge_duplicate_posts）一样合并为一行，导出时还原为空值
+MISSING_POST_ID = '\x00'
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _update_expression(col, policy):
+    """重复 post_id 写入时该列的更新表达式，与 merge_duplicate_posts 的合并方式一致"""
+    col = _quote(col)
+    if policy == 'sum':
+        return f"COALESCE({col}, 0) + COALESCE(excluded.{col}, 0)"
+    if policy == 'max':
+        # SQLite 的 MAX(a, b) 遇到 NULL 返回 NULL，这里与 pandas 一样忽略空值
+        return (f"CASE WHEN excluded.{col} IS NULL THEN {col} WHEN {col} IS NULL THEN excluded.{col} "
+                f"ELSE MAX({col}, excluded.{col}) END")
+    if policy == 'last':
+        return f"COALESCE(excluded.{col}, {col})"
+    return None
+
+
+class PostStore:
+    """按 post_id 累积处理结果的本地 SQLite 数据库
+
+    每个文件的处理结果按 post_id 写入（UPSERT），重复的 post_id 按 DEDUP_POLICIES 合并，
+    与 merge_duplicate_posts 的结果一致；已写入过的文件（按内容哈希）不会重复累加。
+    行按 post_id 首次写入的顺序导出，导出时分批读取，内存占用与累积的数据量无关。
+    post_id 为空的行与内存模式一样合并为一行。
+    """
+
+    def __init__(self, path, policies=None):
+        self.path = path
+        self.policies = {**main.DEDUP_POLICIES, **(policies or {})}
+        unknown = {policy for policy in self.policies.values() if policy not in ('sum', 'max', 'first', 'last')}
+        if unknown:
+            raise ValueError(f"不支持的合并方式: {unknown}")
+        # 多 sheet 工作簿的来源 sheet 也一并保存，合并方式与其他列相同
+        self.columns = list(main.MASTER_COLUMNS) + [main.SHEET_NAME_COLUMN]
+        self._conn = sqlite3.connect(path)
+        self._create_schema()
+        self._upsert_sql = self._build_upsert_sql()
+
+    def _create_schema(self):
+        columns = ', '.join(
+            f"{_quote(col)} {COLUMN_TYPES.get(col, 'TEXT')}".rstrip() + (' UNIQUE' if col == 'post_id' else '')
+            for col in self.columns
+        )
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS posts ({columns})")
+            # 旧版本创建的数据库缺少的列
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(posts)")}
+            for col in self.columns:
+                if col not in existing:
+                    self._conn.execute(f"ALTER TABLE posts ADD COLUMN {_quote(col)} {COLUMN_TYPES.get(col, 'TEXT')}")
+            for col in INDEX_COLUMNS:
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_posts_{col} ON posts ({_quote(col)})")
+            # 已写入的文件，避免同一个文件被重复累加
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files (hash TEXT PRIMARY KEY, name TEXT, rows INTEGER, added_at REAL)"
+            )
+
+    def _build_upsert_sql(self):
+        names = ', '.join(_quote(col) for col in self.columns)
+        placeholders = ', '.join('?' for _ in self.columns)
+        updates = []
+        for col in self.columns:
+            if col == 'post_id':
+                continue
+            expression = _update_expression(col, self.policies.get(col, main.DEFAULT_DEDUP_POLICY))
+            if expression is not None:
+                updates.append(f"{_quote(col)} = {expression}")
+        sql = f"INSERT INTO posts ({names}) VALUES ({placeholders}) ON CONFLICT(post_id) DO "
+        return sql + ('UPDATE SET ' + ', '.join(updates) if updates else 'NOTHING')
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def count(self):
+        return self._conn.execute("SELECT COUNT(*) FROM posts").fetchone()[0]
+
+    def has_file(self, file_hash):
+        return self._conn.execute("SELECT 1 FROM files WHERE hash = ?", (file_hash,)).fetchone() is not None
+
+    def _rows(self, df):
+        """转换为可直接写入 SQLite 的 Python 值，日期等列使用与导出文件相同的文本格式"""
+        df = main.format_for_export(df.reindex(columns=self.columns))
+        values = df.astype(object).where(df.notna(), None)
+        values['post_id'] = values['post_id'].where(values['post_id'].notna(), MISSING_POST_ID)
+        return values.itertuples(index=False, name=None)
+
+    def add_frames(self, frames, name=None, file_hash=None):
+        """在一个事务中写入一个文件的处理结果（DataFrame 或 DataFrame 迭代器），返回写入的行数
+
+        写入中途出错时整个文件回滚，不会留下只写了一部分的数据。
+        """
+        if isinstance(frames, pd.DataFrame):
+            frames = [frames]
+        rows = 0
+        with self._conn:
+            for df in frames:
+                self._conn.executemany(self._upsert_sql, self._rows(df))
+                rows += len(df)
+            if file_hash is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (hash, name, rows, added_at) VALUES (?, ?, ?, ?)",
+                    (file_hash, name, rows, time.time()),
+                )
+        return rows
+
+    def add_file(self, file_path, chunk_size=main.STREAM_CHUNK_ROWS):
+        """流式处理文件并写入数据库，返回写入的行数；内容相同的文件已写入过时返回 0，处理失败时返回 None"""
+        filename = os.path.basename(file_path)
+        file_hash = file_content_hash(file_path)
+        if self.has_file(file_hash):
+            print(f"{filename} 已写入过数据库，跳过")
+            return 0
+        try:
+            rows = self.add_frames(main.iter_process_excel(file_path, chunk_size), filename, file_hash)
+        except Exception as e:
+            print(f"写入 {filename} 失败: {str(e)}")
+            traceback.print_exc()
+            return None
+        print(f"已写入 {filename}: {rows} 行，数据库共 {self.count()} 个 post")
+        return rows
+
+    def export_columns(self):
+        """导出的列：没有来自多 sheet 工作簿的数据时不包含 sheet_name，与内存模式的输出一致"""
+        sheet_column = _quote(main.SHEET_NAME_COLUMN)
+        has_sheets = self._conn.execute(f"SELECT 1 FROM posts WHERE {sheet_column} IS NOT NULL LIMIT 1").fetchone()
+        return self.columns if has_sheets else list(main.MASTER_COLUMNS)
+
+    def iter_frames(self, chunk_size=EXPORT_CHUNK_ROWS, where=None, params=()):
+        """按 post_id 首次写入的顺序分批读取，where 为可选的 SQL 过滤条件（如 "date >= ?"）"""
+        columns = self.export_columns()
+        names = ', '.join(
+            "NULLIF(post_id, ?) AS post_id" if col == 'post_id' else _quote(col) for col in columns
+        )
+        sql = f"SELECT {names} FROM posts"
+        if where:
+            sql += f" WHERE {where}"
+        sql += " ORDER BY rowid"
+        cursor = self._conn.execute(sql, (MISSING_POST_ID, *params))
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield pd.DataFrame.from_records(rows, columns=columns)
+
+    def export(self, path, fmt=None, chunk_size=EXPORT_CHUNK_ROWS):
+        """将累积的数据流式写出为合并结果文件"""
+        return write_output(self.iter_frames(chunk_size), path, fmt)
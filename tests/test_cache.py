@@ -0,0 +1,64 @@
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+
+import cache
+import main
+
+GOLDEN_INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden', 'inputs')
+
+
+@pytest.fixture
+def processed_cache(tmp_path):
+    return cache.ProcessedFileCache(str(tmp_path / 'cache'))
+
+
+def _stored_suffixes(processed_cache, key):
+    return [name[len(key):] for name in os.listdir(processed_cache.directory) if name.startswith(key)]
+
+
+def test_cached_frames_are_identical(processed_cache):
+    file_paths = [os.path.join(GOLDEN_INPUT_DIR, name) for name in sorted(os.listdir(GOLDEN_INPUT_DIR))]
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = main.process_files(file_paths, workers=1, cache=processed_cache)
+        cached = main.process_files(file_paths, workers=1, cache=processed_cache)
+    for file_path, df, cached_df in zip(file_paths, first, cached):
+        assert _stored_suffixes(processed_cache, processed_cache.key_for(file_path)) == [cache.FEATHER_SUFFIX]
+        assert cached_df.dtypes.equals(df.dtypes)
+        pd.testing.assert_frame_equal(cached_df, df, check_exact=True)
+
+
+def test_mixed_object_column_falls_back_to_pickle(processed_cache):
+    # 同时含日期和文本的 object 列无法按列保存
+    df = pd.DataFrame({'published_date': [pd.Timestamp('2024-01-02 10:00:00'), '不是日期'], 'like': [1, 2]})
+    processed_cache.put('mixed', df)
+    assert _stored_suffixes(processed_cache, 'mixed') == [cache.PICKLE_SUFFIX]
+    pd.testing.assert_frame_equal(processed_cache.get('mixed'), df)
+
+
+def test_pickle_is_used_without_pyarrow(processed_cache, monkeypatch):
+    def missing_pyarrow(df, path):
+        raise ImportError('pyarrow')
+    monkeypatch.setattr(cache, '_write_feather', missing_pyarrow)
+    df = pd.DataFrame({'post': ['a', 'b'], 'like': [1, 2]})
+    processed_cache.put('plain', df)
+    assert _stored_suffixes(processed_cache, 'plain') == [cache.PICKLE_SUFFIX]
+    pd.testing.assert_frame_equal(processed_cache.get('plain'), df)
+
+
+def _custom_stage(df, ctx):
+    return df
+
+
+def test_fingerprint_follows_active_stages(monkeypatch):
+    base = cache.rules_fingerprint()
+    monkeypatch.setattr(main, 'SKIP_STAGES', {'game_label'})
+    skipped = cache.rules_fingerprint()
+    monkeypatch.setattr(main, 'SKIP_STAGES', set())
+    monkeypatch.setattr(main, 'NORMALIZE_STAGES', list(main.NORMALIZE_STAGES))
+    main.register_stage('custom', _custom_stage)
+    registered = cache.rules_fingerprint()
+    assert len({base, skipped, registered}) == 3
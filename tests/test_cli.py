@@ -0,0 +1,90 @@
+import argparse
+import contextlib
+import io
+import os
+import shutil
+
+import pytest
+
+import cli
+import main
+
+GOLDEN_INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden', 'inputs')
+EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    directory = tmp_path / 'files'
+    directory.mkdir()
+    for name in ('国外-X.csv', '小红书-abc.csv'):
+        shutil.copy(os.path.join(GOLDEN_INPUT_DIR, name), directory / name)
+    return directory
+
+
+def _run(argv):
+    with contextlib.redirect_stdout(io.StringIO()) as out, contextlib.redirect_stderr(io.StringIO()) as err:
+        code = main.main(argv)
+    return code, out.getvalue(), err.getvalue()
+
+
+def test_exit_ok_prints_output_path_when_quiet(inputs, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    code, out, _ = _run([str(inputs), '-o', output, '-j', '1', '-q'])
+    assert code == cli.EXIT_OK
+    assert out.strip() == output
+    assert os.path.exists(output)
+
+
+def test_exit_partial_when_some_files_fail(inputs, tmp_path):
+    (inputs / '抖音-坏文件.xlsx').write_text('not a workbook')
+    code, _, err = _run([str(inputs), '-o', str(tmp_path / 'out.csv'), '-j', '1', '-q'])
+    assert code == cli.EXIT_PARTIAL
+    assert '抖音-坏文件.xlsx' in err
+
+
+def test_exit_failed_when_no_file_succeeds(tmp_path):
+    bad = tmp_path / '抖音-坏文件.xlsx'
+    bad.write_text('not a workbook')
+    code, _, _ = _run([str(bad), '-o', str(tmp_path / 'out.csv'), '-j', '1', '-q'])
+    assert code == cli.EXIT_FAILED
+    assert not (tmp_path / 'out.csv').exists()
+
+
+def test_exit_no_input_for_empty_directory(tmp_path):
+    code, _, err = _run([str(tmp_path), '-o', str(tmp_path / 'out.csv'), '-q'])
+    assert code == cli.EXIT_NO_INPUT
+    assert '没有找到需要处理的文件' in err
+
+
+@pytest.mark.parametrize('argv', [['不存在的目录'], ['-j', '0']])
+def test_usage_errors_exit_with_2(argv, tmp_path):
+    with pytest.raises(SystemExit) as exit_info:
+        _run(argv + ['-o', str(tmp_path / 'out.csv')])
+    assert exit_info.value.code == cli.EXIT_USAGE
+
+
+def test_expand_inputs(inputs, tmp_path):
+    (inputs / 'merged_data.csv').write_text('x')
+    (inputs / '~$锁文件.xlsx').write_text('x')
+    (inputs / 'notes.txt').write_text('x')
+    nested = inputs / 'sub'
+    nested.mkdir()
+    (nested / '抖音-a.xlsx').write_text('x')
+    x_csv = str(inputs / '国外-X.csv')
+    files, missing = cli.expand_inputs([str(inputs), x_csv, str(tmp_path / '**' / '*.xlsx'), 'missing.csv'], EXTENSIONS)
+    # 目录只取第一层，重复的文件只保留一次，通配符支持 **
+    assert files == [x_csv, str(inputs / '小红书-abc.csv'), str(nested / '抖音-a.xlsx')]
+    assert missing == ['missing.csv']
+
+
+@pytest.mark.parametrize('pause, argv, tty, expected', [
+    (None, [], True, True),
+    (None, [], False, False),
+    (None, ['files'], True, False),
+    (True, ['files'], False, True),
+    (False, [], True, False),
+])
+def test_should_pause(pause, argv, tty, expected, monkeypatch):
+    monkeypatch.setattr(cli.sys, 'stdin', type('Stdin', (), {'isatty': lambda self: tty})())
+    assert cli.should_pause(argparse.Namespace(pause=pause), argv) is expected
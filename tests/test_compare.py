@@ -0,0 +1,19 @@
+import contextlib
+import io
+
+import pandas as pd
+
+from compare_excel import compare_excel_files
+
+
+def test_existing_post_key_column_is_kept(tmp_path):
+    # 输入文件中真实的 post_key 列不能被关联用的编号覆盖，也不能出现编号列
+    old_path = str(tmp_path / 'old.xlsx')
+    new_path = str(tmp_path / 'new.xlsx')
+    pd.DataFrame({'post_id': ['a', 'b'], 'post_key': ['key-a', 'key-b'], 'video_views': [10, 20]}).to_excel(old_path, index=False)
+    pd.DataFrame({'post_id': ['b', 'c', 'a'], 'post_key': ['key-b', 'key-c', 'key-a'], 'video_views': [25, 5, 10]}).to_excel(new_path, index=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        merged, _ = compare_excel_files(old_path, new_path, 'csv', str(tmp_path / 'compared'))
+    assert list(merged.columns) == ['post_id', 'post_key', 'video_views', 'video_views_old', 'video_views_difference']
+    assert merged['post_key'].tolist() == ['key-b', 'key-c', 'key-a']
+    assert merged['video_views_difference'].tolist() == [5, 5, 0]
@@ -0,0 +1,61 @@
+import pandas as pd
+
+import main
+import writers
+from store import PostStore
+
+
+def _normalize(published, filename):
+    raw = pd.DataFrame({
+        '作品名称': [f'{filename} 作品{i}' for i in range(len(published))],
+        '发布时间': published,
+        '播放量': list(range(len(published))),
+        '平均播放时长': [f'{i + 1}.5秒' for i in range(len(published))],
+    })
+    return main.normalize_dataframe(raw, filename)
+
+
+def _mixed_files():
+    # 第一个文件的日期全部可以解析（datetime64 列），第二个文件含无法解析的文本（保留为文本列）
+    parsed = _normalize(['2024-01-02 10:11:12', '2024/01/03 08:00'], '抖音-账号A.xlsx')
+    partial = _normalize(['2024年01月04日 09:00:00', '不是日期'], '抖音-账号B.xlsx')
+    assert pd.api.types.is_datetime64_any_dtype(parsed['published_date'])
+    assert not pd.api.types.is_datetime64_any_dtype(partial['published_date'])
+    return [parsed, partial]
+
+
+def _memory_mode(frames):
+    return main.format_for_export(main.merge_duplicate_posts(main.concat_processed(frames)))
+
+
+def test_mixed_date_files_export_one_format():
+    df = _memory_mode(_mixed_files())
+    assert df['published_date'].tolist() == [
+        '2024-01-02_10:11:12', '2024-01-03_08:00:00', '2024-01-04_09:00:00', '不是日期',
+    ]
+    assert df['date'].tolist()[:3] == ['2024-01-02', '2024-01-03', '2024-01-04']
+    assert pd.isna(df['date'].iloc[3])
+
+
+def test_memory_and_store_mode_write_the_same_csv(tmp_path):
+    frames = _mixed_files()
+    memory_path = str(tmp_path / 'memory.csv')
+    writers.write_output(_memory_mode(frames), memory_path, 'csv')
+
+    store_path = str(tmp_path / 'store.csv')
+    with PostStore(str(tmp_path / 'posts.db')) as store:
+        for i, df in enumerate(frames):
+            store.add_frames(df, name=f'file{i}')
+        store.export(store_path, 'csv')
+
+    with open(memory_path, 'rb') as memory, open(store_path, 'rb') as stored:
+        assert memory.read() == stored.read()
+
+
+def test_streamed_csv_matches_written_file(tmp_path):
+    df = main.merge_duplicate_posts(main.concat_processed(_mixed_files()))
+    path = str(tmp_path / 'result.csv')
+    writers.write_output(main.format_for_export(df), path, 'csv')
+    chunks = (main.format_for_export(df.iloc[start:start + 1]) for start in range(len(df)))
+    with open(path, 'rb') as f:
+        assert b''.join(writers.iter_csv_bytes(chunks)) == f.read()
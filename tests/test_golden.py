@@ -0,0 +1,59 @@
+import contextlib
+import io
+import os
+
+import pytest
+
+import main
+
+# 金标准数据：inputs 下是各平台的样例文件，expected 下是对应的 CSV 结果（单个文件按文件名，merged.csv 为全部合并）
+# 处理逻辑有意改变输出时，确认差异无误后在项目目录下运行 python -m tests.test_golden 重新生成 expected
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden')
+INPUT_DIR = os.path.join(GOLDEN_DIR, 'inputs')
+EXPECTED_DIR = os.path.join(GOLDEN_DIR, 'expected')
+INPUT_FILES = sorted(os.listdir(INPUT_DIR))
+
+
+def _expected_path(name):
+    return os.path.join(EXPECTED_DIR, name)
+
+
+def _write_single(filename, output_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = main.process_excel(os.path.join(INPUT_DIR, filename))
+    assert df is not None, f'{filename} 处理失败'
+    main.write_output(main.format_for_export(df), output_path, 'csv')
+
+
+def _write_merged(output_path):
+    file_paths = main.order_files([os.path.join(INPUT_DIR, f) for f in INPUT_FILES])
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = main.run_memory_mode(file_paths, output_path, 'csv', workers=1, quiet=True)
+    assert not summary['failed']
+
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('filename', INPUT_FILES)
+def test_single_file_matches_golden(filename, tmp_path):
+    output_path = str(tmp_path / 'out.csv')
+    _write_single(filename, output_path)
+    expected = _expected_path(os.path.splitext(filename)[0] + '.csv')
+    assert _read_bytes(output_path) == _read_bytes(expected)
+
+
+def test_merged_output_matches_golden(tmp_path):
+    output_path = str(tmp_path / 'merged.csv')
+    _write_merged(output_path)
+    assert _read_bytes(output_path) == _read_bytes(_expected_path('merged.csv'))
+
+
+if __name__ == '__main__':
+    os.makedirs(EXPECTED_DIR, exist_ok=True)
+    for name in INPUT_FILES:
+        _write_single(name, _expected_path(os.path.splitext(name)[0] + '.csv'))
+    _write_merged(_expected_path('merged.csv'))
+    print(f'已重新生成 {EXPECTED_DIR}')
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import main
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('1.2万', 12000),
+    ('3k', 3000),
+    ('3K+', 3000),
+    ('10w', 100000),
+    ('1.5 k', 1500),
+    ('2亿', 200000000),
+    ('1,234', 1234),
+    ('１２３', 123),
+])
+def test_parse_number_units(text, expected):
+    assert main.parse_number_text(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    # 数字后面的英文单词不是单位
+    ('5 weeks', 5),
+    ('3 kids', 3),
+    ('8 Wow', 8),
+    ('2 Kilo', 2),
+    ('12wk', 12),
+])
+def test_parse_number_ignores_following_words(text, expected):
+    assert main.parse_number_text(text) == expected
+
+
+def test_parse_number_without_digits():
+    assert np.isnan(main.parse_number_text('weeks'))
+
+
+def test_parse_metric_columns_ignores_following_words():
+    df = pd.DataFrame({col: ['5 weeks', '1.2万', None] for col in main.METRIC_COLUMNS})
+    result = main.parse_metric_columns(df)
+    assert result['like'].tolist() == [5, 12000, 0]
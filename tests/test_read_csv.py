@@ -0,0 +1,29 @@
+import contextlib
+import io
+
+import pytest
+
+import main
+
+LARGE_ID_CSV = (
+    'Post ID,Post,Network,Profile,Date,Likes\n'
+    '9300000000000000001,a,TikTok,p,2024-03-01,1\n'
+    '9300000000000000002,b,TikTok,p,2024-03-02,2\n'
+)
+
+
+@pytest.mark.parametrize('use_pyarrow', [True, False])
+def test_large_integer_ids_are_read_exactly(use_pyarrow, monkeypatch):
+    # 超出 int64 范围的 ID 不能被读成同一个浮点数
+    monkeypatch.setattr(main, 'USE_PYARROW_CSV', use_pyarrow)
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = main.read_csv_bytes(LARGE_ID_CSV.encode('utf-8'), 'x.csv')
+    assert df['Post ID'].tolist() == [9300000000000000001, 9300000000000000002]
+
+
+def test_large_integer_ids_are_not_merged(tmp_path):
+    path = tmp_path / '国外-TikTok.csv'
+    path.write_text(LARGE_ID_CSV, encoding='utf-8')
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = main.merge_duplicate_posts(main.process_excel(str(path)))
+    assert df['post_id'].tolist() == ['9300000000000000001', '9300000000000000002']
@@ -0,0 +1,36 @@
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+import main
+
+
+@pytest.fixture
+def workbook_with_notes(tmp_path):
+    # 两个数据 sheet 之外还有说明和汇总 sheet，后两者的行不能作为帖子输出
+    path = tmp_path / '抖音-账号A.xlsx'
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame({'说明': ['本文件由后台导出', '数据截至 2024-01-31', '播放量单位为次']}).to_excel(writer, sheet_name='说明', index=False)
+        pd.DataFrame({'作品名称': ['作品一', '作品二'], '发布时间': ['2024-01-02 10:00:00', '2024-01-03 11:00:00'], '播放量': [10, 20]}).to_excel(writer, sheet_name='一月', index=False)
+        pd.DataFrame({'播放量': [30], '点赞': [3]}).to_excel(writer, sheet_name='汇总', index=False)
+        pd.DataFrame({'作品名称': ['作品三'], '发布时间': ['2024-02-01 09:00:00'], '播放量': [5]}).to_excel(writer, sheet_name='二月', index=False)
+    return str(path)
+
+
+def test_read_sheets_skips_sheets_without_data_header(workbook_with_notes):
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        sheets = main.read_sheets(workbook_with_notes)
+    assert list(sheets) == ['一月', '二月']
+    assert 'sheet 说明 没有可识别的表头' in out.getvalue()
+    assert 'sheet 汇总 缺少关键列 post, published_date' in out.getvalue()
+
+
+def test_notes_sheets_do_not_become_posts(workbook_with_notes):
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = main.process_excel(workbook_with_notes)
+        streamed = pd.concat(main.iter_process_excel(workbook_with_notes), ignore_index=True)
+    assert df['post'].tolist() == ['作品一', '作品二', '作品三']
+    assert df[main.SHEET_NAME_COLUMN].tolist() == ['一月', '一月', '二月']
+    assert streamed['post'].tolist() == ['作品一', '作品二', '作品三']
@@ -0,0 +1,82 @@
+import contextlib
+import io
+
+import pandas as pd
+import pytest
+
+import main
+from store import PostStore
+
+HEADER = 'Post ID,Post,Network,Profile,Date,Likes,Video Views\n'
+
+
+@pytest.fixture
+def files_with_missing_ids(tmp_path):
+    first = tmp_path / '国外-TikTok-a.csv'
+    first.write_text(HEADER + ',a,TikTok,p,2024-03-01,1,10\nid1,b,TikTok,p,2024-03-02,2,20\n,c,TikTok,p,2024-03-03,5,30\n', encoding='utf-8')
+    second = tmp_path / '国外-TikTok-b.csv'
+    second.write_text(HEADER + 'id1,b,TikTok,p,2024-03-02,3,5\n,d,TikTok,p,2024-03-04,7,1\n', encoding='utf-8')
+    return [str(first), str(second)]
+
+
+def test_store_mode_matches_memory_mode_for_missing_post_ids(files_with_missing_ids, tmp_path):
+    memory_path = str(tmp_path / 'memory.csv')
+    store_path = str(tmp_path / 'store.csv')
+    with contextlib.redirect_stdout(io.StringIO()):
+        main.run_memory_mode(files_with_missing_ids, memory_path, 'csv', workers=1, quiet=True)
+        main.run_store_mode(files_with_missing_ids, str(tmp_path / 'posts.db'), store_path, 'csv')
+    memory = pd.read_csv(memory_path)
+    stored = pd.read_csv(store_path)
+    # post_id 为空的行在两种模式中都合并为一行
+    assert len(memory) == 2
+    # 数据库中 avg_play_duration 为 REAL 类型，缺少该列时导出为 0.0 而内存模式为 0，只比较数值
+    pd.testing.assert_frame_equal(stored, memory, check_dtype=False)
+
+
+@pytest.fixture
+def overlapping_files(tmp_path):
+    first = tmp_path / '国外-TikTok-a.csv'
+    first.write_text(HEADER + 'id1,a,TikTok,p,2024-03-01,1,10\nid2,b,TikTok,p,2024-03-02,2,20\n', encoding='utf-8')
+    second = tmp_path / '国外-TikTok-b.csv'
+    second.write_text(HEADER + 'id2,b2,TikTok,p,2024-03-02,3,5\nid3,c,TikTok,p,2024-03-03,4,1\n', encoding='utf-8')
+    return [str(first), str(second)]
+
+
+def _export(store, tmp_path):
+    path = str(tmp_path / 'export.csv')
+    store.export(path, 'csv')
+    return pd.read_csv(path)
+
+
+def test_upsert_merges_posts_across_files(overlapping_files, tmp_path):
+    with PostStore(str(tmp_path / 'posts.db')) as store, contextlib.redirect_stdout(io.StringIO()):
+        assert [store.add_file(path) for path in overlapping_files] == [2, 2]
+        assert store.count() == 3
+        df = _export(store, tmp_path)
+    # 按首次写入的顺序导出；指标列求和，其他列保留第一次写入的值
+    assert df['post_id'].tolist() == ['id1', 'id2', 'id3']
+    assert df['post'].tolist() == ['a', 'b', 'c']
+    assert df['like'].tolist() == [1, 5, 4]
+    assert df['video_views'].tolist() == [10, 25, 1]
+
+
+def test_same_file_is_added_once(overlapping_files, tmp_path):
+    with PostStore(str(tmp_path / 'posts.db')) as store, contextlib.redirect_stdout(io.StringIO()):
+        assert store.add_file(overlapping_files[0]) == 2
+        assert store.add_file(overlapping_files[0]) == 0
+        assert _export(store, tmp_path)['like'].tolist() == [1, 2]
+
+
+def test_failed_file_is_rolled_back(overlapping_files, tmp_path):
+    def frames():
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield main.process_excel(overlapping_files[1])
+        raise ValueError('读取中断')
+
+    with PostStore(str(tmp_path / 'posts.db')) as store, contextlib.redirect_stdout(io.StringIO()):
+        store.add_file(overlapping_files[0])
+        with pytest.raises(ValueError):
+            store.add_frames(frames(), 'b.csv', 'hash-b')
+        assert store.count() == 2
+        assert not store.has_file('hash-b')
+        assert _export(store, tmp_path)['like'].tolist() == [1, 2]
@@ -0,0 +1,81 @@
+import io
+import os
+
+import pytest
+
+from uploads import UploadError, UploadManager, UploadOffsetMismatch
+from workspace import WorkspaceManager
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    return WorkspaceManager(str(tmp_path / 'jobs')).create()
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+class BrokenStream:
+    """读出一部分数据后连接中断"""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def read(self, size):
+        block = self._data.read(2)
+        if not block:
+            raise ConnectionError('连接中断')
+        return block
+
+
+def test_chunks_resume_from_received_offset(workspace):
+    session = UploadManager().create(workspace, [('a.csv', 10)])
+    assert session.write_chunk(0, 0, io.BytesIO(b'0123')) == 4
+    # 断线重连后从错误的位置继续，服务端返回已接收的字节数
+    with pytest.raises(UploadOffsetMismatch) as error:
+        session.write_chunk(0, 0, io.BytesIO(b'0123'))
+    assert error.value.received == 4
+    assert session.write_chunk(0, error.value.received, io.BytesIO(b'456789')) == 10
+    upload = session.files[0]
+    assert upload.complete
+    assert _read(upload.path) == b'0123456789'
+    assert session.take_completed(0) == [upload.path]
+
+
+def test_interrupted_chunk_is_rolled_back(workspace):
+    session = UploadManager().create(workspace, [('a.csv', 10)])
+    session.write_chunk(0, 0, io.BytesIO(b'0123'))
+    with pytest.raises(ConnectionError):
+        session.write_chunk(0, 4, BrokenStream(b'4567'))
+    upload = session.files[0]
+    assert upload.received == 4
+    assert os.path.getsize(upload.part_path) == 4
+    assert session.write_chunk(0, 4, io.BytesIO(b'456789')) == 10
+
+
+def test_chunk_past_declared_size_is_rejected(workspace):
+    session = UploadManager().create(workspace, [('a.csv', 3)])
+    with pytest.raises(UploadError, match='超出声明的文件大小'):
+        session.write_chunk(0, 0, io.BytesIO(b'01234'))
+    upload = session.files[0]
+    assert upload.received == 0 and not upload.complete
+    assert os.path.getsize(upload.part_path) == 0
+    assert session.write_chunk(0, 0, io.BytesIO(b'012')) == 3
+
+
+def test_empty_file_is_complete_immediately(workspace):
+    session = UploadManager().create(workspace, [('empty.csv', 0), ('a.csv', 1)])
+    assert session.wait_completed(0)
+    assert session.take_completed(0) == [session.files[0].path]
+    assert not session.files[1].complete
+
+
+@pytest.mark.parametrize('files, message', [
+    ([('a.csv', 1), ('a.csv', 2)], '文件名不能重复'),
+    ([], '没有选择文件'),
+])
+def test_invalid_file_lists_are_rejected(workspace, files, message):
+    with pytest.raises(UploadError, match=message):
+        UploadManager().create(workspace, files)
@@ -0,0 +1,71 @@
+import contextlib
+import io
+import os
+import time
+
+import pandas as pd
+import pytest
+
+from store import PostStore
+from watcher import FolderWatcher
+
+CSV = 'Post ID,Post,Network,Profile,Date,Likes\nid1,a,TikTok,p,2024-03-01,1\n'
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    return FolderWatcher(str(tmp_path / 'files'), str(tmp_path / 'processed'), str(tmp_path / 'posts.db'),
+                         str(tmp_path / 'merged_data.csv'), settle_seconds=60)
+
+
+def _write(watcher, name, text, age=120):
+    """写入文件并把修改时间设为 age 秒之前"""
+    path = os.path.join(watcher.input_dir, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_file_is_ready_after_unchanged_scan(watcher):
+    path = _write(watcher, '国外-TikTok.csv', CSV)
+    # 第一次看到的文件还不能确定已经复制完成
+    assert watcher.ready_files() == []
+    assert watcher.ready_files() == [path]
+
+
+def test_growing_file_is_not_ready(watcher):
+    path = _write(watcher, '国外-TikTok.csv', CSV)
+    watcher.ready_files()
+    _write(watcher, '国外-TikTok.csv', CSV + 'id2,b,TikTok,p,2024-03-02,2\n')
+    assert watcher.ready_files() == []
+    assert watcher.ready_files() == [path]
+
+
+def test_recently_modified_file_is_not_ready(watcher):
+    _write(watcher, '国外-TikTok.csv', CSV, age=0)
+    watcher.ready_files()
+    assert watcher.ready_files() == []
+
+
+def test_outputs_and_temporary_files_are_ignored(watcher):
+    for name in ('merged_data.csv', '~$国外-TikTok.xlsx', '.国外-TikTok.csv.tmp', 'notes.txt'):
+        _write(watcher, name, CSV)
+    watcher.ready_files()
+    assert watcher.ready_files() == []
+
+
+def test_ready_files_are_stored_moved_and_exported(watcher):
+    _write(watcher, '国外-TikTok.csv', CSV)
+    _write(watcher, '国外-X.xlsx', 'not a workbook')
+    with PostStore(watcher.store_path) as store, contextlib.redirect_stdout(io.StringIO()) as out:
+        watcher.run_once(store)
+        watcher.run_once(store)
+        watcher.run_once(store)
+    assert out.getvalue().count('处理 国外-X.xlsx 失败') == 1
+    assert os.listdir(watcher.processed_dir) == ['国外-TikTok.csv']
+    # 处理失败的文件留在原处，内容不变时不会重复尝试
+    assert os.listdir(watcher.input_dir) == ['国外-X.xlsx']
+    assert list(watcher._failed) == [os.path.join(watcher.input_dir, '国外-X.xlsx')]
+    assert pd.read_csv(watcher.output_path)['post_id'].tolist() == ['id1']
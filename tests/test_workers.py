@@ -0,0 +1,24 @@
+import contextlib
+import io
+import os
+
+import main
+
+GOLDEN_INPUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden', 'inputs')
+
+
+def _mark_stage(df, ctx):
+    df['source_file'] = ctx.filename
+    return df
+
+
+def test_registered_stages_reach_worker_processes(monkeypatch):
+    monkeypatch.setattr(main, 'NORMALIZE_STAGES', list(main.NORMALIZE_STAGES))
+    main.register_stage('mark', _mark_stage, after='schema')
+    monkeypatch.setattr(main, 'SKIP_STAGES', {'game_label'})
+    names = sorted(os.listdir(GOLDEN_INPUT_DIR))[:2]
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = main.process_files([os.path.join(GOLDEN_INPUT_DIR, name) for name in names], workers=2, quiet=True)
+    for name, df in zip(names, results):
+        assert set(df['source_file']) == {name}
+        assert df['game_label'].isna().all()
@@ -0,0 +1,25 @@
+import pytest
+
+from workspace import WorkspaceManager, WorkspaceQuotaExceeded
+
+
+def test_reservations_count_before_data_is_written(tmp_path):
+    manager = WorkspaceManager(str(tmp_path / 'jobs'), max_bytes=100)
+    first = manager.create(60)
+    # 第一个上传还没有写入数据，第二个上传也不能超出配额
+    with pytest.raises(WorkspaceQuotaExceeded):
+        manager.create(60)
+    manager.release(first.id)
+    second = manager.create(60)
+    manager.remove(second.id)
+    manager.create(60)
+
+
+def test_written_data_is_not_counted_twice(tmp_path):
+    manager = WorkspaceManager(str(tmp_path / 'jobs'), max_bytes=100)
+    workspace = manager.create(60)
+    with open(workspace.input_path('a.csv'), 'wb') as f:
+        f.write(b'x' * 50)
+    manager.create(40)
+    with pytest.raises(WorkspaceQuotaExceeded):
+        manager.create(1)
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+import xlsxwriter
+
+import writers
+
+
+def _frames():
+    # 流式写出时数据分多个块到达
+    yield pd.DataFrame({'post': ['a', 'b']})
+    yield pd.DataFrame({'post': ['c', 'd']})
+
+
+@pytest.mark.parametrize('write', [
+    lambda sheets, path: writers._write_xlsx_xlsxwriter(xlsxwriter, sheets, path),
+    writers._write_xlsx_openpyxl,
+])
+def test_xlsx_rows_over_limit_raise(write, tmp_path, monkeypatch):
+    monkeypatch.setattr(writers, 'XLSX_MAX_ROWS', 4)
+    with pytest.raises(ValueError, match='最大行数'):
+        write([('Sheet1', _frames())], str(tmp_path / 'out.xlsx'))
+
+
+@pytest.mark.parametrize('write', [
+    lambda sheets, path: writers._write_xlsx_xlsxwriter(xlsxwriter, sheets, path),
+    writers._write_xlsx_openpyxl,
+])
+def test_xlsx_rows_at_limit_are_written(write, tmp_path, monkeypatch):
+    monkeypatch.setattr(writers, 'XLSX_MAX_ROWS', 5)
+    path = str(tmp_path / 'out.xlsx')
+    write([('Sheet1', _frames())], path)
+    assert pd.read_excel(path)['post'].tolist() == ['a', 'b', 'c', 'd']
+
+
+def test_write_xlsx_removes_truncated_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(writers, 'XLSX_MAX_ROWS', 4)
+    path = tmp_path / 'out.xlsx'
+    with pytest.raises(ValueError):
+        writers.write_xlsx([('Sheet1', _frames())], str(path))
+    assert not path.exists()
@@ -0,0 +1,164 @@
+import os
+import time
+import threading
+
+# 前端每次上传的分块大小
+UPLOAD_CHUNK_BYTES = 4 * 1024 * 1024
+
+# 单个分块的大小上限，超出的请求直接拒绝
+UPLOAD_MAX_CHUNK_BYTES = 32 * 1024 * 1024
+
+# 超过该时间（秒）没有收到任何分块时放弃本次上传
+UPLOAD_IDLE_TIMEOUT = 10 * 60
+
+# 从请求体读取并写入文件的块大小
+READ_BLOCK_BYTES = 256 * 1024
+
+# 未接收完整的文件使用的临时后缀，接收完成后重命名为原文件名
+PART_SUFFIX = '.part'
+
+
+class UploadError(Exception):
+    """分块不合法（如超出文件大小），客户端需要修正后重新上传"""
+    pass
+
+
+class UploadOffsetMismatch(UploadError):
+    """分块的起始位置与服务端已接收的字节数不一致，客户端应从 received 处继续上传"""
+
+    def __init__(self, received):
+        super().__init__(f"分块起始位置不正确，已接收 {received} 字节")
+        self.received = received
+
+
+class UploadFile:
+    """上传中的单个文件：已接收的字节数写入 .part 文件，接收完成后重命名"""
+
+    def __init__(self, index, name, size, path):
+        self.index = index
+        self.name = name
+        self.size = size
+        self.path = path
+        self.received = 0
+        self.complete = False
+        self.lock = threading.Lock()
+
+    @property
+    def part_path(self):
+        return self.path + PART_SUFFIX
+
+    def to_dict(self):
+        return {'name': self.name, 'size': self.size, 'received': self.received, 'complete': self.complete}
+
+
+class UploadSession:
+    """一次分块上传：逐个文件按分块接收，每个文件接收完成后立即交给处理任务
+
+    分块只能从已接收的位置开始追加（断线重连后先查询 received 再继续），
+    写入中途断开时回退到分块开始前的位置，不会留下只写了一半的分块。
+    """
+
+    def __init__(self, session_id, files):
+        self.id = session_id
+        self.files = files
+        self.last_activity = time.time()
+        self._completed = []
+        self._condition = threading.Condition()
+        for upload in files:
+            open(upload.part_path, 'wb').close()
+            if upload.size == 0:
+                self._finish(upload)
+
+    def _finish(self, upload):
+        os.replace(upload.part_path, upload.path)
+        upload.complete = True
+        with self._condition:
+            self._completed.append(upload.path)
+            self._condition.notify_all()
+
+    def write_chunk(self, index, offset, stream, length=None):
+        """从 stream 读取一个分块写入第 index 个文件，返回该文件已接收的字节数"""
+        if not 0 <= index < len(self.files):
+            raise UploadError(f"文件序号不存在: {index}")
+        upload = self.files[index]
+        if length is not None and length > UPLOAD_MAX_CHUNK_BYTES:
+            raise UploadError(f"分块过大，单个分块不能超过 {UPLOAD_MAX_CHUNK_BYTES // 1024 // 1024} MB")
+
+        with upload.lock:
+            if upload.complete:
+                return upload.received
+            if offset != upload.received:
+                raise UploadOffsetMismatch(upload.received)
+            written = 0
+            with open(upload.part_path, 'r+b') as f:
+                f.seek(offset)
+                try:
+                    while True:
+                        block = stream.read(READ_BLOCK_BYTES)
+                        if not block:
+                            break
+                        written += len(block)
+                        if offset + written > upload.size:
+                            raise UploadError(f"{upload.name} 超出声明的文件大小 {upload.size} 字节")
+                        f.write(block)
+                        self.last_activity = time.time()
+                except BaseException:
+                    # 连接中断或分块不合法时丢弃本次写入的内容
+                    f.truncate(offset)
+                    raise
+            upload.received = offset + written
+            self.last_activity = time.time()
+            if upload.received == upload.size:
+                self._finish(upload)
+            return upload.received
+
+    def wait_completed(self, timeout=None):
+        """等待有文件接收完成（不取走），最多等待 timeout 秒，返回是否有已完成的文件"""
+        with self._condition:
+            if not self._completed:
+                self._condition.wait(timeout)
+            return bool(self._completed)
+
+    def take_completed(self, timeout=None):
+        """返回上次调用之后接收完成的文件路径，没有时最多等待 timeout 秒"""
+        with self._condition:
+            if not self._completed:
+                self._condition.wait(timeout)
+            completed, self._completed = self._completed, []
+        return completed
+
+    def idle_seconds(self):
+        return time.time() - self.last_activity
+
+    def to_dict(self):
+        return {'id': self.id, 'files': [upload.to_dict() for upload in self.files]}
+
+
+class UploadManager:
+    """进行中的分块上传，ID 与任务的工作目录 ID 相同"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, workspace, files):
+        """files 为 [(文件名, 大小)]，文件保存在工作目录的 input 目录中"""
+        names = [os.path.basename(name) for name, _ in files]
+        if not names or not all(names):
+            raise UploadError("没有选择文件")
+        if len(set(names)) != len(names):
+            raise UploadError("文件名不能重复")
+        sizes = [size for _, size in files]
+        uploads = [UploadFile(i, name, size, workspace.input_path(name)) for i, (name, size) in enumerate(zip(names, sizes))]
+        session = UploadSession(workspace.id, uploads)
+        with self._lock:
+            self._sessions[session.id] = session
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def remove(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
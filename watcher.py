@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+import traceback
+import main
+from store import PostStore
+from writers import write_output
+
+# 轮询目录的间隔（秒）
+POLL_INTERVAL = 2.0
+
+# 使用 watchdog 时，没有目录事件的情况下兜底检查的间隔（秒）
+WATCHDOG_FALLBACK_INTERVAL = 30.0
+
+# 文件大小和修改时间保持不变超过该时间（秒）才开始处理，避免读到正在复制的文件
+SETTLE_SECONDS = 2.0
+
+# 需要处理的文件类型
+WATCH_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+
+# 合并结果的文件名（不带扩展名），每次有新文件写入数据库后原地更新
+MERGED_OUTPUT_NAME = 'merged_data'
+
+
+def _is_candidate(filename):
+    # 跳过合并结果、隐藏文件以及 Excel 打开文件时生成的 ~$ 锁文件
+    return (filename.lower().endswith(WATCH_EXTENSIONS)
+            and not filename.startswith(('merged_', '.', '~$')))
+
+
+def _start_observer(directory, wake_event):
+    """安装了 watchdog 时监听目录事件（Linux 上为 inotify），返回 observer；未安装时返回 None"""
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            wake_event.set()
+
+    observer = Observer()
+    observer.schedule(Handler(), directory, recursive=False)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+
+class FolderWatcher:
+    """持续监视输入目录，只处理新出现的文件，增量写入 PostStore 后更新合并结果
+
+    去重状态保存在数据库中，重启后继续累积；处理成功的文件移动到 processed_dir，
+    处理失败的文件留在原处，内容变化（如重新导出覆盖）后才会再次尝试。
+    """
+
+    def __init__(self, input_dir, processed_dir, store_path, output_path, output_format=None,
+                 interval=POLL_INTERVAL, settle_seconds=SETTLE_SECONDS):
+        self.input_dir = input_dir
+        self.processed_dir = processed_dir
+        self.store_path = store_path
+        self.output_path = output_path
+        self.output_format = output_format
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+        self._seen = {}
+        self._failed = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.export_pending = False
+        os.makedirs(input_dir, exist_ok=True)
+        os.makedirs(processed_dir, exist_ok=True)
+
+    def ready_files(self):
+        """返回已经稳定（大小和修改时间不再变化）的新文件，按 order_files 的顺序排列"""
+        now = time.time()
+        seen = {}
+        ready = []
+        for filename in os.listdir(self.input_dir):
+            path = os.path.join(self.input_dir, filename)
+            if not _is_candidate(filename) or not os.path.isfile(path):
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature = (stat.st_size, stat.st_mtime)
+            seen[path] = signature
+            if self._failed.get(path) == signature:
+                continue
+            if self._seen.get(path) == signature and now - stat.st_mtime >= self.settle_seconds:
+                ready.append(path)
+        self._seen = seen
+        return main.order_files(ready)
+
+    def process_ready(self, store):
+        """处理所有已稳定的新文件，返回成功写入的文件数"""
+        added = 0
+        for file_path in self.ready_files():
+            filename = os.path.basename(file_path)
+            signature = self._seen.get(file_path)
+            rows = store.add_file(file_path)
+            if rows is None:
+                print(f"处理 {filename} 失败，文件内容变化后会重新尝试")
+                self._failed[file_path] = signature
+                continue
+            self._failed.pop(file_path, None)
+            main.move_processed_file(file_path, self.processed_dir)
+            if rows:
+                added += 1
+                self.export_pending = True
+        return added
+
+    def export(self, store):
+        """从数据库流式导出合并结果：先写临时文件再替换，读取结果的程序不会读到写了一半的文件"""
+        directory, name = os.path.split(self.output_path)
+        tmp_path = os.path.join(directory, '.' + name + '.tmp')
+        try:
+            write_output(store.iter_frames(), tmp_path, self.output_format or os.path.splitext(name)[1])
+            os.replace(tmp_path, self.output_path)
+        except Exception as e:
+            # 例如结果文件正在被 Excel 打开，下一轮再试
+            print(f"更新合并结果失败，稍后重试: {str(e)}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+        self.export_pending = False
+        print(f"已更新合并结果: {self.output_path}（共 {store.count()} 个 post）")
+        return True
+
+    def run_once(self, store):
+        """检查一次目录：处理新文件，有新数据时更新合并结果"""
+        self.process_ready(store)
+        if self.export_pending:
+            self.export(store)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        """持续运行，直到 stop() 或 Ctrl+C"""
+        observer = _start_observer(self.input_dir, self._wake)
+        mode = 'watchdog 目录事件' if observer is not None else f'每 {self.interval:g} 秒轮询'
+        print(f"开始监视 {self.input_dir}（{mode}），按 Ctrl+C 停止")
+        try:
+            with PostStore(self.store_path) as store:
+                print(f"使用数据库: {self.store_path}，已有 {store.count()} 个 post")
+                if store.count() and not os.path.exists(self.output_path):
+                    self.export_pending = True
+                while not self._stop.is_set():
+                    try:
+                        self.run_once(store)
+                    except Exception as e:
+                        print(f"处理新文件时出错: {str(e)}")
+                        traceback.print_exc()
+                    # 有文件等待稳定时按稳定时间检查，否则等待目录事件或轮询间隔
+                    waiting = any(path not in self._failed for path in self._seen)
+                    timeout = min(self.interval, self.settle_seconds) if waiting else self.interval
+                    if observer is not None and not waiting:
+                        timeout = max(timeout, WATCHDOG_FALLBACK_INTERVAL)
+                    self._wake.wait(timeout)
+                    self._wake.clear()
+        except KeyboardInterrupt:
+            print("\n已停止监视")
+        finally:
+            if observer is not None:
+                observer.stop()
+
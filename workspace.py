@@ -0,0 +1,218 @@
+import os
+import stat
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+
+# 任务结束（或最后一次下载）后工作目录保留的时间（秒）
+WORKSPACE_TTL = 2 * 60 * 60
+
+# 所有工作目录的磁盘占用上限
+WORKSPACE_MAX_BYTES = 5 * 1024 * 1024 * 1024
+
+# 后台清理线程的执行间隔（秒）
+CLEANUP_INTERVAL = 5 * 60
+
+INPUT_DIR = 'input'
+OUTPUT_DIR = 'output'
+
+
+def _is_private_dir(path):
+    """目录属于当前用户且其他用户无法访问（不是符号链接）；组和其他用户有权限时尝试收紧为 0700"""
+    if not hasattr(os, 'getuid'):
+        # Windows 的临时目录本来就在用户自己的目录下
+        return True
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        return False
+    if info.st_mode & 0o077:
+        os.chmod(path, 0o700)
+    return True
+
+
+def make_private_dir(path):
+    """创建只有当前用户可以访问的目录（0700），返回实际使用的目录
+
+    目录位于共享的系统临时目录中，其他用户可以抢先创建同名目录并放入 pickle 文件，读取时会执行其中的代码；
+    已存在的目录不属于当前用户（或是符号链接）时不使用它，改用新建的随机目录。
+    """
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        if _is_private_dir(path):
+            return path
+        print(f"目录 {path} 不属于当前用户或不是普通目录，改用新的临时目录")
+    except OSError as e:
+        print(f"无法使用目录 {path}: {str(e)}，改用新的临时目录")
+    return tempfile.mkdtemp(prefix=os.path.basename(path) + '_')
+
+
+class WorkspaceQuotaExceeded(Exception):
+    """工作目录总占用超过上限，且没有可以清理的过期目录"""
+    pass
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+class Workspace:
+    """单个任务的工作目录：input 存放上传的文件，output 存放处理结果"""
+
+    def __init__(self, root, workspace_id):
+        self.id = workspace_id
+        self.path = os.path.join(root, workspace_id)
+        self.input_dir = os.path.join(self.path, INPUT_DIR)
+        self.output_dir = os.path.join(self.path, OUTPUT_DIR)
+
+    def input_path(self, filename):
+        # 只保留文件名，防止路径穿越
+        return os.path.join(self.input_dir, os.path.basename(filename))
+
+    def output_path(self, filename):
+        return os.path.join(self.output_dir, os.path.basename(filename))
+
+    def data_path(self, filename):
+        """任务的内部数据（如预览用的处理结果），不在输出目录中，不作为下载结果"""
+        return os.path.join(self.path, os.path.basename(filename))
+
+    def outputs(self):
+        """输出目录中的结果文件（写出时的临时文件除外）"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        return sorted(name for name in os.listdir(self.output_dir) if not name.startswith('.'))
+
+    def touch(self):
+        """刷新最近使用时间，延后过期清理"""
+        try:
+            os.utime(self.path)
+        except OSError:
+            pass
+
+
+class WorkspaceManager:
+    """为每个上传/比较请求分配独立的工作目录，按 TTL 和磁盘配额在后台清理
+
+    目录从创建到 release 之间（保存上传文件、任务排队和运行期间）不会被清理。
+    """
+
+    def __init__(self, root, ttl=WORKSPACE_TTL, max_bytes=WORKSPACE_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._active = set()
+        # 各活动目录创建时预留的字节数：数据写入之前并发的请求也按预留大小计入配额
+        self._reserved = {}
+        self._lock = threading.Lock()
+        self._cleanup_thread = None
+        # 工作目录中保存 pickle 格式的处理结果，只允许当前用户访问
+        self.root = make_private_dir(root)
+
+    def create(self, reserve_bytes=0):
+        """创建新的工作目录；reserve_bytes 为预计写入的大小（如上传请求的 Content-Length）"""
+        with self._lock:
+            self._ensure_capacity(reserve_bytes)
+            workspace = Workspace(self.root, uuid.uuid4().hex)
+            os.makedirs(workspace.input_dir)
+            os.makedirs(workspace.output_dir)
+            self._active.add(workspace.id)
+            self._reserved[workspace.id] = reserve_bytes
+        return workspace
+
+    def release(self, workspace_id):
+        """任务结束后调用，此后目录按 TTL 过期清理"""
+        with self._lock:
+            self._active.discard(workspace_id)
+            self._reserved.pop(workspace_id, None)
+        Workspace(self.root, workspace_id).touch()
+
+    def in_use(self, workspace_id):
+        return workspace_id in self._active
+
+    def get(self, workspace_id):
+        """按 ID 查找已存在的工作目录，ID 不合法或目录已被清理时返回 None"""
+        if not workspace_id or os.path.basename(workspace_id) != workspace_id or workspace_id.startswith('.'):
+            return None
+        workspace = Workspace(self.root, workspace_id)
+        return workspace if os.path.isdir(workspace.path) else None
+
+    def remove(self, workspace_id):
+        with self._lock:
+            self._active.discard(workspace_id)
+            self._reserved.pop(workspace_id, None)
+            self._remove(workspace_id)
+
+    def _remove(self, workspace_id):
+        shutil.rmtree(os.path.join(self.root, workspace_id), ignore_errors=True)
+
+    def _entries(self):
+        """[(最近使用时间, 占用大小, ID)]，活动目录的占用大小不小于创建时预留的字节数"""
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path):
+                continue
+            try:
+                mtime = os.stat(path).st_mtime
+            except OSError:
+                continue
+            entries.append((mtime, max(_dir_size(path), self._reserved.get(name, 0)), name))
+        return entries
+
+    def cleanup(self):
+        """删除过期的工作目录，返回删除的数量"""
+        removed = 0
+        now = time.time()
+        with self._lock:
+            for mtime, _, workspace_id in self._entries():
+                if now - mtime > self.ttl and not self.in_use(workspace_id):
+                    self._remove(workspace_id)
+                    removed += 1
+        return removed
+
+    def _ensure_capacity(self, reserve_bytes):
+        """超出配额时先删除过期目录，再按最近使用时间删除已结束任务的目录"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total + reserve_bytes <= self.max_bytes:
+            return
+
+        now = time.time()
+        # 过期的目录排在最前，其余按最近使用时间从旧到新
+        for mtime, size, workspace_id in sorted(entries, key=lambda entry: (now - entry[0] <= self.ttl, entry[0])):
+            if total + reserve_bytes <= self.max_bytes:
+                return
+            if self.in_use(workspace_id):
+                continue
+            self._remove(workspace_id)
+            total -= size
+
+        if total + reserve_bytes > self.max_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"临时文件占用已达上限 ({self.max_bytes / 1024 / 1024:.0f} MB)，请等待正在进行的任务完成后再试"
+            )
+
+    def start_cleanup(self, interval=CLEANUP_INTERVAL):
+        """启动后台清理线程（守护线程，随程序退出）"""
+        if self._cleanup_thread is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    removed = self.cleanup()
+                    if removed:
+                        print(f"已清理 {removed} 个过期的任务目录")
+                except Exception as e:
+                    print(f"清理任务目录失败: {str(e)}")
+
+        self._cleanup_thread = threading.Thread(target=loop, name='workspace-cleanup', daemon=True)
+        self._cleanup_thread.start()
@@ -0,0 +1,264 @@
+import os
+import zlib
+import zipfile
+import tempfile
+
+# 支持的输出格式：扩展名与下载时使用的 MIME 类型
+OUTPUT_FORMATS = {
+    'xlsx': {'extension': '.xlsx', 'mimetype': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'},
+    'csv': {'extension': '.csv', 'mimetype': 'text/csv'},
+    'parquet': {'extension': '.parquet', 'mimetype': 'application/vnd.apache.parquet'},
+    'feather': {'extension': '.feather', 'mimetype': 'application/vnd.apache.arrow.file'},
+}
+DEFAULT_OUTPUT_FORMAT = 'xlsx'
+
+ZIP_MIMETYPE = 'application/zip'
+
+# CSV 使用带 BOM 的 UTF-8，Excel 直接打开时中文不会乱码
+CSV_ENCODING = 'utf-8-sig'
+
+# Excel 单个工作表的最大行数（含表头）；超出时 xlsxwriter 会静默丢弃多出的行，因此写出前检查
+XLSX_MAX_ROWS = 1048576
+
+
+def check_format(fmt):
+    """校验输出格式，返回规范化后的格式名"""
+    fmt = (fmt or DEFAULT_OUTPUT_FORMAT).lower().lstrip('.')
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"不支持的输出格式: {fmt}，可选: {', '.join(OUTPUT_FORMATS)}")
+    return fmt
+
+
+def output_path_for(base_path, fmt):
+    """根据不带扩展名的路径和输出格式生成完整文件名"""
+    return base_path + OUTPUT_FORMATS[check_format(fmt)]['extension']
+
+
+def sheets_output_path_for(base_path, fmt):
+    """write_sheets 生成的文件路径：xlsx 为单个工作簿，其他格式为 zip"""
+    fmt = check_format(fmt)
+    return output_path_for(base_path, fmt) if fmt == 'xlsx' else base_path + '.zip'
+
+
+def mimetype_for(path):
+    """根据文件扩展名返回下载时使用的 MIME 类型"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.zip':
+        return ZIP_MIMETYPE
+    for spec in OUTPUT_FORMATS.values():
+        if spec['extension'] == extension:
+            return spec['mimetype']
+    return 'application/octet-stream'
+
+
+def _iter_frames(data):
+    """统一处理单个 DataFrame 和 DataFrame 迭代器（流式数据）"""
+    # pandas 在写出时才导入：桌面应用启动时只需要 check_format 等轻量函数
+    import pandas as pd
+    if isinstance(data, pd.DataFrame):
+        yield data
+    else:
+        yield from data
+
+
+def _to_cell_values(df):
+    """转换为可直接写入单元格的 Python 值，缺失值（NaN/NA/NaT）写为空单元格"""
+    values = df.astype(object)
+    return values.where(df.notna(), None)
+
+
+def _check_xlsx_rows(sheet_name, row_count):
+    """写出前检查行数，超过 Excel 的上限时报错，而不是生成被截断的文件"""
+    if row_count > XLSX_MAX_ROWS:
+        raise ValueError(f"sheet {sheet_name} 超过 Excel 的最大行数 {XLSX_MAX_ROWS}（含表头），请改用 CSV、Parquet 或 Feather 格式")
+
+
+def _write_xlsx_xlsxwriter(xlsxwriter, sheets, path):
+    # constant_memory 模式下每写完一行即落盘，内存占用与行数无关
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        # 按原样写入文本，不把链接、以 = 开头的 post 转换为超链接或公式
+        'strings_to_urls': False,
+        'strings_to_formulas': False,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+        'remove_timezone': True,
+    })
+    try:
+        for sheet_name, data in sheets:
+            worksheet = workbook.add_worksheet(sheet_name)
+            row_index = 0
+            for df in _iter_frames(data):
+                if row_index == 0:
+                    worksheet.write_row(0, 0, [str(col) for col in df.columns])
+                    row_index = 1
+                _check_xlsx_rows(sheet_name, row_index + len(df))
+                for row in _to_cell_values(df).itertuples(index=False, name=None):
+                    worksheet.write_row(row_index, 0, row)
+                    row_index += 1
+    finally:
+        workbook.close()
+
+
+def _write_xlsx_openpyxl(sheets, path):
+    import openpyxl
+
+    # write_only 模式逐行写出，不在内存中保留整张表的单元格对象
+    workbook = openpyxl.Workbook(write_only=True)
+    try:
+        for sheet_name, data in sheets:
+            worksheet = workbook.create_sheet(sheet_name)
+            row_count = 0
+            for df in _iter_frames(data):
+                if row_count == 0:
+                    worksheet.append([str(col) for col in df.columns])
+                    row_count = 1
+                row_count += len(df)
+                _check_xlsx_rows(sheet_name, row_count)
+                for row in _to_cell_values(df).itertuples(index=False, name=None):
+                    worksheet.append(row)
+    finally:
+        workbook.save(path)
+
+
+def write_xlsx(sheets, path):
+    """流式写出 xlsx，sheets 为 [(sheet 名称, DataFrame 或 DataFrame 迭代器)]
+
+    优先使用 xlsxwriter 的 constant_memory 模式，未安装时退回 openpyxl 的 write_only 模式。
+    行数超过 Excel 上限时抛出 ValueError，不保留写了一半的文件。
+    """
+    try:
+        import xlsxwriter
+    except ImportError:
+        xlsxwriter = None
+    try:
+        if xlsxwriter is None:
+            _write_xlsx_openpyxl(sheets, path)
+        else:
+            _write_xlsx_xlsxwriter(xlsxwriter, sheets, path)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+def write_csv(data, path):
+    first = True
+    for df in _iter_frames(data):
+        df.to_csv(path, index=False, mode='w' if first else 'a', header=first, encoding=CSV_ENCODING if first else 'utf-8')
+        first = False
+    if first:
+        # 没有任何数据时也生成空文件
+        open(path, 'w', encoding=CSV_ENCODING).close()
+
+
+def iter_csv_bytes(data, compress=False, level=6):
+    """逐批生成 CSV 内容（与 write_csv 写出的文件相同），用于边生成边下载；没有数据时不输出任何内容
+
+    compress 为 True 时输出 gzip 压缩后的数据流。
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31) if compress else None
+    first = True
+    for df in _iter_frames(data):
+        text = df.to_csv(index=False, header=first)
+        chunk = text.encode(CSV_ENCODING if first else 'utf-8')
+        first = False
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("输出 Parquet/Feather 格式需要安装 pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def _to_arrow_table(pa, df, schema=None):
+    """转换为 Arrow 表；混合类型的 object 列（如同时含数字和文本的 playthrough_rate）转换为文本"""
+    import pandas as pd
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty'):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if schema is not None:
+        table = table.cast(schema)
+    return table
+
+
+def write_parquet(data, path):
+    pa = _import_pyarrow()
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for df in _iter_frames(data):
+            table = _to_arrow_table(pa, df, writer.schema if writer else None)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_feather(data, path):
+    pa = _import_pyarrow()
+    import pyarrow.feather  # noqa: F401
+
+    writer = None
+    sink = None
+    try:
+        for df in _iter_frames(data):
+            table = _to_arrow_table(pa, df, writer.schema if writer else None)
+            if writer is None:
+                sink = pa.OSFile(path, 'wb')
+                writer = pa.ipc.new_file(sink, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+
+
+def write_output(data, path, fmt=None, sheet_name='Sheet1'):
+    """将 DataFrame（或流式处理产生的 DataFrame 迭代器）写入指定格式的文件
+
+    fmt 为空时根据 path 的扩展名判断格式。
+    """
+    fmt = check_format(fmt or os.path.splitext(path)[1])
+    if fmt == 'xlsx':
+        write_xlsx([(sheet_name, data)], path)
+    elif fmt == 'csv':
+        write_csv(data, path)
+    elif fmt == 'parquet':
+        write_parquet(data, path)
+    else:
+        write_feather(data, path)
+    return path
+
+
+def write_sheets(sheets, base_path, fmt=None):
+    """写出多个 sheet（如比较结果的 Data 和 Calculation），返回生成的文件路径
+
+    xlsx 写入同一个工作簿；其他格式每个 sheet 一个文件，打包为一个 zip。
+    """
+    fmt = check_format(fmt)
+    path = sheets_output_path_for(base_path, fmt)
+    if fmt == 'xlsx':
+        write_xlsx(list(sheets.items()), path)
+        return path
+
+    stem = os.path.basename(base_path)
+    with tempfile.TemporaryDirectory() as tmp, zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for sheet_name, df in sheets.items():
+            sheet_path = output_path_for(os.path.join(tmp, f"{stem}_{sheet_name}"), fmt)
+            write_output(df, sheet_path, fmt)
+            archive.write(sheet_path, os.path.basename(sheet_path))
+    return path